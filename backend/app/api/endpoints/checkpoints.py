@@ -5,7 +5,8 @@ from typing import List
 
 from app.core.database import get_db
 from app.models.checkpoint import Checkpoint
-from app.schemas.checkpoint import Checkpoint as CheckpointSchema
+from app.schemas.checkpoint import Checkpoint as CheckpointSchema, TravelMatrix, TravelCost
+from app.services.travel_matrix import checkpoint_travel_matrix
 
 router = APIRouter()
 
@@ -44,3 +45,27 @@ async def read_checkpoints(db: Session = Depends(get_db)):
         response_data.append(cp_dict)
 
     return response_data
+
+
+@router.get("/travel-matrix", response_model=TravelMatrix)
+async def read_travel_matrix():
+    """
+    Precomputed road distance/duration between every pair of checkpoints.
+    """
+    await checkpoint_travel_matrix.ensure_fresh()
+    return checkpoint_travel_matrix.as_dict()
+
+@router.get("/{origin_id}/travel/{destination_id}", response_model=TravelCost)
+async def read_travel(origin_id: int, destination_id: int):
+    """
+    Travel cost between two checkpoints (O(1) lookup in the precomputed matrix).
+    """
+    cost = await checkpoint_travel_matrix.get(origin_id, destination_id)
+    if cost is None:
+        raise HTTPException(status_code=404, detail="No road path known between these checkpoints")
+    return {
+        "origin_id": origin_id,
+        "destination_id": destination_id,
+        "distance_km": round(cost[0], 2),
+        "duration_hours": round(cost[1], 2),
+    }
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
-from typing import List
+from typing import List, Optional
 
 from app.core.database import get_db
 from app.models.convoy import Convoy
 from app.models.asset import TransportAsset
 from app.models.route import Route
 from app.schemas.convoy import ConvoyCreate, Convoy as ConvoySchema
-from app.services.routing import fetch_osrm_route
+from app.schemas.route import lod_context
+from app.services.routing import get_route_metrics_with_path
+from app.services.rerouting import rerouting_engine
+from app.services.geometry import route_geometry_cache
 
 router = APIRouter()
 
@@ -45,16 +49,19 @@ async def create_convoy(convoy: ConvoyCreate, db: AsyncSession = Depends(get_db)
     # 2. Auto-Plan Route if coordinates provided AND no existing route selected
     if not new_convoy.route_id and start_lat and start_long and end_lat and end_long:
         try:
-            waypoints = await fetch_osrm_route(start_lat, start_long, end_lat, end_long)
-            if waypoints:
+            metrics = await get_route_metrics_with_path([start_lat, start_long], [end_lat, end_long])
+            if metrics:
                 route = Route(
                     name=f"Route: {new_convoy.name}",
-                    waypoints=waypoints,
                     status="OPEN"
                 )
+                route.apply_planned_metrics(metrics)
                 db.add(route)
                 await db.flush()
                 new_convoy.route_id = route.id
+                route_geometry_cache.get(route) # Build geometry once, up front
+                if not new_convoy.estimated_arrival_time and route.duration_hours:
+                    new_convoy.estimated_arrival_time = (new_convoy.start_time or datetime.utcnow()) + timedelta(hours=route.duration_hours)
         except Exception as e:
             print(f"Error fetching OSRM route: {e}")
             # We continue without failing the whole request
@@ -64,9 +71,15 @@ async def create_convoy(convoy: ConvoyCreate, db: AsyncSession = Depends(get_db)
     return new_convoy
 
 @router.get("/", response_model=List[ConvoySchema])
-async def read_convoys(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+async def read_convoys(
+    skip: int = 0,
+    limit: int = 100,
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Simplify route waypoints for this map zoom"),
+    tolerance_m: Optional[float] = Query(None, ge=0, description="Simplify route waypoints to this tolerance (metres)"),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    List all convoys.
+    List all convoys. Routes carry full-resolution waypoints unless a zoom or tolerance is given.
     """
     stmt = (
         select(Convoy)
@@ -76,10 +89,18 @@ async def read_convoys(skip: int = 0, limit: int = 100, db: AsyncSession = Depen
     )
     result = await db.execute(stmt)
     convoys = result.scalars().all()
+    context = lod_context(zoom, tolerance_m)
+    if context:
+        return [ConvoySchema.model_validate(c, context=context) for c in convoys]
     return convoys
 
 @router.get("/{convoy_id}", response_model=ConvoySchema)
-async def read_convoy(convoy_id: int, db: AsyncSession = Depends(get_db)):
+async def read_convoy(
+    convoy_id: int,
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Simplify route waypoints for this map zoom"),
+    tolerance_m: Optional[float] = Query(None, ge=0, description="Simplify route waypoints to this tolerance (metres)"),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Get a specific convoy by ID with full details (assets, route).
     """
@@ -93,4 +114,14 @@ async def read_convoy(convoy_id: int, db: AsyncSession = Depends(get_db)):
     
     if not convoy:
         raise HTTPException(status_code=404, detail="Convoy not found")
+    context = lod_context(zoom, tolerance_m)
+    if context:
+        return ConvoySchema.model_validate(convoy, context=context)
     return convoy
+
+@router.post("/reroute")
+async def reroute_convoys(db: AsyncSession = Depends(get_db)):
+    """
+    Detour every convoy in transit on a blocked or high-risk route (others are untouched).
+    """
+    return {**await rerouting_engine.reroute(db), "engine": rerouting_engine.stats()}
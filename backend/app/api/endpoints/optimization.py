@@ -1,10 +1,21 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
-from app.services.optimization import LoadOptimizer
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import json
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.models.optimization_job import OptimizationJob
+from app.services.optimization_jobs import job_view, optimization_jobs
+from app.services.optimization import solve_aggregated_plan, solve_load_plan
+from app.services.plan_cache import load_plan_cache
+from app.services.solver_pool import SolverBusy, SolverCrashed, SolverTimeout, solver_pool
 
 router = APIRouter()
-optimizer = LoadOptimizer()
+
+SSE_KEEPALIVE_SEC = 15.0 # Comment line sent when idle so proxies keep the stream open
 
 class CargoItem(BaseModel):
     id: str
@@ -21,20 +32,181 @@ class VehicleSpec(BaseModel):
 class OptimizationRequest(BaseModel):
     cargo: List[CargoItem]
     fleet: List[VehicleSpec]
+    time_limit_sec: Optional[float] = Field(None, gt=0, le=settings.OPTIMIZATION_MAX_TIME_LIMIT_SEC) # Best plan found by then is returned
+    # anytime: heuristic plan improved by the MIP within the time limit; heuristic: packing only; mip: exact model only
+    mode: Literal["anytime", "heuristic", "mip"] = "anytime"
+    strategy: Literal["bfd", "ffd"] = "bfd" # Best-fit or first-fit decreasing
+
+class CargoClass(BaseModel):
+    id: str
+    weight: float # Per unit
+    volume: float = 0
+    quantity: int = Field(..., ge=1)
+    name: str = "Unknown Cargo"
+    item_ids: Optional[List[str]] = None # Ids for the units; generated as "<id>-<n>" when omitted
+
+    @model_validator(mode="after")
+    def check_item_ids(self):
+        if self.item_ids is not None and len(self.item_ids) != self.quantity:
+            raise ValueError("item_ids must list one id per unit")
+        return self
+
+class VehicleType(BaseModel):
+    id: str
+    capacity_weight: float
+    capacity_volume: Optional[float] = None # Unlimited when omitted
+    count: int = Field(..., ge=1)
+    name: str = "Generic Truck"
+    vehicle_ids: Optional[List[str]] = None # Ids for the vehicles; generated as "<id>-<n>" when omitted
+
+    @model_validator(mode="after")
+    def check_vehicle_ids(self):
+        if self.vehicle_ids is not None and len(self.vehicle_ids) != self.count:
+            raise ValueError("vehicle_ids must list one id per vehicle")
+        return self
+
+class FleetOptimizationRequest(BaseModel):
+    cargo_classes: List[CargoClass] = Field(..., min_length=1)
+    vehicle_types: List[VehicleType] = Field(..., min_length=1)
+    time_limit_sec: Optional[float] = Field(None, gt=0, le=settings.OPTIMIZATION_MAX_TIME_LIMIT_SEC)
+
+async def _run_solver(fn, *args, time_limit: float) -> dict:
+    """ Run a solve in the pool, mapping pool overload and overruns to HTTP errors """
+    try:
+        return await solver_pool.run(fn, *args, time_limit_sec=time_limit)
+    except SolverBusy:
+        raise HTTPException(status_code=503, detail="Optimizer is busy. Retry shortly.", headers={"Retry-After": "5"})
+    except SolverTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except SolverCrashed as e:
+        raise HTTPException(status_code=503, detail=f"{e}. Retry shortly.", headers={"Retry-After": "5"})
 
 @router.post("/optimize")
 async def generate_load_plan(request: OptimizationRequest):
     """
     Generate an optimal load plan using Google OR-Tools.
-    Minimizes the number of vehicles used.
+    Minimizes the number of vehicles used. Solves run in a worker process with their
+    own model, so concurrent requests never share solver state or block the API.
+    The response reports the lower bound on vehicles and the gap of the plan to it.
+    Re-submitting the same cargo sizes and fleet capacities (any ids or order) returns the
+    cached plan mapped onto the new ids, with "cached": true.
     """
     # Convert Pydantic models to dicts for the service
     cargo_data = [item.model_dump() for item in request.cargo]
     fleet_data = [v.model_dump() for v in request.fleet]
+    time_limit = request.time_limit_sec or settings.OPTIMIZATION_TIME_LIMIT_SEC
+    if request.mode == "heuristic":
+        time_limit = None # Runs to completion
+
+    instance, cached = load_plan_cache.get(cargo_data, fleet_data, request.mode, request.strategy, time_limit)
+    if cached is not None:
+        return cached
     
-    result = optimizer.optimize_load(cargo_data, fleet_data)
-    
-    if result.get("status") != "OPTIMAL":
-        raise HTTPException(status_code=400, detail="Could not optimize load. Ensure fleet capacity is sufficient.")
-        
+    if request.mode == "heuristic":
+        # Fast enough not to need a worker process, but still a Python loop per item: keep it off the event loop
+        result = await asyncio.to_thread(solve_load_plan, cargo_data, fleet_data, None, request.mode, request.strategy)
+        if result.get("status") not in ("OPTIMAL", "FEASIBLE"):
+            raise HTTPException(status_code=400, detail="Could not pack the cargo. Ensure every item fits a vehicle.")
+    else:
+        result = await _run_solver(
+            solve_load_plan, cargo_data, fleet_data, time_limit, request.mode, request.strategy, time_limit=time_limit
+        )
+        if result.get("status") not in ("OPTIMAL", "FEASIBLE"):
+            raise HTTPException(status_code=400, detail="Could not optimize load. Ensure fleet capacity is sufficient.")
+
+    load_plan_cache.put(instance, result, cargo_data, fleet_data, request.mode, request.strategy, time_limit)
+    result["cached"] = False
+    return result
+
+@router.post("/optimize-fleet")
+async def generate_fleet_load_plan(request: FleetOptimizationRequest):
+    """
+    Load plan for vehicle types with counts and cargo classes with quantities.
+    Solves the aggregated (pattern) model, so thousands of identical vehicles cost no more
+    than a handful; assignments are returned per concrete vehicle id as in /optimize.
+    """
+    classes = [c.model_dump() for c in request.cargo_classes]
+    types = [t.model_dump(exclude_none=True) for t in request.vehicle_types] # Omitted volume -> solver default
+    time_limit = request.time_limit_sec or settings.OPTIMIZATION_TIME_LIMIT_SEC
+
+    result = await _run_solver(solve_aggregated_plan, classes, types, time_limit, time_limit=time_limit)
+
+    if result.get("status") not in ("OPTIMAL", "FEASIBLE"):
+        raise HTTPException(status_code=400, detail=result.get("details", "Could not optimize load."))
+
     return result
+
+@router.get("/stats")
+async def optimizer_stats():
+    """
+    Solver pool load (running/queued solves and rejections) and plan cache hits.
+    """
+    return {**solver_pool.stats(), "plan_cache": load_plan_cache.stats()}
+
+async def _submit_job(db: AsyncSession, kind: str, request: dict) -> dict:
+    request["time_limit_sec"] = request.get("time_limit_sec") or settings.OPTIMIZATION_TIME_LIMIT_SEC
+    job = await optimization_jobs.submit(db, kind, request)
+    if job is None:
+        raise HTTPException(status_code=503, detail="Optimization queue is full. Retry later.", headers={"Retry-After": "30"})
+    return job_view(job)
+
+@router.post("/jobs/optimize", status_code=202)
+async def submit_load_plan_job(request: OptimizationRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Queue an /optimize solve. Returns the job id at once; poll GET /jobs/{job_id}
+    or stream GET /jobs/{job_id}/events for incumbent plans and the result.
+    """
+    return await _submit_job(db, "load", request.model_dump())
+
+@router.post("/jobs/optimize-fleet", status_code=202)
+async def submit_fleet_load_plan_job(request: FleetOptimizationRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Queue an /optimize-fleet solve (vehicle types and cargo classes).
+    """
+    return await _submit_job(db, "fleet", request.model_dump(exclude_none=True))
+
+@router.get("/jobs/{job_id}")
+async def read_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Job status with the best plan so far (incumbent) and, once finished, the result.
+    """
+    job = await db.get(OptimizationJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events: the job's current state, each new incumbent and status change,
+    ending when the job is done, failed or cancelled.
+    """
+    # Short-lived session: the stream can stay open for the whole solve and must not pin a pooled connection
+    async with SessionLocal() as db:
+        if await db.get(OptimizationJob, job_id) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        async for event in optimization_jobs.events(job_id, SSE_KEEPALIVE_SEC):
+            if await request.is_disconnected():
+                break
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"data: {json.dumps(event, default=str)}\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Cancel a job. Queued jobs stop at once; running ones within a second, keeping their
+    best plan so far as the result.
+    """
+    job = await optimization_jobs.cancel(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job, include_plans=False)
@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 
 from app.core.database import get_db
 from app.models.route import Route
-from app.schemas.route import RouteCreate, Route as RouteSchema, RoutePlanRequest
+from app.schemas.route import (
+    RouteCreate, Route as RouteSchema, RoutePlanRequest, RouteMatrixRequest, RouteMatrix, RouteStatusUpdate,
+    RouteAlternativesRequest, RouteAlternatives, lod_context
+)
 from app.services.risk_analysis import RouteRiskService
+from app.services.alternatives import alternative_routes, risk_level_for
+from app.services.geometry import RouteGeometry, route_geometry_cache
+from app.services.road_graph import offline_router
+from app.services.rerouting import rerouting_engine
+from app.services.travel_matrix import checkpoint_travel_matrix
 
 router = APIRouter()
 
@@ -19,49 +27,99 @@ async def create_route(route: RouteCreate, db: AsyncSession = Depends(get_db)):
     db.add(new_route)
     await db.commit()
     await db.refresh(new_route)
+    route_geometry_cache.get(new_route) # Build geometry once, up front
+    offline_router.invalidate() # New road geometry for offline planning
+    checkpoint_travel_matrix.invalidate()
     return new_route
 
 @router.get("/", response_model=List[RouteSchema])
-async def read_routes(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+async def read_routes(
+    skip: int = 0,
+    limit: int = 100,
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Simplify waypoints for this map zoom"),
+    tolerance_m: Optional[float] = Query(None, ge=0, description="Simplify waypoints to this tolerance (metres)"),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Get all routes.
+    Get all routes. Full-resolution waypoints unless a zoom or tolerance is given.
     """
     result = await db.execute(select(Route).offset(skip).limit(limit))
     routes = result.scalars().all()
+    context = lod_context(zoom, tolerance_m)
+    if context:
+        return [RouteSchema.model_validate(r, context=context) for r in routes]
     return routes
 
 @router.post("/analyze-risk")
 async def trigger_risk_analysis(db: AsyncSession = Depends(get_db)):
     """
-    Triggers the AI Risk Analysis engine to re-evaluate route validities.
+    Triggers the AI Risk Analysis engine to re-evaluate route validities,
+    then detours the convoys on routes that became high risk.
     """
-    return await RouteRiskService.analyze_risks(db)
+    result = await RouteRiskService.analyze_risks(db)
+    result["rerouting"] = await rerouting_engine.reroute(db)
+    return result
+
+@router.patch("/{route_id}/status")
+async def update_route_status(route_id: int, update: RouteStatusUpdate, db: AsyncSession = Depends(get_db)):
+    """
+    Set a route's status/risk (e.g. BLOCKED). Convoys in transit on it are re-routed.
+    """
+    route = await db.get(Route, route_id)
+    if route is None:
+        raise HTTPException(status_code=404, detail="Route not found")
+    if update.status is not None:
+        route.status = update.status
+    if update.risk_level is not None:
+        route.risk_level = update.risk_level
+    await db.commit()
+    offline_router.invalidate() # Blocked routes leave the planning graph
+    checkpoint_travel_matrix.invalidate()
+    return {
+        "route_id": route.id,
+        "status": route.status,
+        "risk_level": route.risk_level,
+        "rerouting": await rerouting_engine.reroute(db, [route.id]),
+    }
 
 @router.post("/plan", response_model=RouteSchema)
 async def plan_route(plan: RoutePlanRequest, db: AsyncSession = Depends(get_db)):
     """
     Plan a new route using OSRM High-Fidelity API.
+    With alternatives > 1 the best-ranked alternative is stored, rated by its aggregate risk.
     """
-    from app.services.routing import fetch_osrm_route
+    from app.services.routing import get_route_metrics_with_path
     
     start = [plan.start_lat, plan.start_long]
     end = [plan.end_lat, plan.end_long]
     
-    waypoints = await fetch_osrm_route(start, end)
-    
-    if not waypoints:
-        # Fallback to straight line if API fails
-        waypoints = [start, end]
+    risk_level = "LOW" # Default
+    if plan.alternatives > 1:
+        ranked = await alternative_routes.rank(
+            db, start, end, plan.alternatives, plan.risk_aversion, plan.depart_hour
+        )
+        metrics = ranked["alternatives"][0] if ranked["alternatives"] else None
+        if metrics:
+            risk_level = risk_level_for(metrics["aggregate_risk"])
+    else:
+        metrics = await get_route_metrics_with_path(start, end)
         
     new_route = Route(
         name=plan.name,
-        risk_level="LOW", # Default
-        status="OPEN",
-        waypoints=waypoints
+        risk_level=risk_level,
+        status="OPEN"
     )
+    if metrics:
+        new_route.apply_planned_metrics(metrics)
+    else:
+        # Fallback to straight line if API fails (metrics are measured from it on insert)
+        new_route.waypoints = [start, end]
     db.add(new_route)
     await db.commit()
     await db.refresh(new_route)
+    route_geometry_cache.get(new_route) # Build geometry once, up front
+    offline_router.invalidate()
+    checkpoint_travel_matrix.invalidate()
     return new_route
 
 @router.post("/estimate")
@@ -77,11 +135,32 @@ async def estimate_route_metrics(plan: RoutePlanRequest):
     metrics = await get_route_metrics_with_path(start, end)
     
     if not metrics:
-        # Fallback
+        # Fallback: straight-line distance from the two-point geometry
         return {
-            "distance_km": 0.0, 
+            "distance_km": round(RouteGeometry([start, end]).total_km, 2), 
             "duration_hours": 0.0, 
             "waypoints": [start, end]
         }
     
     return metrics
+
+@router.post("/matrix", response_model=RouteMatrix)
+async def route_matrix(request: RouteMatrixRequest):
+    """
+    Distance/duration matrix for N origins x M destinations in one request.
+    """
+    from app.services.routing import get_distance_matrix
+
+    return await get_distance_matrix(request.origins, request.destinations)
+
+@router.post("/alternatives", response_model=RouteAlternatives)
+async def route_alternatives(request: RouteAlternativesRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Up to k alternative routes ranked by travel time and risk. Repeated requests for the
+    same pair only re-rank the cached candidates with current risk, congestion and departure time.
+    """
+    start = [request.start_lat, request.start_long]
+    end = [request.end_lat, request.end_long]
+    return await alternative_routes.rank(
+        db, start, end, request.k, request.risk_aversion, request.depart_hour, request.refresh
+    )
@@ -0,0 +1,73 @@
+import asyncio
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
+from fastapi.responses import StreamingResponse
+
+from app.services.broadcast import FRAME_FORMATS, position_broadcaster
+
+router = APIRouter()
+
+SSE_KEEPALIVE_SEC = 15.0 # Comment line sent when idle so proxies keep the stream open
+
+
+@router.websocket("/ws")
+async def positions_ws(websocket: WebSocket, format: str = "binary"):
+    """
+    Live asset positions pushed once per simulation tick.
+    format=binary (default) sends compact binary frames, format=json the same frames as JSON
+    (layout in app/services/position_frames.py). A keyframe always comes first.
+    """
+    if format not in FRAME_FORMATS:
+        await websocket.close(code=1003, reason=f"format must be one of {FRAME_FORMATS}")
+        return
+    await websocket.accept()
+    sub = position_broadcaster.subscribe(format)
+    try:
+        while True:
+            frame = await sub.next_frame()
+            if format == "binary":
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        position_broadcaster.unsubscribe(sub)
+
+
+@router.get("/sse")
+async def positions_sse(request: Request):
+    """
+    Server-Sent Events fallback of the position stream (JSON frames, as /ws?format=json).
+    """
+    sub = position_broadcaster.subscribe("json")
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    frame = await asyncio.wait_for(sub.next_frame(), timeout=SSE_KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {frame}\n\n"
+        finally:
+            position_broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats")
+async def stream_stats():
+    """
+    Subscriber count and frames published/dropped on this API process, plus the simulation
+    scheduler's tick/overrun counters (None until the first tick arrives)
+    """
+    return {
+        "subscribers": position_broadcaster.subscriber_count,
+        "frames_published": position_broadcaster.frames_published,
+        "frames_dropped": position_broadcaster.frames_dropped,
+        "simulation": position_broadcaster.simulation_stats,
+    }
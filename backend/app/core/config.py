@@ -1,6 +1,9 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+import os
 from typing import Optional
 
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 class Settings(BaseSettings):
     """
     Application settings managed by Pydantic.
@@ -21,6 +24,45 @@ class Settings(BaseSettings):
         # Construct the async PostgreSQL connection string
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    # Routing: "osrm" (routing server only), "offline" (in-process road graph, air-gapped) or "auto" (OSRM, then offline)
+    ROUTING_MODE: str = "auto"
+    ROAD_NETWORK_PATH: Optional[str] = None # Optional GeoJSON of road LineStrings fused into the offline graph
+
+    # Outbound HTTP (routing server): pooled keep-alive client and circuit breaker
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE: int = 10
+    HTTP_KEEPALIVE_EXPIRY_SEC: float = 60.0
+    HTTP_MAX_CONCURRENCY_PER_HOST: int = 8
+    ROUTING_CONNECT_TIMEOUT_SEC: float = 3.0
+    ROUTING_TIMEOUT_SEC: float = 15.0
+    ROUTING_BREAKER_FAILURES: int = 3 # Consecutive failures before planning falls back to straight lines
+    ROUTING_BREAKER_RESET_SEC: float = 30.0 # First background probe delay (doubles up to 5 min)
+
+    # Routing cache: in-memory LRU plus an on-disk tier shared by every process (empty path = memory only)
+    ROUTE_CACHE_PATH: Optional[str] = os.path.join(BACKEND_ROOT, ".cache", "osrm_routes.sqlite3")
+    ROUTE_CACHE_TTL_SEC: float = 7 * 24 * 3600.0
+    ROUTE_CACHE_MAX_ENTRIES: int = 256
+
+    # Simulation settings
+    SIMULATION_SHARDS: int = 1 # Worker processes for the physics; 1 = in-process
+    SIMULATION_IN_API: bool = False # Run the simulation inside the API process instead of app/services/simulation.py
+
+    # Load optimization: solves run in a bounded process pool (0 workers = a thread in the API process)
+    OPTIMIZATION_WORKERS: int = 2
+    OPTIMIZATION_MAX_QUEUE: int = 8 # Solves allowed to wait for a worker; more are rejected with 503
+    OPTIMIZATION_TIME_LIMIT_SEC: float = 30.0 # Default per-request solve limit
+    OPTIMIZATION_MAX_TIME_LIMIT_SEC: float = 300.0
+    OPTIMIZATION_CACHE_MAX_ENTRIES: int = 128 # Solved plans kept for re-submitted instances (same sizes, any ids/order)
+    # Optimization jobs: "memory" runs the queue and a worker inside the API (local runs);
+    # "redis" queues on REDIS_URL for standalone workers (app/services/optimization_worker.py)
+    OPTIMIZATION_JOB_BACKEND: str = "memory"
+    OPTIMIZATION_JOB_CONCURRENCY: int = 2 # Solves one worker runs at once
+    OPTIMIZATION_MAX_QUEUED_JOBS: int = 100 # Submits beyond this are rejected with 503
+    OPTIMIZATION_JOB_LEASE_SEC: float = 60.0 # A running job whose worker stops renewing this long is requeued
+
+    # Live position stream: the standalone simulation publishes frames here for the API to relay
+    REDIS_URL: Optional[str] = "redis://localhost:6379/0"
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
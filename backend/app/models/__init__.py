@@ -4,3 +4,5 @@ from app.models.route import Route
 from app.models.checkpoint import Checkpoint
 from app.models.logistics import LogisticsIndent
 from app.models.user import User
+from app.models.checkpoint_travel import CheckpointTravel
+from app.models.optimization_job import OptimizationJob
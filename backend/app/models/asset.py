@@ -1,5 +1,5 @@
-from sqlalchemy import String, Integer, Float, Boolean, Column, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import String, Integer, Float, Boolean, Column, ForeignKey, event, update
+from sqlalchemy.orm import relationship, attributes
 from app.core.database import Base
 
 class TransportAsset(Base):
@@ -35,3 +35,20 @@ class TransportAsset(Base):
 
     current_checkpoint_id = Column(Integer, ForeignKey("checkpoints.id"), nullable=True)
     current_checkpoint = relationship("app.models.checkpoint.Checkpoint")
+
+
+@event.listens_for(TransportAsset, "before_update")
+def bump_convoy_membership_version(mapper, connection, target):
+    # Moving an asset between convoys changes both formations; bump their versions
+    # so the simulation's active-convoy registry reloads them.
+    history = attributes.get_history(target, "convoy_id")
+    if not history.has_changes():
+        return
+    convoy_ids = [c for c in (history.deleted or []) + (history.added or []) if c is not None]
+    if convoy_ids:
+        from app.models.convoy import Convoy
+        connection.execute(
+            update(Convoy.__table__)
+            .where(Convoy.__table__.c.id.in_(convoy_ids))
+            .values(version=Convoy.__table__.c.version + 1)
+        )
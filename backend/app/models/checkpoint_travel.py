@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, Float, Column, DateTime, ForeignKey
+from app.core.database import Base
+
+class CheckpointTravel(Base):
+    """
+    One cell of the precomputed checkpoint-to-checkpoint travel matrix.
+    Road travel is symmetric, so only origin_id < destination_id is stored.
+    """
+    __tablename__ = "checkpoint_travel"
+
+    origin_id = Column(Integer, ForeignKey("checkpoints.id", ondelete="CASCADE"), primary_key=True)
+    destination_id = Column(Integer, ForeignKey("checkpoints.id", ondelete="CASCADE"), primary_key=True)
+
+    distance_km = Column(Float, nullable=True, doc="Road distance; NULL when no road path is known")
+    duration_hours = Column(Float, nullable=True)
+    via_route_ids = Column(String, default="[]", doc="JSON list of Route ids the path uses")
+
+    # Checkpoint positions the cell was computed from (a moved checkpoint invalidates its cells)
+    origin_lat = Column(Float, nullable=False)
+    origin_long = Column(Float, nullable=False)
+    destination_lat = Column(Float, nullable=False)
+    destination_long = Column(Float, nullable=False)
+    graph_signature = Column(String, nullable=True, doc="Road graph the cell is valid for (reloaded only if unchanged)")
+
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -1,5 +1,5 @@
-from sqlalchemy import String, Integer, Float, Boolean, Column, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import String, Integer, Float, Boolean, Column, DateTime, ForeignKey, event
+from sqlalchemy.orm import relationship, attributes
 from datetime import datetime
 from app.core.database import Base
 
@@ -25,3 +25,12 @@ class Convoy(Base):
     route = relationship("app.models.route.Route") # Deferred import string to avoid circulars if possible
 
     assets = relationship("app.models.asset.TransportAsset", back_populates="convoy")
+
+    version = Column(Integer, default=1, nullable=False, doc="Bumped when status, route or membership changes")
+
+
+@event.listens_for(Convoy, "before_update")
+def bump_convoy_version(mapper, connection, target):
+    # The simulation's active-convoy registry refreshes a convoy only when its version moves
+    if any(attributes.get_history(target, attr).has_changes() for attr in ("status", "route_id")):
+        target.version = (target.version or 1) + 1
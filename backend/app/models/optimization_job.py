@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, Column, DateTime
+from app.core.database import Base
+
+class OptimizationJob(Base):
+    """
+    A load-planning solve submitted through the job API (app/services/optimization_jobs.py).
+    The request, the best plan found so far and the final result are kept as JSON.
+    """
+    __tablename__ = "optimization_jobs"
+
+    id = Column(String, primary_key=True, doc="Random hex id returned on submit")
+    kind = Column(String, nullable=False, doc="load (/optimize) or fleet (/optimize-fleet)")
+    status = Column(String, default="QUEUED", index=True, doc="QUEUED, RUNNING, DONE, FAILED, CANCELLED")
+    request = Column(String, nullable=False, doc="JSON request body, including time_limit_sec")
+
+    incumbent = Column(String, nullable=True, doc="JSON of the best plan found while running")
+    result = Column(String, nullable=True, doc="JSON of the final plan (or the last incumbent if cancelled)")
+    error = Column(String, nullable=True)
+    total_vehicles_used = Column(Integer, nullable=True, doc="Of the best plan so far")
+    lower_bound = Column(Integer, nullable=True)
+
+    # Lease of the worker running the job; renewed while it runs, requeued by any worker once expired
+    lease_owner = Column(String, nullable=True, doc="Random token of the claim holding the job")
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False, doc="Times the job was claimed")
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,10 +1,14 @@
-from sqlalchemy import String, Integer, Float, Boolean, Column, JSON
+from sqlalchemy import JSON, String, Integer, Float, Boolean, Column, LargeBinary, event
+from sqlalchemy.orm import attributes
 from app.core.database import Base
+from app.services.geometry import (
+    DEFAULT_ROAD_SPEED_KMH, RouteGeometry, pack_chainage, pack_waypoints, unpack_chainage, unpack_waypoints
+)
 
 class Route(Base):
     """
     Database Model for a predefined Route (e.g., Jammu-Srinagar Highway).
-    Stores the path as a list of coordinates (JSON).
+    Stores the path as packed float64 [lat, long] pairs; `waypoints` converts to lists.
     """
     __tablename__ = "routes"
 
@@ -12,8 +16,74 @@ class Route(Base):
     name = Column(String, index=True, doc="Route Name (e.g. NH-44)")
     
     # In a real PostGIS setup, this would be a Geography(LineString). 
-    # For simplicity/portability now, we'll store a JSON list of [lat, long] points.
-    waypoints = Column(JSON, doc="List of [lat, long] coordinates")
+    # For simplicity/portability now, we store the [lat, long] points as packed float64 pairs:
+    # about half the size of the old JSON list and decoded without parsing per-point lists.
+    waypoints_packed = Column(LargeBinary, doc="[lat, long] coordinates as little-endian float64 pairs")
     
     risk_level = Column(String, default="LOW", doc="LOW, MEDIUM, HIGH (Critical)")
     status = Column(String, default="OPEN", doc="OPEN, BLOCKED, CONGESTED")
+
+    version = Column(Integer, default=1, nullable=False, doc="Geometry version, bumped whenever waypoints change")
+    is_detour = Column(Boolean, default=False, nullable=False, doc="Re-routing detour over other routes' roads; left out of the road graphs")
+    detour_via = Column(JSON, nullable=True, doc="Route id sets of the roads a detour drives on; re-planned once every id of one set is closed")
+
+    # Planned metrics, stored so consumers never re-fetch or guess them
+    distance_km = Column(Float, nullable=True, doc="Road distance of the whole route")
+    duration_hours = Column(Float, nullable=True, doc="Expected driving time of the whole route")
+    metrics_source = Column(String, nullable=True, doc="osrm, offline (road graph) or geometry (waypoints at default speed)")
+    chainage_packed = Column(LargeBinary, nullable=True, doc="Chainage (km) of each waypoint as little-endian float64")
+
+    @property
+    def waypoints_array(self):
+        """ (n, 2) read-only NumPy view of the stored points (geometry/simulation path) """
+        return unpack_waypoints(self.waypoints_packed)
+
+    @property
+    def waypoints(self):
+        """ List of [lat, long] coordinates (JSON edge only; prefer waypoints_array) """
+        return self.waypoints_array.tolist() if self.waypoints_packed is not None else None
+
+    @waypoints.setter
+    def waypoints(self, value):
+        self.waypoints_packed = pack_waypoints(value)
+
+    @property
+    def chainage_array(self):
+        """ Read-only chainage (km) per waypoint, or None before metrics are computed """
+        return unpack_chainage(self.chainage_packed)
+
+    def apply_planned_metrics(self, metrics: dict, source: str = None):
+        """ Take waypoints, distance and duration from a router result (get_route_metrics_with_path) """
+        self.waypoints = metrics["waypoints"]
+        self.distance_km = metrics.get("distance_km")
+        self.duration_hours = metrics.get("duration_hours")
+        self.metrics_source = source or metrics.get("source")
+
+
+def compute_route_metrics(route: Route, keep_planned: bool = True):
+    """
+    Store the chainage profile of the route's waypoints. Distance and duration come from the
+    geometry (at the default road speed) unless a router already supplied them.
+    """
+    geometry = RouteGeometry(route.waypoints_array)
+    route.chainage_packed = pack_chainage(geometry.cumulative_km[:geometry.num_points])
+    if not keep_planned or route.distance_km is None:
+        total_km = geometry.total_km
+        route.distance_km = round(total_km, 2)
+        route.duration_hours = round(total_km / DEFAULT_ROAD_SPEED_KMH, 2)
+        route.metrics_source = "geometry"
+
+
+@event.listens_for(Route, "before_insert")
+def fill_route_metrics(mapper, connection, target):
+    if target.waypoints_packed is not None:
+        compute_route_metrics(target)
+
+
+@event.listens_for(Route, "before_update")
+def bump_geometry_version(mapper, connection, target):
+    # Cached route geometry is keyed by (id, version), so any waypoint edit must bump it
+    if attributes.get_history(target, "waypoints_packed").has_changes():
+        target.version = (target.version or 1) + 1
+        # Metrics set alongside the new waypoints (a re-plan) are kept; otherwise re-measure
+        compute_route_metrics(target, keep_planned=attributes.get_history(target, "distance_km").has_changes())
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from datetime import datetime
 from typing import Optional, List
 
 class CheckpointBase(BaseModel):
@@ -25,3 +26,15 @@ class Checkpoint(CheckpointBase):
 
     class Config:
         from_attributes = True
+
+class TravelCost(BaseModel):
+    origin_id: int
+    destination_id: int
+    distance_km: float
+    duration_hours: float
+
+class TravelMatrix(BaseModel):
+    checkpoint_ids: List[int]
+    distance_km: List[List[Optional[float]]] # Row/column order follows checkpoint_ids; null where unroutable
+    duration_hours: List[List[Optional[float]]]
+    updated_at: Optional[datetime] = None
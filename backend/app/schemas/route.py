@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import List, Tuple
+from pydantic import BaseModel, Field, ValidationInfo, model_validator
+from typing import List, Optional, Tuple
+
+from app.services.alternatives import MAX_ALTERNATIVES
+from app.services.geometry import route_geometry_cache
 
 class RouteBase(BaseModel):
     name: str
@@ -12,13 +15,88 @@ class RouteCreate(RouteBase):
 
 class Route(RouteBase):
     id: int
+    distance_km: Optional[float] = None
+    duration_hours: Optional[float] = None
+    metrics_source: Optional[str] = None # "osrm", "offline" or "geometry"
+    lod_tolerance_m: Optional[float] = None # Set when waypoints are a simplified level of detail
+    is_detour: bool = False
+    detour_via: Optional[List[List[int]]] = None
 
     class Config:
         from_attributes = True
 
+    @model_validator(mode="before")
+    @classmethod
+    def apply_level_of_detail(cls, data, info: ValidationInfo):
+        """ With a 'lod_zoom' or 'lod_tolerance_m' validation context, swap in simplified waypoints """
+        lod = info.context or {}
+        if isinstance(data, dict) or not data.waypoints_packed or ("lod_zoom" not in lod and "lod_tolerance_m" not in lod):
+            return data
+        geometry = route_geometry_cache.get(data) # Full-resolution geometry is shared with the simulation
+        tolerance_m = lod.get("lod_tolerance_m")
+        if tolerance_m is None:
+            tolerance_m = geometry.tolerance_for_zoom(lod["lod_zoom"])
+        fields = {name: getattr(data, name) for name in cls.model_fields if name not in ("waypoints", "lod_tolerance_m")}
+        return {**fields, "waypoints": geometry.simplified(tolerance_m), "lod_tolerance_m": round(tolerance_m, 1)}
+
+
+def lod_context(zoom: Optional[int] = None, tolerance_m: Optional[float] = None) -> Optional[dict]:
+    """ Validation context selecting a route level of detail (None = full resolution) """
+    if tolerance_m is not None:
+        return {"lod_tolerance_m": max(tolerance_m, 0.0)}
+    if zoom is not None:
+        return {"lod_zoom": zoom}
+    return None
+
+class RouteStatusUpdate(BaseModel):
+    status: Optional[str] = None # OPEN, BLOCKED, CONGESTED
+    risk_level: Optional[str] = None # LOW, MEDIUM, HIGH
+
 class RoutePlanRequest(BaseModel):
     name: str
     start_lat: float
     start_long: float
     end_lat: float
     end_long: float
+    alternatives: int = Field(1, ge=1, le=MAX_ALTERNATIVES) # >1: plan the best-ranked of k alternatives
+    risk_aversion: float = Field(1.0, ge=0) # Extra cost of an all-high-risk route, as a share of its travel time
+    depart_hour: Optional[int] = Field(None, ge=0, le=23)
+
+class RouteAlternativesRequest(BaseModel):
+    start_lat: float
+    start_long: float
+    end_lat: float
+    end_long: float
+    k: int = Field(3, ge=1, le=MAX_ALTERNATIVES)
+    risk_aversion: float = Field(1.0, ge=0)
+    depart_hour: Optional[int] = Field(None, ge=0, le=23)
+    refresh: bool = False # Re-plan the paths instead of re-ranking cached ones
+
+class RouteAlternative(BaseModel):
+    rank: int
+    distance_km: float
+    duration_hours: float
+    adjusted_duration_hours: float # With time-of-day and congestion factors
+    aggregate_risk: float # Risk-weighted share of the length: 0 (low risk) to 1 (high risk)
+    risk_km: float
+    congested_km: float
+    blocked: bool # Runs along a BLOCKED route; always ranked last
+    score: float
+    source: Optional[str] = None # "osrm" or "offline"
+    waypoints: List[List[float]]
+
+class RouteAlternatives(BaseModel):
+    alternatives: List[RouteAlternative]
+    cached: bool # Paths came from the candidate cache and were only re-ranked
+
+MAX_MATRIX_POINTS = 100
+
+class RouteMatrixRequest(BaseModel):
+    origins: List[Tuple[float, float]] = Field(..., min_length=1, max_length=MAX_MATRIX_POINTS) # [lat, long]
+    destinations: List[Tuple[float, float]] = Field(..., min_length=1, max_length=MAX_MATRIX_POINTS)
+
+class RouteMatrix(BaseModel):
+    distance_km: List[List[Optional[float]]] # [origin][destination], null where unroutable
+    duration_hours: List[List[Optional[float]]]
+    source: Optional[str] = None # "osrm", "offline" or "offline+osrm"
+    unique_pairs: int
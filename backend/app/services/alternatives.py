@@ -0,0 +1,189 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.models.route import Route
+from app.services.rerouting import rerouting_engine
+from app.services.route_cache import route_cache_key
+from app.services.routing import get_route_alternatives
+
+MAX_ALTERNATIVES = 5
+MAX_CANDIDATE_SETS = 128 # Origin/destination pairs kept for re-ranking
+CANDIDATE_TTL_SEC = 600.0 # Paths are re-planned after this; scores never need it
+# Share of a route's length counted as risky, per risk level
+RISK_WEIGHTS = {"LOW": 0.0, "MEDIUM": 0.5, "HIGH": 1.0}
+# Extra travel time on congested stretches, as a fraction of the free-flow time
+CONGESTION_DELAY = {"CONGESTED": 0.5}
+# Travel time factor by departure hour: slow night moves, then morning/evening traffic
+TIME_OF_DAY_FACTORS = [1.3] * 5 + [1.0] * 3 + [1.2] * 3 + [1.0] * 6 + [1.2] * 3 + [1.3] * 4
+
+
+def risk_level_for(aggregate_risk: float) -> str:
+    """ Route.risk_level for a planned route's aggregate risk """
+    if aggregate_risk >= 0.5:
+        return "HIGH"
+    if aggregate_risk >= 0.2:
+        return "MEDIUM"
+    return "LOW"
+
+
+class CandidateSet:
+    """
+    Alternative routes between one origin/destination pair, with the features ranking needs.
+
+    exposure[i, j] is the km of candidate i running along label set labels[j] (the stored
+    routes sharing that road), so re-scoring for new risk, congestion or departure time
+    is a matrix-vector product; paths are never recomputed for it.
+    """
+
+    def __init__(self, routes: List[dict]):
+        self.routes = routes
+        self.distance_km = np.array([r["distance_km"] for r in routes], dtype=np.float64)
+        self.duration_hours = np.array([r["duration_hours"] for r in routes], dtype=np.float64)
+        self.created_at = time.monotonic()
+        self.labels: List[frozenset] = []
+        self.exposure = np.zeros((len(routes), 0))
+        self.graph_signature = None
+
+    def measure(self, graph, signature):
+        """ Per-label-set exposure of every candidate on the labelled road graph """
+        per_route = [graph.label_exposure(r["waypoints"]) for r in self.routes] if graph else []
+        labels = sorted({key for e in per_route for key in e}, key=sorted)
+        column = {key: j for j, key in enumerate(labels)}
+        exposure = np.zeros((len(self.routes), len(labels)))
+        for i, e in enumerate(per_route):
+            for key, km in e.items():
+                exposure[i, column[key]] = km
+        self.labels, self.exposure, self.graph_signature = labels, exposure, signature
+
+    @property
+    def route_ids(self) -> set:
+        return {route_id for key in self.labels for route_id in key}
+
+
+class AlternativeRoutes:
+    """
+    k alternative routes per origin/destination pair, ranked by travel time and risk.
+
+    Candidate sets are planned once (OSRM alternatives, then offline penalty paths) and
+    kept in an LRU keyed like the route cache. Each ranking reads the current risk level
+    and status of the routes the candidates run along and re-scores the cached features:
+
+        adjusted hours = hours x time-of-day factor x (1 + congestion delay share)
+        aggregate risk = risk-weighted km / km (0 = all low risk, 1 = all high risk)
+        score          = adjusted hours x (1 + risk_aversion x aggregate risk)
+
+    Candidates touching a BLOCKED route are kept but ranked last.
+    """
+
+    def __init__(self, max_sets: int = MAX_CANDIDATE_SETS):
+        self.max_sets = max_sets
+        self._sets: "OrderedDict[tuple, CandidateSet]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rescored = 0
+
+    async def candidates(self, db, start: List[float], end: List[float], k: int,
+                         refresh: bool = False) -> Tuple[CandidateSet, bool]:
+        """ Cached candidate set for the pair (re-planned when stale). Returns (set, cached) """
+        key = route_cache_key(f"alt{k}", start, end)
+        candidate_set = self._sets.get(key)
+        cached = (candidate_set is not None and not refresh
+                  and time.monotonic() - candidate_set.created_at < CANDIDATE_TTL_SEC)
+        if cached:
+            self.hits += 1
+            self._sets.move_to_end(key)
+        else:
+            self.misses += 1
+            candidate_set = CandidateSet(await get_route_alternatives(start, end, k))
+            # An empty set means the routers failed (or have no graph yet): don't pin that for the TTL
+            if candidate_set.routes:
+                self._sets[key] = candidate_set
+                while len(self._sets) > self.max_sets:
+                    self._sets.popitem(last=False)
+
+        # Route geometry changed since the set was measured: re-measure, keep the paths
+        graph = await rerouting_engine.labelled_graph(db)
+        if candidate_set.graph_signature is None or candidate_set.graph_signature != rerouting_engine.signature:
+            await asyncio.to_thread(candidate_set.measure, graph, rerouting_engine.signature)
+        return candidate_set, cached
+
+    async def _label_weights(self, db, candidate_set: CandidateSet) -> Dict[str, np.ndarray]:
+        """ Per-label-set risk, congestion delay and blocked flags from the routes' current state """
+        state = {}
+        if candidate_set.labels:
+            res = await db.execute(
+                select(Route.id, Route.risk_level, Route.status).where(Route.id.in_(candidate_set.route_ids))
+            )
+            state = {route_id: ((risk or "LOW").upper(), (status or "OPEN").upper()) for route_id, risk, status in res.all()}
+
+        risk, delay, blocked = [], [], []
+        for key in candidate_set.labels:
+            rows = [state[route_id] for route_id in key if route_id in state]
+            # Routes sharing a road: the road is as bad as the worst of them
+            risk.append(max((RISK_WEIGHTS.get(r, 0.0) for r, _ in rows), default=0.0))
+            delay.append(max((CONGESTION_DELAY.get(s, 0.0) for _, s in rows), default=0.0))
+            blocked.append(float(any(s == "BLOCKED" for _, s in rows)))
+        return {"risk": np.array(risk), "delay": np.array(delay), "blocked": np.array(blocked)}
+
+    def score(self, candidate_set: CandidateSet, weights: Dict[str, np.ndarray],
+              risk_aversion: float = 1.0, depart_hour: Optional[int] = None) -> List[dict]:
+        """ Rank the candidates for the given label weights; vectorized over candidates """
+        self.rescored += 1
+        km = np.maximum(candidate_set.distance_km, 1e-9)
+        risk_km = candidate_set.exposure @ weights["risk"]
+        delay_km = candidate_set.exposure @ weights["delay"]
+        blocked_km = candidate_set.exposure @ weights["blocked"]
+
+        tod = TIME_OF_DAY_FACTORS[depart_hour % 24] if depart_hour is not None else 1.0
+        adjusted = candidate_set.duration_hours * tod * (1.0 + delay_km / km)
+        aggregate_risk = np.clip(risk_km / km, 0.0, 1.0)
+        score = adjusted * (1.0 + risk_aversion * aggregate_risk)
+        blocked = blocked_km > 0
+        order = np.lexsort((score, blocked))
+
+        return [
+            {
+                "rank": rank + 1,
+                "distance_km": float(candidate_set.distance_km[i]),
+                "duration_hours": float(candidate_set.duration_hours[i]),
+                "adjusted_duration_hours": round(float(adjusted[i]), 2),
+                "aggregate_risk": round(float(aggregate_risk[i]), 3),
+                "risk_km": round(float(risk_km[i]), 2),
+                "congested_km": round(float(candidate_set.exposure[i] @ (weights["delay"] > 0)), 2),
+                "blocked": bool(blocked[i]),
+                "score": round(float(score[i]), 3),
+                "source": candidate_set.routes[i].get("source"),
+                "waypoints": candidate_set.routes[i]["waypoints"],
+            }
+            for rank, i in enumerate(order.tolist())
+        ]
+
+    async def rank(self, db, start: List[float], end: List[float], k: int = 3, risk_aversion: float = 1.0,
+                   depart_hour: Optional[int] = None, refresh: bool = False) -> dict:
+        """ Ranked alternatives for a pair: { 'alternatives': [...], 'cached': bool } """
+        candidate_set, cached = await self.candidates(db, start, end, min(max(k, 1), MAX_ALTERNATIVES), refresh)
+        weights = await self._label_weights(db, candidate_set)
+        return {
+            "alternatives": self.score(candidate_set, weights, risk_aversion, depart_hour),
+            "cached": cached,
+        }
+
+    def invalidate(self):
+        self._sets.clear()
+
+    def stats(self) -> dict:
+        return {
+            "candidate_sets": len(self._sets),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rescored": self.rescored,
+        }
+
+
+# Process-wide cache used by the routes endpoints
+alternative_routes = AlternativeRoutes()
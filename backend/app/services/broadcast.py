@@ -0,0 +1,151 @@
+import asyncio
+import json
+from typing import Optional, Set
+
+from app.services.position_frames import EncodedFrame
+
+POSITIONS_CHANNEL = "positions"
+STATS_CHANNEL = "positions:stats" # Simulation scheduler stats, relayed alongside the frames
+FRAME_FORMATS = ("binary", "json")
+
+
+class Subscription:
+    """
+    One client's pending frames: at most the keyframe it still has to receive and the
+    newest delta. A slow client's stale deltas are overwritten (conflated) rather than
+    queued, so it never falls behind or stalls other subscribers.
+    """
+
+    def __init__(self, frame_format: str = "binary"):
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"Unknown frame format '{frame_format}'")
+        self.frame_format = frame_format
+        self.dropped = 0
+        self._keyframe: Optional[EncodedFrame] = None
+        self._delta: Optional[EncodedFrame] = None
+        self._ready = asyncio.Event()
+
+    def offer(self, frame: EncodedFrame) -> int:
+        """ Queue a frame, replacing anything it makes obsolete. Returns the number of frames dropped """
+        dropped = 0
+        if frame.is_keyframe:
+            dropped = (self._keyframe is not None) + (self._delta is not None)
+            self._keyframe, self._delta = frame, None
+        else:
+            dropped = int(self._delta is not None)
+            self._delta = frame
+        self.dropped += dropped
+        self._ready.set()
+        return dropped
+
+    async def next_frame(self):
+        """ Next payload in this subscriber's format (bytes for binary, str for JSON) """
+        while self._keyframe is None and self._delta is None:
+            self._ready.clear()
+            await self._ready.wait()
+        if self._keyframe is not None:
+            frame, self._keyframe = self._keyframe, None
+        else:
+            frame, self._delta = self._delta, None
+        return frame.binary if self.frame_format == "binary" else frame.json
+
+
+class PositionBroadcaster:
+    """
+    In-memory fan-out of position frames to WebSocket/SSE subscribers.
+    publish() never awaits a client, so one slow consumer cannot delay the tick or other clients.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+        self.last_keyframe: Optional[EncodedFrame] = None
+        self.last_delta: Optional[EncodedFrame] = None
+        self.frames_published = 0
+        self.frames_dropped = 0
+        self.simulation_stats: Optional[dict] = None # Latest scheduler stats of the simulation feeding this stream
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, frame_format: str = "binary") -> Subscription:
+        sub = Subscription(frame_format)
+        # Late joiners start from the cached keyframe and the newest delta on top of it
+        if self.last_keyframe is not None:
+            sub.offer(self.last_keyframe)
+        if self.last_delta is not None:
+            sub.offer(self.last_delta)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+
+    def publish(self, frame: EncodedFrame):
+        if frame.is_keyframe:
+            self.last_keyframe, self.last_delta = frame, None
+        elif self.last_keyframe is not None:
+            self.last_delta = frame
+        else:
+            return # Delta without its keyframe (relay joined mid-stream); wait for the next keyframe
+        self.frames_published += 1
+        for sub in self._subscribers:
+            self.frames_dropped += sub.offer(frame)
+
+
+# Process-wide broadcaster used by the streaming endpoints
+position_broadcaster = PositionBroadcaster()
+
+
+class RedisFramePublisher:
+    """
+    Publishes frames from a standalone simulation process to Redis pub/sub,
+    where the API process relays them into its in-memory broadcaster.
+    """
+
+    def __init__(self, redis_url: str, channel: str = POSITIONS_CHANNEL, stats_channel: str = STATS_CHANNEL):
+        import redis.asyncio as aioredis
+        self._redis = aioredis.from_url(redis_url)
+        self.channel = channel
+        self.stats_channel = stats_channel
+        self._failing = False
+
+    async def publish(self, frame: EncodedFrame):
+        await self._send(self.channel, frame.binary)
+
+    async def publish_stats(self, stats: dict):
+        await self._send(self.stats_channel, json.dumps(stats))
+
+    async def _send(self, channel: str, payload):
+        try:
+            await self._redis.publish(channel, payload)
+            self._failing = False
+        except Exception as e:
+            # Streaming is best-effort; never fail a simulation tick over it (log once per outage)
+            if not self._failing:
+                print(f"Position stream publish failed: {e}")
+            self._failing = True
+
+
+async def relay_redis_frames(redis_url: str, broadcaster: PositionBroadcaster, channel: str = POSITIONS_CHANNEL,
+                             stats_channel: str = STATS_CHANNEL):
+    """ API-side task: feed frames (and scheduler stats) published by the simulation process into the broadcaster """
+    import redis.asyncio as aioredis
+
+    while True:
+        try:
+            client = aioredis.from_url(redis_url)
+            pubsub = client.pubsub()
+            await pubsub.subscribe(channel, stats_channel)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                if message["channel"] in (stats_channel, stats_channel.encode()):
+                    broadcaster.simulation_stats = json.loads(message["data"])
+                else:
+                    broadcaster.publish(EncodedFrame(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Position stream relay error: {e}; reconnecting in 5s")
+            await asyncio.sleep(5)
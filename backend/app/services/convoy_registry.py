@@ -0,0 +1,194 @@
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.asset import TransportAsset
+from app.models.convoy import Convoy
+from app.models.route import Route
+from app.services.geometry import RouteGeometry, route_geometry_cache, unpack_waypoints, unpack_chainage
+
+# Safety sweep for changes made outside the ORM (raw SQL, other tools)
+MEMBERSHIP_REFRESH_SEC = 60.0
+
+# Convoy order of march. Rear QRT shares the role name with the front QRT,
+# so ties keep the order the roles were assigned in.
+FORMATION_PRIORITY = {
+    "ROP": 1,
+    "QRT": 2, # Front QRT
+    "TECH": 3,
+    "CARGO": 4,
+    "AMBULANCE": 5,
+    "COMMS": 6,
+    "COMMANDER": 7,
+}
+
+
+def assign_formation_roles(asset_ids: List[int]) -> Dict[int, str]:
+    """
+    Default roles for a convoy with no roles assigned (Mock for Demo).
+    Order: ROP -> QRT -> TECH -> (CARGO...) -> AMBULANCE -> COMMS -> COMMANDER -> QRT
+    """
+    ids = sorted(asset_ids)
+    roles = {}
+    count = len(ids)
+    if count >= 1: roles[ids[0]] = "ROP"
+    if count >= 2: roles[ids[1]] = "QRT"
+    if count >= 3: roles[ids[2]] = "TECH"
+
+    # Last few
+    if count >= 5: roles[ids[-1]] = "QRT" # Rear Guard
+    if count >= 6: roles[ids[-2]] = "COMMANDER"
+    if count >= 7: roles[ids[-3]] = "COMMS"
+    if count >= 8: roles[ids[-4]] = "AMBULANCE"
+    return roles
+
+
+class ActiveConvoy:
+    """ Cached view of one IN_TRANSIT convoy: its route and formation order """
+
+    def __init__(self, convoy_id: int, version: int, route_id: Optional[int]):
+        self.convoy_id = convoy_id
+        self.version = version
+        self.route_id = route_id
+        self.formation: List[int] = [] # Asset ids, leader first
+
+    @property
+    def leader_id(self) -> int:
+        return self.formation[0]
+
+
+class ActiveConvoyRegistry:
+    """
+    In-memory registry of IN_TRANSIT convoys, their formations and route geometry.
+
+    Everything is loaded once; each refresh reads only (id, version) columns and
+    reloads the convoys or routes whose version changed. Steady-state refreshes
+    never read route waypoints from the database.
+    """
+
+    def __init__(self, membership_refresh_sec: float = MEMBERSHIP_REFRESH_SEC):
+        self.membership_refresh_sec = membership_refresh_sec
+        self.convoys: Dict[int, ActiveConvoy] = {}
+        self.geometries: Dict[int, RouteGeometry] = {}
+        self.civil_asset_ids: List[int] = []
+        self.revision = 0 # Bumped whenever any membership or geometry changes
+        self._last_sweep = 0.0
+
+    def mark_stale(self):
+        """ Force a full reload on the next refresh """
+        self._last_sweep = 0.0
+
+    async def refresh(self, db: AsyncSession):
+        full_sweep = time.monotonic() - self._last_sweep >= self.membership_refresh_sec
+
+        # 1. Cheap version probe of active convoys and their routes (no JSON columns)
+        probe = (
+            select(Convoy.id, Convoy.version, Convoy.route_id, Route.version)
+            .outerjoin(Route, Convoy.route_id == Route.id)
+            .where(Convoy.status == "IN_TRANSIT")
+        )
+        rows = (await db.execute(probe)).all()
+
+        active_ids = set()
+        reload_ids = []
+        route_versions: Dict[int, int] = {}
+        for convoy_id, version, route_id, route_version in rows:
+            active_ids.add(convoy_id)
+            cached = self.convoys.get(convoy_id)
+            if full_sweep or cached is None or cached.version != version or cached.route_id != route_id:
+                self.convoys[convoy_id] = ActiveConvoy(convoy_id, version, route_id)
+                reload_ids.append(convoy_id)
+            if route_id is not None:
+                route_versions[route_id] = route_version or 0
+
+        removed = [c for c in self.convoys if c not in active_ids]
+        for convoy_id in removed:
+            del self.convoys[convoy_id]
+        if reload_ids or removed:
+            self.revision += 1
+
+        # 2. Reload formations only for new/changed convoys
+        if reload_ids:
+            await self._load_formations(db, reload_ids)
+
+        # 3. Load geometry only for routes whose version is not cached
+        await self._load_geometries(db, route_versions)
+
+        # 4. Civil traffic membership changes rarely; pick it up on the sweep
+        if full_sweep:
+            res = await db.execute(
+                select(TransportAsset.id).where(TransportAsset.asset_source == "CIVIL_OBSERVED")
+            )
+            civil_asset_ids = list(res.scalars().all())
+            if civil_asset_ids != self.civil_asset_ids:
+                self.civil_asset_ids = civil_asset_ids
+                self.revision += 1
+            self._last_sweep = time.monotonic()
+
+    async def _load_formations(self, db: AsyncSession, convoy_ids: List[int]):
+        res = await db.execute(
+            select(TransportAsset.id, TransportAsset.convoy_id, TransportAsset.role)
+            .where(TransportAsset.convoy_id.in_(convoy_ids))
+        )
+        members: Dict[int, List[Tuple[int, str]]] = {c: [] for c in convoy_ids}
+        for asset_id, convoy_id, role in res.all():
+            members[convoy_id].append((asset_id, role or "CARGO"))
+
+        role_updates = []
+        for convoy_id, assets in members.items():
+            # Assign Roles if missing
+            if assets and not any(role != "CARGO" for _, role in assets):
+                roles = assign_formation_roles([a for a, _ in assets])
+                assets = [(a, roles.get(a, role)) for a, role in sorted(assets)]
+                role_updates.extend({"b_id": a, "b_role": r} for a, r in roles.items())
+
+            # Sort Assets by Formation Order (ROP always leads)
+            ordered = sorted(assets, key=lambda a: FORMATION_PRIORITY.get(a[1], 4))
+            self.convoys[convoy_id].formation = [a for a, _ in ordered]
+
+        if role_updates:
+            table = TransportAsset.__table__
+            await db.execute(
+                update(table).where(table.c.id == bindparam("b_id")).values(role=bindparam("b_role")),
+                role_updates
+            )
+
+    async def _load_geometries(self, db: AsyncSession, route_versions: Dict[int, int]):
+        missing = []
+        found = {}
+        for route_id, version in route_versions.items():
+            geometry = route_geometry_cache.peek(route_id, version)
+            if geometry is None:
+                missing.append(route_id)
+            else:
+                found[route_id] = geometry
+
+        for route_id, geometry in found.items():
+            if self.geometries.get(route_id) is not geometry:
+                self.geometries[route_id] = geometry
+                self.revision += 1
+
+        if missing:
+            res = await db.execute(
+                select(Route.id, Route.version, Route.waypoints_packed, Route.chainage_packed).where(Route.id.in_(missing))
+            )
+            for route_id, version, packed, chainage in res.all():
+                self.geometries[route_id] = route_geometry_cache.put(
+                    route_id, version or 0, unpack_waypoints(packed), unpack_chainage(chainage)
+                )
+            self.revision += 1
+
+        for route_id in [r for r in self.geometries if r not in route_versions]:
+            del self.geometries[route_id]
+
+    def formations(self) -> List[ActiveConvoy]:
+        """ Active convoys that can move: a route with geometry and at least one asset """
+        return [
+            c for c in self.convoys.values()
+            if c.formation and c.route_id in self.geometries and self.geometries[c.route_id].num_points >= 2
+        ]
+
+    def fleet_formations(self) -> List[tuple]:
+        """ Formations in the (route key, geometry, asset ids) form taken by FleetSimulator.sync """
+        return [(c.route_id, self.geometries[c.route_id], c.formation) for c in self.formations()]
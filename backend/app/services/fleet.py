@@ -0,0 +1,111 @@
+import random
+import numpy as np
+from typing import Iterable, List, Optional, Tuple
+
+from app.services.geometry import RouteGeometry
+from app.services.kinematics import FleetKinematics
+
+CIVIL_ROUTE_KEY = "civil" # Kinematics route key for the shared civil traffic route
+
+# (route key, route geometry, formation asset ids with the leader first)
+ConvoyFormation = Tuple[int, RouteGeometry, List[int]]
+
+
+class FleetSimulator:
+    """
+    In-memory simulation of civil traffic and convoy formations (no database).
+
+    sync() tells it which assets exist; advance() moves civil traffic and convoy
+    leaders along their routes and places followers at fixed gaps behind them,
+    returning one position frame for the whole fleet.
+    """
+
+    def __init__(self, base_speed_kmh: float, gap_km: float, rng: Optional[random.Random] = None):
+        self.base_speed_kmh = base_speed_kmh
+        self.gap_km = gap_km
+        self.rng = rng or random.Random()
+        self.kinematics = FleetKinematics()
+
+        self._civil_ids: List[int] = []
+        self._leader_ids: List[int] = []
+        self._leader_routes = {} # leader id -> route key it is driving
+        self._follower_counts: List[int] = []
+        self._follower_ids = np.zeros(0, dtype=np.int64)
+
+    def set_civil_route(self, geometry: RouteGeometry):
+        self.kinematics.add_route(CIVIL_ROUTE_KEY, geometry)
+
+    def sync(self, civil_asset_ids: Iterable[int], formations: Iterable[ConvoyFormation]):
+        """ Register new assets/routes and forget the ones that left the simulation """
+        kinematics = self.kinematics
+        moving_ids = []
+
+        self._civil_ids = []
+        if kinematics.has_route(CIVIL_ROUTE_KEY):
+            civil_length_km = kinematics.route_length_km(CIVIL_ROUTE_KEY)
+            for asset_id in civil_asset_ids:
+                if not kinematics.has_asset(asset_id):
+                    # Initialize at random point on route if new
+                    kinematics.add_asset(
+                        asset_id, CIVIL_ROUTE_KEY,
+                        chainage_km=self.rng.uniform(0.0, civil_length_km),
+                        speed_kmh=float(self.rng.randint(40, 90))
+                    )
+                self._civil_ids.append(asset_id)
+                moving_ids.append(asset_id)
+
+        self._leader_ids = []
+        self._follower_counts = []
+        follower_ids = []
+        leader_routes = {}
+        route_keys = [CIVIL_ROUTE_KEY]
+        for route_key, geometry, formation in formations:
+            # Register the route's geometry (once per version) and the Lead Vehicle (ROP)
+            if kinematics.route_geometry(route_key) is not geometry:
+                kinematics.add_route(route_key, geometry, rebuild=False)
+            route_keys.append(route_key)
+
+            leader_id = formation[0]
+            if not kinematics.has_asset(leader_id) or self._leader_routes.get(leader_id) != route_key:
+                # Initialize leader at the start of its route (a detour starts where the convoy is)
+                kinematics.add_asset(leader_id, route_key, chainage_km=0.0, speed_kmh=self.base_speed_kmh)
+            leader_routes[leader_id] = route_key
+            moving_ids.append(leader_id)
+
+            self._leader_ids.append(leader_id)
+            self._follower_counts.append(len(formation) - 1)
+            follower_ids.extend(formation[1:])
+
+        self._follower_ids = np.asarray(follower_ids, dtype=np.int64)
+        self._leader_routes = leader_routes
+        # Forget assets that left the simulation (convoy completed, asset removed) and the
+        # routes (old versions, finished detours) no formation drives any more, then lay the
+        # remaining routes out on the shared axis once for the whole sync
+        kinematics.retain(moving_ids)
+        kinematics.retain_routes(route_keys)
+
+    def advance_leaders(self, dt_sec: float):
+        """ Advance civil traffic and convoy leaders by dt, in one vectorized step """
+        self.kinematics.step(dt_sec)
+        return self.kinematics.positions()
+
+    def place_followers(self):
+        """
+        Follower k sits at leader chainage - k * gap (wrapping like the leader),
+        resolved for every convoy at once by binary search on cumulative chainage.
+        """
+        lats, longs, bearings = self.kinematics.trailing_positions(
+            self._leader_ids, self._follower_counts, self.gap_km
+        )
+        return self._follower_ids, lats, longs, bearings
+
+    def advance(self, dt_sec: float):
+        """ One full tick: returns (asset ids, lat, long, bearing) for every simulated asset """
+        ids, lats, longs, bearings = self.advance_leaders(dt_sec)
+        if len(self._follower_ids):
+            f_ids, f_lats, f_longs, f_bearings = self.place_followers()
+            ids = np.concatenate((ids, f_ids))
+            lats = np.concatenate((lats, f_lats))
+            longs = np.concatenate((longs, f_longs))
+            bearings = np.concatenate((bearings, f_bearings))
+        return ids, lats, longs, bearings
@@ -0,0 +1,202 @@
+import numpy as np
+from collections import OrderedDict
+from typing import Optional
+
+EARTH_RADIUS_KM = 6371.0
+# Web-mercator ground resolution at the equator, zoom 0 (metres per pixel)
+EQUATOR_M_PER_PIXEL = 156543.03
+MAX_LOD_ZOOM = 22
+# Route.waypoints_packed layout: consecutive (lat, lon) little-endian float64 pairs
+WAYPOINT_DTYPE = np.dtype("<f8")
+# Average convoy road speed for durations the router did not estimate
+DEFAULT_ROAD_SPEED_KMH = 40.0
+
+
+def pack_waypoints(waypoints) -> Optional[bytes]:
+    """ [[lat, lon], ...] (or an (n, 2) array) -> packed bytes for Route.waypoints_packed """
+    if waypoints is None:
+        return None
+    pts = np.asarray(waypoints, dtype=WAYPOINT_DTYPE)
+    if pts.size and (pts.ndim != 2 or pts.shape[1] != 2):
+        raise ValueError("Waypoints must be [lat, long] pairs")
+    return pts.tobytes()
+
+
+def unpack_waypoints(blob) -> np.ndarray:
+    """ Packed bytes -> read-only (n, 2) array viewing the buffer (no copy, no per-point parsing) """
+    if not blob:
+        return np.zeros((0, 2), dtype=WAYPOINT_DTYPE)
+    return np.frombuffer(blob, dtype=WAYPOINT_DTYPE).reshape(-1, 2)
+
+
+def pack_chainage(cumulative_km) -> Optional[bytes]:
+    """ Per-point chainage (km) -> packed bytes for Route.chainage_packed """
+    if cumulative_km is None:
+        return None
+    return np.asarray(cumulative_km, dtype=WAYPOINT_DTYPE).ravel().tobytes()
+
+
+def unpack_chainage(blob) -> Optional[np.ndarray]:
+    """ Packed bytes -> read-only 1-D chainage array, or None if not stored """
+    if blob is None:
+        return None
+    return np.frombuffer(blob, dtype=WAYPOINT_DTYPE)
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """ Vectorized great-circle distance in km (inputs in degrees) """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def bearing_np(lat1, lon1, lat2, lon2):
+    """ Vectorized initial bearing in degrees (0-360) """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return (np.degrees(np.arctan2(x, y)) + 360.0) % 360.0
+
+
+def douglas_peucker_significance(lat, lon):
+    """
+    Per-vertex Douglas-Peucker significance in metres: simplifying at tolerance t keeps
+    exactly the vertices with significance > t. One pass serves every tolerance/zoom.
+    """
+    n = len(lat)
+    sig = np.zeros(n)
+    if n == 0:
+        return sig
+    sig[0] = sig[-1] = np.inf
+
+    # Local equirectangular projection is accurate to well under a metre at route scale
+    lat0 = np.radians(np.mean(lat))
+    x = np.radians(lon) * np.cos(lat0) * EARTH_RADIUS_KM * 1000.0
+    y = np.radians(lat) * EARTH_RADIUS_KM * 1000.0
+
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        a, b, cap = stack.pop()
+        if b - a < 2:
+            continue
+        px, py = x[a + 1:b] - x[a], y[a + 1:b] - y[a]
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        seg2 = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / seg2, 0.0, 1.0) if seg2 > 0 else 0.0
+        d = np.hypot(px - t * dx, py - t * dy)
+        k = int(np.argmax(d))
+        i = a + 1 + k
+        # A vertex survives only as long as the split that exposed it does
+        sig[i] = min(d[k], cap)
+        stack.append((a, i, sig[i]))
+        stack.append((i, b, sig[i]))
+    return sig
+
+
+class RouteGeometry:
+    """
+    Precomputed geometry of a route polyline.
+    Segment i runs from point i to point i+1; cumulative_km[i] is the chainage of point i.
+    A stored chainage profile (Route.chainage_packed) is reused instead of re-measuring.
+    """
+
+    def __init__(self, waypoints, route_id: Optional[int] = None, version: int = 0, cumulative_km=None):
+        pts = np.asarray(waypoints if waypoints is not None else [], dtype=np.float64).reshape(-1, 2)
+        self.route_id = route_id
+        self.version = version
+        self.lat = pts[:, 0]
+        self.lon = pts[:, 1]
+        if cumulative_km is not None and len(cumulative_km) != len(pts):
+            cumulative_km = None # Stale profile; measure again
+
+        if len(pts) >= 2:
+            if cumulative_km is not None:
+                self.segment_km = np.diff(cumulative_km)
+            else:
+                self.segment_km = haversine_np(self.lat[:-1], self.lon[:-1], self.lat[1:], self.lon[1:])
+            self.segment_bearing = bearing_np(self.lat[:-1], self.lon[:-1], self.lat[1:], self.lon[1:])
+        else:
+            self.segment_km = np.zeros(0)
+            self.segment_bearing = np.zeros(0)
+
+        if cumulative_km is not None and len(pts) >= 1:
+            self.cumulative_km = np.asarray(cumulative_km, dtype=np.float64)
+        else:
+            self.cumulative_km = np.concatenate(([0.0], np.cumsum(self.segment_km)))[:max(len(pts), 1)]
+        self.total_km = float(self.cumulative_km[-1])
+
+        self._significance = None # Douglas-Peucker significance, built on first LOD request
+        self._lods = {} # tolerance (m) -> simplified waypoint list
+
+    @property
+    def num_points(self) -> int:
+        return len(self.lat)
+
+    def tolerance_for_zoom(self, zoom: int) -> float:
+        """ One screen pixel in metres at this route's latitude and the given map zoom """
+        zoom = min(max(int(zoom), 0), MAX_LOD_ZOOM)
+        lat = float(np.mean(self.lat)) if self.num_points else 0.0
+        return EQUATOR_M_PER_PIXEL * np.cos(np.radians(lat)) / (2 ** zoom)
+
+    def simplified(self, tolerance_m: float) -> list:
+        """ [lat, lon] waypoints simplified to within tolerance_m metres (cached per tolerance) """
+        tolerance_m = round(float(tolerance_m), 1)
+        lod = self._lods.get(tolerance_m)
+        if lod is None:
+            if self._significance is None:
+                self._significance = douglas_peucker_significance(self.lat, self.lon)
+            keep = self._significance > tolerance_m
+            lod = np.column_stack((self.lat[keep], self.lon[keep])).tolist()
+            if len(self._lods) >= 2 * MAX_LOD_ZOOM:
+                self._lods.clear()
+            self._lods[tolerance_m] = lod
+        return lod
+
+
+class RouteGeometryCache:
+    """
+    LRU cache of RouteGeometry keyed by route id, invalidated by Route.version.
+    Geometry is built once per route version and shared by every consumer.
+    """
+
+    def __init__(self, max_routes: int = 512):
+        self.max_routes = max_routes
+        self._entries: "OrderedDict[int, RouteGeometry]" = OrderedDict()
+
+    def get(self, route) -> RouteGeometry:
+        """ Geometry for a Route row, rebuilt only if its version changed """
+        geometry = self.peek(route.id, route.version or 0)
+        if geometry is not None:
+            return geometry
+        return self.put(route.id, route.version or 0, route.waypoints_array, route.chainage_array)
+
+    def peek(self, route_id: int, version: int) -> Optional[RouteGeometry]:
+        """ Cached geometry if it matches the given version, without building anything """
+        geometry = self._entries.get(route_id)
+        if geometry is None or geometry.version != version:
+            return None
+        self._entries.move_to_end(route_id)
+        return geometry
+
+    def put(self, route_id: Optional[int], version: int, waypoints, cumulative_km=None) -> RouteGeometry:
+        """ Build geometry for a route version and cache it """
+        geometry = RouteGeometry(waypoints, route_id=route_id, version=version, cumulative_km=cumulative_km)
+        if route_id is not None:
+            self._entries[route_id] = geometry
+            self._entries.move_to_end(route_id)
+            while len(self._entries) > self.max_routes:
+                self._entries.popitem(last=False)
+        return geometry
+
+    def invalidate(self, route_id: int):
+        self._entries.pop(route_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Process-wide cache shared by the simulation, logistics and routing endpoints
+route_geometry_cache = RouteGeometryCache()
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated failures of one dependency.
+
+    closed: calls go through. After `failure_threshold` consecutive failures it opens.
+    open: calls are refused immediately; a background task probes the dependency with
+    exponential backoff and closes the breaker on the first successful probe. The probe
+    runs on the caller's event loop and is restarted if that loop changes (scripts that
+    call asyncio.run twice), so a dead loop cannot leave the breaker open for good.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout_sec: float,
+                 probe: Optional[Callable[[], Awaitable[bool]]] = None, max_backoff_sec: float = 300.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_sec = reset_timeout_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.probe = probe
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self._probe_task: Optional[asyncio.Task] = None
+        self._probe_loop_ref = None # Event loop the probe task runs on
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        self._start_probe() # No-op while a probe is running on this loop
+        # Without a probe, let one trial call through once the reset timeout has passed
+        if self.probe is None and time.monotonic() - self.opened_at >= self.reset_timeout_sec:
+            self.opened_at = time.monotonic()
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            print(f"Circuit '{self.name}' closed; dependency is healthy again.")
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.opened_at is None and self.consecutive_failures >= self.failure_threshold:
+            print(f"Circuit '{self.name}' opened after {self.consecutive_failures} failures; failing fast.")
+            self.opened_at = time.monotonic()
+            self._start_probe()
+
+    def _start_probe(self):
+        if self.probe is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # No running loop; the next allow() or failure on a loop starts the probe
+        if self._probe_task and not self._probe_task.done() and self._probe_loop_ref is loop:
+            return
+        self._probe_task = loop.create_task(self._probe_loop())
+        self._probe_loop_ref = loop
+
+    async def _probe_loop(self):
+        delay = self.reset_timeout_sec
+        while self.opened_at is not None:
+            await asyncio.sleep(delay)
+            try:
+                healthy = await self.probe()
+            except Exception:
+                healthy = False
+            if healthy:
+                self.record_success()
+                return
+            delay = min(delay * 2, self.max_backoff_sec)
+
+    def stats(self) -> dict:
+        return {
+            "state": "open" if self.is_open else "closed",
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+        }
+
+
+class SharedHttpClient:
+    """
+    One pooled keep-alive httpx.AsyncClient per process, with a per-host concurrency cap.
+    The client is rebuilt if the event loop changes (scripts that call asyncio.run twice).
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SEC,
+                ),
+                timeout=httpx.Timeout(settings.ROUTING_TIMEOUT_SEC, connect=settings.ROUTING_CONNECT_TIMEOUT_SEC),
+            )
+            self._loop = loop
+            self._host_slots = {}
+        return self._client
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        client = self.client()
+        host = urlsplit(url).netloc
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots[host] = asyncio.Semaphore(settings.HTTP_MAX_CONCURRENCY_PER_HOST)
+        async with slots:
+            return await client.get(url, **kwargs)
+
+    async def close(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+# Process-wide pooled client for outbound calls (routing server)
+http_client = SharedHttpClient()
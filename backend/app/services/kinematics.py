@@ -0,0 +1,260 @@
+import numpy as np
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from app.services.geometry import RouteGeometry
+
+# Gap inserted between consecutive routes on the shared chainage axis so a
+# binary search for one route can never land on a neighbouring route.
+ROUTE_SEPARATION_KM = 1.0
+
+
+class FleetKinematics:
+    """
+    Batched kinematics engine for the simulation loop.
+
+    Every registered route is laid out on one shared chainage axis, and every
+    asset is a row in flat NumPy arrays (route slot, chainage, speed), so a tick
+    advances the whole fleet with a handful of array operations and resolves
+    lat/long/bearing for all assets with a single binary search.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        # --- Route table (concatenated polylines) ---
+        self._route_slots: Dict[Hashable, int] = {}
+        self._route_geometries: List[RouteGeometry] = []
+        self._route_first_pt = np.zeros(0, dtype=np.int64)   # index of first point per slot
+        self._route_last_pt = np.zeros(0, dtype=np.int64)    # index of last point per slot
+        self._route_base_km = np.zeros(0, dtype=np.float64)  # offset on the shared axis
+        self._route_length_km = np.zeros(0, dtype=np.float64)
+        self._routes_dirty = False
+
+        self._pt_lat = np.zeros(0, dtype=np.float64)
+        self._pt_lon = np.zeros(0, dtype=np.float64)
+        self._pt_axis_km = np.zeros(0, dtype=np.float64)     # absolute position on shared axis
+        self._seg_len_km = np.zeros(0, dtype=np.float64)     # segment starting at point i
+        self._seg_bearing = np.zeros(0, dtype=np.float64)
+
+        # --- Asset state (struct of arrays) ---
+        self._rows: Dict[int, int] = {}
+        self._size = 0
+        self.asset_ids = np.zeros(initial_capacity, dtype=np.int64)
+        self.route_slot = np.zeros(initial_capacity, dtype=np.int64)
+        self.chainage_km = np.zeros(initial_capacity, dtype=np.float64)
+        self.speed_kmh = np.zeros(initial_capacity, dtype=np.float64)
+
+    # ------------------------------------------------------------------ routes
+
+    def has_route(self, route_key: Hashable) -> bool:
+        return route_key in self._route_slots
+
+    def route_geometry(self, route_key: Hashable) -> Optional[RouteGeometry]:
+        slot = self._route_slots.get(route_key)
+        return self._route_geometries[slot] if slot is not None else None
+
+    def add_route(self, route_key: Hashable, geometry: RouteGeometry, rebuild: bool = True) -> int:
+        """
+        Register (or replace) a route's precomputed geometry.
+        Returns the route slot used by the asset arrays. With rebuild=False the shared axis
+        is left stale until rebuild_routes() (or retain_routes()), so a batch of changes
+        re-concatenates the polylines once.
+        """
+        slot = self._route_slots.get(route_key)
+        if slot is None:
+            slot = len(self._route_geometries)
+            self._route_slots[route_key] = slot
+            self._route_geometries.append(geometry)
+        else:
+            self._route_geometries[slot] = geometry
+        self._routes_dirty = True
+        if rebuild:
+            self.rebuild_routes()
+        return slot
+
+    def retain_routes(self, route_keys):
+        """
+        Drop every route not in the given collection (and any asset still on one),
+        compact the remaining slots and rebuild the shared axis if anything changed.
+        """
+        keep = set(route_keys)
+        dropped = [key for key in self._route_slots if key not in keep]
+        if dropped:
+            dropped_slots = {self._route_slots[key] for key in dropped}
+            n = self._size
+            for asset_id in self.asset_ids[:n][np.isin(self.route_slot[:n], list(dropped_slots))].tolist():
+                self.remove_asset(asset_id)
+
+            remap = np.full(len(self._route_geometries), -1, dtype=np.int64)
+            slots, geometries = {}, []
+            for key, slot in sorted(self._route_slots.items(), key=lambda kv: kv[1]):
+                if slot in dropped_slots:
+                    continue
+                remap[slot] = len(geometries)
+                slots[key] = len(geometries)
+                geometries.append(self._route_geometries[slot])
+            self._route_slots, self._route_geometries = slots, geometries
+            self.route_slot[:self._size] = remap[self.route_slot[:self._size]]
+            self._routes_dirty = True
+        self.rebuild_routes()
+
+    def route_length_km(self, route_key: Hashable) -> float:
+        return float(self._route_length_km[self._route_slots[route_key]])
+
+    def rebuild_routes(self):
+        """ Re-concatenate all polylines onto the shared chainage axis (no-op when unchanged) """
+        if not self._routes_dirty:
+            return
+        self._routes_dirty = False
+        lats, lons, axis, seg_len, seg_bearing = [], [], [], [], []
+        first, last, base, length = [], [], [], []
+        offset_pts = 0
+        offset_km = 0.0
+
+        for geom in self._route_geometries:
+            n = geom.num_points
+            seg = geom.segment_km
+            brg = geom.segment_bearing
+
+            lats.append(geom.lat)
+            lons.append(geom.lon)
+            axis.append(offset_km + geom.cumulative_km[:n])
+            # Pad so segment arrays line up with point arrays (last point has no segment)
+            seg_len.append(np.append(seg, 0.0))
+            seg_bearing.append(np.append(brg, brg[-1] if len(brg) else 0.0))
+
+            first.append(offset_pts)
+            last.append(offset_pts + max(n - 1, 0))
+            base.append(offset_km)
+            length.append(geom.total_km)
+
+            offset_pts += n
+            offset_km += length[-1] + ROUTE_SEPARATION_KM
+
+        self._pt_lat = np.concatenate(lats) if lats else np.zeros(0)
+        self._pt_lon = np.concatenate(lons) if lons else np.zeros(0)
+        self._pt_axis_km = np.concatenate(axis) if axis else np.zeros(0)
+        self._seg_len_km = np.concatenate(seg_len) if seg_len else np.zeros(0)
+        self._seg_bearing = np.concatenate(seg_bearing) if seg_bearing else np.zeros(0)
+        self._route_first_pt = np.asarray(first, dtype=np.int64)
+        self._route_last_pt = np.asarray(last, dtype=np.int64)
+        self._route_base_km = np.asarray(base, dtype=np.float64)
+        self._route_length_km = np.asarray(length, dtype=np.float64)
+
+    # ------------------------------------------------------------------ assets
+
+    def __len__(self):
+        return self._size
+
+    def has_asset(self, asset_id: int) -> bool:
+        return asset_id in self._rows
+
+    def add_asset(self, asset_id: int, route_key: Hashable, chainage_km: float = 0.0, speed_kmh: float = 0.0):
+        """ Place an asset on a registered route (or move it to a new one) """
+        slot = self._route_slots[route_key]
+        row = self._rows.get(asset_id)
+        if row is None:
+            if self._size == len(self.asset_ids):
+                self._grow()
+            row = self._size
+            self._rows[asset_id] = row
+            self._size += 1
+        self.asset_ids[row] = asset_id
+        self.route_slot[row] = slot
+        self.chainage_km[row] = chainage_km
+        self.speed_kmh[row] = speed_kmh
+
+    def remove_asset(self, asset_id: int):
+        """ Drop an asset, filling its row with the last one (O(1)) """
+        row = self._rows.pop(asset_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            moved_id = int(self.asset_ids[last])
+            for arr in (self.asset_ids, self.route_slot, self.chainage_km, self.speed_kmh):
+                arr[row] = arr[last]
+            self._rows[moved_id] = row
+        self._size -= 1
+
+    def retain(self, asset_ids):
+        """ Remove every asset not in the given collection """
+        keep = set(asset_ids)
+        for asset_id in [a for a in self._rows if a not in keep]:
+            self.remove_asset(asset_id)
+
+    def row_of(self, asset_id: int) -> int:
+        return self._rows[asset_id]
+
+    def _grow(self):
+        capacity = max(1, len(self.asset_ids)) * 2
+        self.asset_ids = np.resize(self.asset_ids, capacity)
+        self.route_slot = np.resize(self.route_slot, capacity)
+        self.chainage_km = np.resize(self.chainage_km, capacity)
+        self.speed_kmh = np.resize(self.speed_kmh, capacity)
+
+    # ----------------------------------------------------------------- physics
+
+    def step(self, dt_sec: float):
+        """ Advance every asset by speed * dt, looping back at the end of its route """
+        n = self._size
+        if n == 0:
+            return
+        chainage = self.chainage_km[:n]
+        chainage += self.speed_kmh[:n] * (dt_sec / 3600.0)
+
+        length = self._route_length_km[self.route_slot[:n]]
+        # Loop back to the route start (same behaviour as the original per-asset loop)
+        np.fmod(chainage, length, out=chainage, where=length > 0)
+        chainage[length <= 0] = 0.0
+
+    def locate(self, route_slot: np.ndarray, chainage_km: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Resolve (route slot, chainage) pairs into positions with one binary search.
+        Returns (lat, long, bearing, segment index within route, km into segment).
+        """
+        first = self._route_first_pt[route_slot]
+        last = self._route_last_pt[route_slot]
+        axis_km = self._route_base_km[route_slot] + chainage_km
+
+        idx = np.searchsorted(self._pt_axis_km, axis_km, side="right") - 1
+        # Stay on a real segment of this route (single-point routes collapse to their point)
+        idx = np.clip(idx, first, np.maximum(last - 1, first))
+
+        progress = axis_km - self._pt_axis_km[idx]
+        seg_len = self._seg_len_km[idx]
+        frac = np.divide(progress, seg_len, out=np.zeros_like(progress), where=seg_len > 0)
+        np.clip(frac, 0.0, 1.0, out=frac)
+
+        nxt = np.minimum(idx + 1, last)
+        lat = self._pt_lat[idx] + (self._pt_lat[nxt] - self._pt_lat[idx]) * frac
+        lon = self._pt_lon[idx] + (self._pt_lon[nxt] - self._pt_lon[idx]) * frac
+        bearing = self._seg_bearing[idx]
+        return lat, lon, bearing, idx - first, progress
+
+    def positions(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """ Returns (asset ids, lat, long, bearing) for the whole fleet """
+        n = self._size
+        lat, lon, bearing, _, _ = self.locate(self.route_slot[:n], self.chainage_km[:n])
+        return self.asset_ids[:n].copy(), lat, lon, bearing
+
+    def trailing_positions(self, leader_ids, follower_counts, gap_km: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Positions of vehicles trailing each leader at fixed gaps.
+        Follower k of a leader is placed at (leader chainage - k * gap_km), wrapped
+        onto the route like the leader itself. Results are concatenated per leader,
+        in order, each follower costing one O(log n) lookup.
+        """
+        counts = np.asarray(follower_counts, dtype=np.int64)
+        rows = np.fromiter((self._rows[a] for a in leader_ids), dtype=np.int64, count=len(counts))
+
+        follower_rows = np.repeat(rows, counts)
+        # k = 1..count for each leader
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        k = np.arange(len(follower_rows)) - starts + 1
+
+        slots = self.route_slot[follower_rows]
+        length = self._route_length_km[slots]
+        chainage = self.chainage_km[follower_rows] - k * gap_km
+        chainage = np.mod(chainage, length, out=np.zeros_like(chainage), where=length > 0)
+
+        lat, lon, bearing, _, _ = self.locate(slots, chainage)
+        return lat, lon, bearing
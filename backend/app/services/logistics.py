@@ -5,7 +5,8 @@ from sqlalchemy.orm import selectinload
 from app.models.convoy import Convoy
 from app.models.logistics import LogisticsIndent
 from app.models.checkpoint import Checkpoint
-from datetime import datetime
+from app.services.geometry import route_geometry_cache
+from datetime import datetime, timedelta
 import math
 
 # Constants for Calculation
@@ -13,6 +14,14 @@ AVG_MPG_TRUCK = 3.0 # km/l
 AVG_MPG_LIGHT = 10.0 # km/l
 OIL_RATIO = 0.05 # 5% of fuel
 RESERVE_FACTOR = 1.25 # 25% Reserve
+DEFAULT_LEG_KM = 300.0 # Assumed leg when a route has no usable geometry
+
+def _planned_arrival(convoy: Convoy) -> datetime:
+    """ Start time plus the route's stored driving time (now, if either is unknown) """
+    start = convoy.start_time or datetime.utcnow()
+    if convoy.route is not None and convoy.route.duration_hours:
+        return start + timedelta(hours=convoy.route.duration_hours)
+    return start
 
 async def calculate_and_indent_fol(convoy_id: int, db: AsyncSession):
     """
@@ -36,13 +45,10 @@ async def calculate_and_indent_fol(convoy_id: int, db: AsyncSession):
     total_petrol = 0.0
     total_pax = 0
     
-    # We need route distance. If not stored, we estimate or use cached metrics.
-    # For now, let's assume route has waypoints and calc straight-ish distance or use a stored 'distance_km' if we added it.
-    # We didn't add distance_km to Route model yet, so we calc via Haversine sum or just use a dummy '300km' reference 
-    # if route metrics aren't hydrated.
-    # Better: Use the service routing.py if we want real distance. 
-    # For MVP speed, let's assume a standard 300km "Leg"
-    route_distance_km = 300.0 
+    # Route distance is stored when the route is planned; older rows fall back to the geometry
+    route_distance_km = convoy.route.distance_km or route_geometry_cache.get(convoy.route).total_km
+    if route_distance_km <= 0:
+        route_distance_km = DEFAULT_LEG_KM
     
     for asset in convoy.assets:
         # Simple Logic
@@ -77,7 +83,7 @@ async def calculate_and_indent_fol(convoy_id: int, db: AsyncSession):
         oil_liters=round(total_oil, 1),
         accommodation_personnel=total_pax,
         status="PENDING",
-        arrival_time_est=convoy.estimated_arrival_time or datetime.utcnow()
+        arrival_time_est=convoy.estimated_arrival_time or _planned_arrival(convoy)
     )
     
     db.add(indent)
@@ -1,86 +1,489 @@
+import time
+import numpy as np
 from ortools.linear_solver import pywraplp
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+MODES = ("mip", "heuristic", "anytime")
+HEURISTIC_STRATEGIES = ("bfd", "ffd")
+DEFAULT_VOLUME_CAPACITY = 999999 # Vehicles without a volume capacity
+MAX_MIP_BINARIES = 100_000 # Larger models are not worth handing to CBC; the heuristic plan stands
+MAX_CG_ITERATIONS = 200 # Column generation rounds for the aggregated model
+CG_TIME_SHARE = 0.5 # Share of the time limit column generation may use; the integer master gets the rest
+EPS = 1e-9
+
+
+def _capacities(vehicles: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    cap_w = np.array([v['capacity_weight'] for v in vehicles], dtype=np.float64)
+    cap_v = np.array([v.get('capacity_volume', DEFAULT_VOLUME_CAPACITY) for v in vehicles], dtype=np.float64)
+    return cap_w, cap_v
+
+
+def _sizes(cargo_items: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    w = np.array([c['weight'] for c in cargo_items], dtype=np.float64)
+    v = np.array([c.get('volume', 0) for c in cargo_items], dtype=np.float64)
+    return w, v
+
+
+def _capacity_bound(total_w: float, total_v: float, cap_w: np.ndarray, cap_v: np.ndarray) -> int:
+    """ Fewest of these vehicles whose combined weight and volume capacity could hold the totals """
+    bound = 1
+    for total, caps in ((total_w, cap_w), (total_v, cap_v)):
+        cumulative = np.cumsum(np.sort(caps)[::-1])
+        bound = max(bound, int(np.searchsorted(cumulative, total - EPS)) + 1)
+    return min(bound, len(cap_w))
+
+
+def vehicle_lower_bound(cargo_items: List[Dict], vehicles: List[Dict]) -> int:
+    """ Fewest vehicles whose combined weight and volume capacity could hold all the cargo """
+    if not cargo_items:
+        return 0
+    w, v = _sizes(cargo_items)
+    return _capacity_bound(w.sum(), v.sum(), *_capacities(vehicles))
+
+
+def pack_heuristic(cargo_items: List[Dict], vehicles: List[Dict], strategy: str = "bfd") -> Optional[List[int]]:
+    """
+    First-fit ("ffd") or best-fit ("bfd") decreasing packing on weight and volume.
+    Items go largest first (relative to the average vehicle); a new vehicle is opened,
+    largest first, only when no open one has room. Returns a vehicle index per item,
+    or None if some item fits in no remaining vehicle.
+    """
+    w, v = _sizes(cargo_items)
+    cap_w, cap_v = _capacities(vehicles)
+    scale_w = cap_w.mean() if len(cap_w) and cap_w.mean() > 0 else 1.0
+    scale_v = cap_v.mean() if len(cap_v) and cap_v.mean() > 0 else 1.0
+
+    item_order = np.argsort(-np.maximum(w / scale_w, v / scale_v), kind="stable")
+    closed = list(np.argsort(-(cap_w / scale_w + cap_v / scale_v), kind="stable"))
+    rem_w, rem_v = cap_w.copy(), cap_v.copy()
+    opened: List[int] = []
+    assignment = [-1] * len(cargo_items)
+
+    for i in item_order.tolist():
+        j = -1
+        if opened:
+            idx = np.asarray(opened)
+            fits = idx[(rem_w[idx] >= w[i] - EPS) & (rem_v[idx] >= v[i] - EPS)]
+            if len(fits):
+                if strategy == "ffd":
+                    j = int(fits[0])
+                else:
+                    # Tightest fit: least normalized room left after loading
+                    slack = (rem_w[fits] - w[i]) / scale_w + (rem_v[fits] - v[i]) / scale_v
+                    j = int(fits[np.argmin(slack)])
+        if j < 0:
+            for pos, candidate in enumerate(closed):
+                if cap_w[candidate] >= w[i] - EPS and cap_v[candidate] >= v[i] - EPS:
+                    j = int(closed.pop(pos))
+                    opened.append(j)
+                    break
+            else:
+                return None
+        rem_w[j] -= w[i]
+        rem_v[j] -= v[i]
+        assignment[i] = j
+    return assignment
+
 
 class LoadOptimizer:
-    def __init__(self):
+    """
+    Vehicle load planner. Every call builds and solves its own model, so one optimizer
+    (or one worker process) can serve any number of requests without state piling up.
+
+    Modes:
+      mip       - the exact x[i, j] model, as before
+      heuristic - best/first-fit decreasing only (milliseconds, any size)
+      anytime   - heuristic first, then the MIP tries to beat it within the time limit
+    """
+
+    def __init__(self, solver_name: str = 'CBC'):
         # 'CBC' (Coin-or Branch and Cut) is the standard open-source MIP solver included with OR-Tools.
         # SCIP sometimes requires manual installation or specific license.
-        self.solver = pywraplp.Solver.CreateSolver('CBC')
+        self.solver_name = solver_name
 
-    def optimize_load(self, cargo_items: List[Dict], vehicles: List[Dict]) -> Dict[str, Any]:
+    def optimize_load(self, cargo_items: List[Dict], vehicles: List[Dict], time_limit_sec: Optional[float] = None,
+                      mode: str = "anytime", strategy: str = "bfd",
+                      on_incumbent: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """
         Solves the Bin Packing Problem to minimize the number of vehicles used.
+        With a time limit the best plan found so far is returned as FEASIBLE.
+        on_incumbent receives the heuristic plan (same shape as the result) while the MIP runs.
+        """
+        print(f"Starting Optimization for {len(cargo_items)} items and {len(vehicles)} vehicles ({mode})...")
+        started = time.perf_counter()
+        lower_bound = vehicle_lower_bound(cargo_items, vehicles)
+
+        # 1. Heuristic packing (also the incumbent the MIP has to beat)
+        heuristic = None
+        if mode != "mip":
+            best = None
+            for name in ([strategy] + [s for s in HEURISTIC_STRATEGIES if s != strategy]):
+                assignment = pack_heuristic(cargo_items, vehicles, name)
+                if assignment is not None and (best is None or len(set(assignment)) < len(set(best[1]))):
+                    best = (name, assignment)
+                if best is not None and len(set(best[1])) <= lower_bound:
+                    break # Already optimal
+            heuristic = best
+
+        plan, method, proven = None, None, False
+        if heuristic is not None:
+            method, plan = heuristic
+            proven = len(set(plan)) <= lower_bound
+        heuristic_vehicles = len(set(plan)) if plan is not None else None
+
+        def plan_result():
+            used = len(set(plan))
+            bound = used if proven or used <= lower_bound else lower_bound
+            result = {
+                "status": "OPTIMAL" if bound == used else "FEASIBLE",
+                "total_vehicles_used": used,
+                "assignments": {},
+                "method": method,
+                "heuristic_vehicles": heuristic_vehicles,
+                "lower_bound": bound,
+                "gap": round((used - bound) / used, 4) if used else 0.0,
+                "solve_time_sec": round(time.perf_counter() - started, 3),
+            }
+            for j in sorted(set(plan)):
+                result["assignments"][vehicles[j]['id']] = []
+            for i, j in enumerate(plan):
+                result["assignments"][vehicles[j]['id']].append(cargo_items[i])
+            return result
+
+        # 2. MIP, warm-started from the heuristic plan
+        run_mip = mode == "mip" or (mode == "anytime" and not proven)
+        if run_mip and len(cargo_items) * len(vehicles) > MAX_MIP_BINARIES and plan is not None:
+            run_mip = False # Too large for CBC; the heuristic plan stands
+        budget = time_limit_sec - (time.perf_counter() - started) if time_limit_sec else None
+        if budget is not None and budget <= 0 and plan is not None:
+            run_mip = False
+        if run_mip:
+            if on_incumbent is not None and plan is not None:
+                on_incumbent(plan_result())
+            solved = self._solve_mip(cargo_items, vehicles, budget, incumbent=plan)
+            if solved is None:
+                print("ERROR: Solver could not be initialized.")
+                if plan is None:
+                    return {"error": "Solver not initialized"}
+            else:
+                status, assignment, best_bound = solved
+                if assignment is not None:
+                    plan, method = assignment, "mip"
+                if status == "OPTIMAL" or (status == "INFEASIBLE" and plan is not None):
+                    # Infeasible with a cutoff below the incumbent: nothing beats the heuristic
+                    proven = True
+                if best_bound is not None:
+                    lower_bound = max(lower_bound, int(np.ceil(best_bound - 1e-6)))
+
+        if plan is None:
+            return {"status": "INFEASIBLE/FAILED", "details": "Could not find an optimal solution."}
+
+        return plan_result()
+
+    def optimize_aggregated(self, cargo_classes: List[Dict], vehicle_types: List[Dict],
+                            time_limit_sec: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Load plan for fleets of identical vehicles carrying cargo in identical units.
+
+        Instead of one column per physical vehicle (and the symmetry that brings), the model
+        works with loading patterns: how many units of each class one vehicle of a type carries.
+        Column generation finds the patterns worth using (the master LP picks how many vehicles
+        run each pattern; a small knapsack per type prices new ones from its duals), the
+        integer master over those patterns fixes the counts, and the result is disaggregated
+        to concrete vehicle and item ids. Size depends on the number of types and classes,
+        not on the number of vehicles.
+        """
+        print(f"Starting Optimization for {len(cargo_classes)} cargo classes and {len(vehicle_types)} vehicle types...")
+        started = time.perf_counter()
+        w = np.array([c['weight'] for c in cargo_classes], dtype=np.float64)
+        v = np.array([c.get('volume', 0) for c in cargo_classes], dtype=np.float64)
+        quantity = np.array([c['quantity'] for c in cargo_classes], dtype=np.int64)
+        cap_w, cap_v = _capacities(vehicle_types)
+        count = np.array([t['count'] for t in vehicle_types], dtype=np.int64)
+
+        # Units of class c one vehicle of type t can carry on its own
+        with np.errstate(divide="ignore", invalid="ignore"):
+            by_w = np.where(w[:, None] > 0, np.floor((cap_w[None, :] + EPS) / w[:, None]), np.inf)
+            by_v = np.where(v[:, None] > 0, np.floor((cap_v[None, :] + EPS) / v[:, None]), np.inf)
+        max_units = np.minimum(np.minimum(by_w, by_v), quantity[:, None]).astype(np.int64)
+        if (max_units.max(axis=1, initial=0) == 0).any() or not len(vehicle_types):
+            return {"status": "INFEASIBLE/FAILED", "details": "Some cargo class fits no vehicle type."}
+
+        # 1. Initial patterns: each type filled with a single class
+        patterns: List[Tuple[int, Tuple[int, ...]]] = []
+        for t in range(len(vehicle_types)):
+            for c in range(len(cargo_classes)):
+                if max_units[c, t]:
+                    units = [0] * len(cargo_classes)
+                    units[c] = int(max_units[c, t])
+                    patterns.append((t, tuple(units)))
+
+        # 2. Column generation on the LP relaxation
+        cg_deadline = started + time_limit_sec * CG_TIME_SHARE if time_limit_sec else None
+        known = set(patterns)
+        converged, lp_value, iterations = False, None, 0
+        for iterations in range(1, MAX_CG_ITERATIONS + 1):
+            master = self._pattern_master(patterns, quantity, count, integer=False)
+            if master is None:
+                break
+            _, lp_value, cover_duals, fleet_duals = master
+            new = []
+            for t in range(len(vehicle_types)):
+                units = self._price_pattern(w, v, cap_w[t], cap_v[t], max_units[:, t], cover_duals)
+                # Reduced cost of a vehicle running this pattern: 1 - fleet dual - value of the load
+                if units is not None and 1.0 - fleet_duals[t] - float(np.dot(cover_duals, units)) < -1e-6:
+                    column = (t, tuple(units))
+                    if column not in known:
+                        known.add(column)
+                        new.append(column)
+            if not new:
+                converged = True
+                break
+            patterns.extend(new)
+            if cg_deadline and time.perf_counter() > cg_deadline:
+                break
+
+        # 3. Integer master over the generated patterns
+        budget = time_limit_sec - (time.perf_counter() - started) if time_limit_sec else None
+        master = self._pattern_master(patterns, quantity, count, integer=True, time_limit_sec=budget)
+        if master is None or master[0] is None:
+            return {"status": "INFEASIBLE/FAILED", "details": "Could not find a load plan. Ensure fleet capacity is sufficient."}
+        runs = master[0]
+
+        # 4. Disaggregate: concrete vehicles per pattern, concrete items per class unit
+        vehicle_ids = [_unit_ids(t, 'vehicle_ids', int(n)) for t, n in zip(vehicle_types, count)]
+        item_ids = [_unit_ids(c, 'item_ids', int(q)) for c, q in zip(cargo_classes, quantity)]
+        next_vehicle = [0] * len(vehicle_types)
+        next_item = [0] * len(cargo_classes)
+        assignments: Dict[str, List[Dict]] = {}
+        pattern_summary = []
+        for p in np.argsort(-np.asarray(runs), kind="stable").tolist():
+            t, units = patterns[p]
+            for _ in range(int(round(runs[p]))):
+                load = []
+                for c, n in enumerate(units):
+                    take = min(n, int(quantity[c]) - next_item[c]) # Covering may overshoot; skip the surplus
+                    spec = cargo_classes[c]
+                    load.extend({
+                        "id": item_ids[c][k], "class_id": spec['id'], "name": spec.get('name'),
+                        "weight": spec['weight'], "volume": spec.get('volume', 0),
+                    } for k in range(next_item[c], next_item[c] + take))
+                    next_item[c] += take
+                if not load:
+                    continue
+                assignments[vehicle_ids[t][next_vehicle[t]]] = load
+                next_vehicle[t] += 1
+                loaded: Dict[str, int] = {}
+                for item in load:
+                    loaded[item["class_id"]] = loaded.get(item["class_id"], 0) + 1
+                entry = pattern_summary[-1] if pattern_summary else None
+                if entry and entry["type_id"] == vehicle_types[t]['id'] and entry["load"] == loaded:
+                    entry["vehicles"] += 1
+                else:
+                    pattern_summary.append({"type_id": vehicle_types[t]['id'], "vehicles": 1, "load": loaded})
+
+        used = len(assignments)
+        lower_bound = _capacity_bound(
+            float(np.dot(w, quantity)), float(np.dot(v, quantity)), np.repeat(cap_w, count), np.repeat(cap_v, count)
+        )
+        if converged and lp_value is not None:
+            lower_bound = max(lower_bound, int(np.ceil(lp_value - 1e-6)))
+        lower_bound = min(lower_bound, used)
+        return {
+            "status": "OPTIMAL" if used <= lower_bound else "FEASIBLE",
+            "total_vehicles_used": used,
+            "assignments": assignments,
+            "patterns": pattern_summary,
+            "method": "column_generation",
+            "columns": len(patterns),
+            "iterations": iterations,
+            "lower_bound": lower_bound,
+            "gap": round((used - lower_bound) / used, 4) if used else 0.0,
+            "solve_time_sec": round(time.perf_counter() - started, 3),
+        }
+
+    def _pattern_master(self, patterns, quantity: np.ndarray, count: np.ndarray, integer: bool,
+                        time_limit_sec: Optional[float] = None):
+        """
+        min vehicles s.t. every class is covered and no type runs more vehicles than it has.
+        Uncovered units are allowed at a prohibitive cost, so the LP always has duals.
+        Returns (vehicles per pattern or None if cargo is left over, objective, cover duals, fleet duals).
+        """
+        solver = pywraplp.Solver.CreateSolver(self.solver_name if integer else 'GLOP')
+        if not solver:
+            return None
+        if time_limit_sec:
+            solver.SetTimeLimit(max(int(time_limit_sec * 1000), 1))
+        penalty = float(count.sum() + 1)
+        runs = [
+            solver.IntVar(0, int(count[t]), f'n_{p}') if integer else solver.NumVar(0, float(count[t]), f'n_{p}')
+            for p, (t, _) in enumerate(patterns)
+        ]
+        uncovered = [solver.NumVar(0, solver.infinity(), f'u_{c}') for c in range(len(quantity))]
+
+        cover = []
+        for c in range(len(quantity)):
+            row = solver.Constraint(float(quantity[c]), solver.infinity())
+            row.SetCoefficient(uncovered[c], 1)
+            cover.append(row)
+        fleet = [solver.Constraint(0, float(n)) for n in count]
+        objective = solver.Objective()
+        for p, (t, units) in enumerate(patterns):
+            for c, n in enumerate(units):
+                if n:
+                    cover[c].SetCoefficient(runs[p], n)
+            fleet[t].SetCoefficient(runs[p], 1)
+            objective.SetCoefficient(runs[p], 1)
+        for var in uncovered:
+            objective.SetCoefficient(var, penalty)
+        objective.SetMinimization()
+
+        status = solver.Solve()
+        if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+            return None
+        if integer:
+            solution = None if any(var.solution_value() > 1e-6 for var in uncovered) else [var.solution_value() for var in runs]
+            return solution, objective.Value(), None, None
+        return (
+            None, objective.Value(),
+            np.array([row.dual_value() for row in cover]), np.array([row.dual_value() for row in fleet]),
+        )
+
+    def _price_pattern(self, w: np.ndarray, v: np.ndarray, cap_w: float, cap_v: float,
+                       max_units: np.ndarray, duals: np.ndarray) -> Optional[List[int]]:
+        """ Most valuable load for one vehicle of a type at the current duals (2-D bounded knapsack) """
+        useful = [c for c in range(len(w)) if duals[c] > 1e-9 and max_units[c] > 0]
+        if not useful:
+            return None
+        solver = pywraplp.Solver.CreateSolver(self.solver_name)
+        if not solver:
+            return None
+        units = {c: solver.IntVar(0, int(max_units[c]), f'a_{c}') for c in useful}
+        weight = solver.Constraint(-solver.infinity(), float(cap_w))
+        volume = solver.Constraint(-solver.infinity(), float(cap_v))
+        objective = solver.Objective()
+        for c, var in units.items():
+            weight.SetCoefficient(var, float(w[c]))
+            volume.SetCoefficient(var, float(v[c]))
+            objective.SetCoefficient(var, float(duals[c]))
+        objective.SetMaximization()
+        if solver.Solve() != pywraplp.Solver.OPTIMAL:
+            return None
+        pattern = [0] * len(w)
+        for c, var in units.items():
+            pattern[c] = int(round(var.solution_value()))
+        return pattern
+
+    def _solve_mip(self, cargo_items: List[Dict], vehicles: List[Dict], time_limit_sec: Optional[float],
+                   incumbent: Optional[List[int]] = None):
+        """
+        The x[i, j] model. With an incumbent the model only accepts plans using fewer vehicles
+        (CBC ignores solution hints, so the incumbent acts as a cutoff; the hint is passed on
+        for solvers that use it). Returns (status, assignment or None, best bound) or None.
         """
-        print(f"Starting Optimization for {len(cargo_items)} items and {len(vehicles)} vehicles...")
-        
-        if not self.solver:
-            print("ERROR: Solver could not be initialized.")
-            return {"error": "Solver not initialized"}
-            
+        solver = pywraplp.Solver.CreateSolver(self.solver_name)
+        if not solver:
+            return None
+        started = time.perf_counter()
+
         # Variables
         # x[i, j] = 1 if item i is packed in vehicle j.
         x = {}
         # y[j] = 1 if vehicle j is used.
         y = {}
-        
+
         num_items = len(cargo_items)
         num_vehicles = len(vehicles)
-        
+
         for i in range(num_items):
             for j in range(num_vehicles):
-                x[i, j] = self.solver.IntVar(0, 1, f'x_{i}_{j}')
-                
+                x[i, j] = solver.IntVar(0, 1, f'x_{i}_{j}')
+
         for j in range(num_vehicles):
-            y[j] = self.solver.IntVar(0, 1, f'y_{j}')
-            
-        # Constraints
-        
+            y[j] = solver.IntVar(0, 1, f'y_{j}')
+
+        # Constraints (built row by row: much faster than summing expressions for large models)
+
         # 1. Each item must be packed in exactly one vehicle.
         for i in range(num_items):
-            self.solver.Add(sum(x[i, j] for j in range(num_vehicles)) == 1)
-            
+            row = solver.Constraint(1, 1)
+            for j in range(num_vehicles):
+                row.SetCoefficient(x[i, j], 1)
+
         # 2. Weight capacity constraint for each vehicle.
-        for j in range(num_vehicles):
-            self.solver.Add(
-                sum(x[i, j] * cargo_items[i]['weight'] for i in range(num_items)) 
-                <= vehicles[j]['capacity_weight'] * y[j]
-            )
-            
         # 3. Volume capacity constraint (optional, but good for realism)
+        cap_w, cap_v = _capacities(vehicles)
+        w, v = _sizes(cargo_items)
         for j in range(num_vehicles):
-             self.solver.Add(
-                sum(x[i, j] * cargo_items[i].get('volume', 0) for i in range(num_items)) 
-                <= vehicles[j].get('capacity_volume', 999999) * y[j]
-            )
+            for sizes, cap in ((w, cap_w[j]), (v, cap_v[j])):
+                row = solver.Constraint(-solver.infinity(), 0)
+                row.SetCoefficient(y[j], -float(cap))
+                for i in range(num_items):
+                    if sizes[i]:
+                        row.SetCoefficient(x[i, j], float(sizes[i]))
+
+        # 4. Identical vehicles are interchangeable: use them in order (symmetry breaking)
+        groups: Dict[Tuple[float, float], List[int]] = {}
+        for j in range(num_vehicles):
+            groups.setdefault((cap_w[j], cap_v[j]), []).append(j)
+        for members in groups.values():
+            for a, b in zip(members, members[1:]):
+                solver.Add(y[a] >= y[b])
+
+        # 5. Warm start: beat the incumbent, and hint it (relabelled to respect the ordering)
+        if incumbent is not None:
+            cutoff = solver.Constraint(0, len(set(incumbent)) - 1)
+            for j in range(num_vehicles):
+                cutoff.SetCoefficient(y[j], 1)
+            relabel = {}
+            for members in groups.values():
+                used = [j for j in members if j in set(incumbent)]
+                relabel.update(zip(used, members))
+            hint_vars = [x[i, j] for i in range(num_items) for j in range(num_vehicles)] + [y[j] for j in range(num_vehicles)]
+            hint_values = [float(relabel[incumbent[i]] == j) for i in range(num_items) for j in range(num_vehicles)]
+            hint_values += [float(j in relabel.values()) for j in range(num_vehicles)]
+            solver.SetHint(hint_vars, hint_values)
 
         # Objective: Minimize the number of vehicles used.
-        self.solver.Minimize(sum(y[j] for j in range(num_vehicles)))
-        
-        # Solve
-        status = self.solver.Solve()
-        
-        if status == pywraplp.Solver.OPTIMAL:
-            result = {
-                "status": "OPTIMAL",
-                "total_vehicles_used": 0,
-                "assignments": {} 
-            }
-            
-            used_vehicles = 0
+        objective = solver.Objective()
+        for j in range(num_vehicles):
+            objective.SetCoefficient(y[j], 1)
+        objective.SetMinimization()
+
+        # Solve (model building counts against the time limit)
+        if time_limit_sec:
+            solver.SetTimeLimit(max(int((time_limit_sec - (time.perf_counter() - started)) * 1000), 1))
+        status = solver.Solve()
+
+        best_bound = solver.Objective().BestBound() if status in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE) else None
+        if status == pywraplp.Solver.INFEASIBLE:
+            return "INFEASIBLE", None, None
+        if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+            return "NOT_SOLVED", None, None
+
+        assignment = [-1] * num_items
+        for i in range(num_items):
             for j in range(num_vehicles):
-                if y[j].solution_value() == 1:
-                    used_vehicles += 1
-                    vehicle_id = vehicles[j]['id']
-                    result["assignments"][vehicle_id] = []
-                    
-                    for i in range(num_items):
-                        if x[i, j].solution_value() == 1:
-                            result["assignments"][vehicle_id].append(cargo_items[i])
-            
-            result["total_vehicles_used"] = used_vehicles
-            return result
-        else:
-            return {"status": "INFEASIBLE/FAILED", "details": "Could not find an optimal solution."}
+                if round(x[i, j].solution_value()) == 1:
+                    assignment[i] = j
+                    break
+        return ("OPTIMAL" if status == pywraplp.Solver.OPTIMAL else "FEASIBLE"), assignment, best_bound
+
+def _unit_ids(spec: Dict, ids_key: str, amount: int) -> List[str]:
+    """ Concrete ids for the units of a vehicle type / cargo class: given ones first, then generated """
+    ids = list(spec.get(ids_key) or [])[:amount]
+    return ids + [f"{spec['id']}-{k + 1}" for k in range(len(ids), amount)]
+
+
+def solve_load_plan(cargo_items: List[Dict], vehicles: List[Dict], time_limit_sec: Optional[float] = None,
+                    mode: str = "anytime", strategy: str = "bfd") -> Dict[str, Any]:
+    """ Entry point for solver worker processes (app/services/solver_pool.py) """
+    return LoadOptimizer().optimize_load(cargo_items, vehicles, time_limit_sec, mode, strategy)
+
+def solve_aggregated_plan(cargo_classes: List[Dict], vehicle_types: List[Dict],
+                          time_limit_sec: Optional[float] = None) -> Dict[str, Any]:
+    """ Entry point for solver worker processes: the vehicle-type / cargo-class model """
+    return LoadOptimizer().optimize_aggregated(cargo_classes, vehicle_types, time_limit_sec)
 
 # Simple test if run directly
 if __name__ == "__main__":
@@ -88,5 +491,5 @@ if __name__ == "__main__":
     cargo = [{'id': 'box1', 'weight': 10}, {'id': 'box2', 'weight': 10}, {'id': 'box3', 'weight': 10}]
     # 2 small trucks
     fleet = [{'id': 'v1', 'capacity_weight': 20}, {'id': 'v2', 'capacity_weight': 20}, {'id': 'v3', 'capacity_weight': 20}]
-    
+
     print(optimizer.optimize_load(cargo, fleet))
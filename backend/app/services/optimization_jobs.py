@@ -0,0 +1,494 @@
+import asyncio
+import json
+import multiprocessing as mp
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Optional, Set
+
+from sqlalchemy import func, or_, select, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.optimization_job import OptimizationJob
+from app.services.optimization import LoadOptimizer
+from app.services.solver_pool import HARD_TIMEOUT_GRACE_SEC
+
+JOB_KINDS = ("load", "fleet")
+TERMINAL_STATUSES = ("DONE", "FAILED", "CANCELLED")
+QUEUE_KEY = "optimization:queue"
+EVENTS_CHANNEL = "optimization:job:{}"
+CANCEL_KEY = "optimization:cancel:{}"
+CANCEL_TTL_SEC = 24 * 3600
+POLL_SEC = 0.5 # How often a running job checks for messages from its solver and for cancellation
+MAX_JOB_ATTEMPTS = 3 # Claims before a job whose workers keep disappearing is failed instead of requeued
+
+
+def _solve_job(conn, kind: str, request: dict):
+    """ Solver process for one job: streams ("incumbent", plan) messages, then ("done", result) or ("error", ...) """
+    optimizer = LoadOptimizer()
+    time_limit = request.get("time_limit_sec")
+    try:
+        if kind == "load":
+            result = optimizer.optimize_load(
+                request["cargo"], request["fleet"], time_limit, request.get("mode", "anytime"),
+                request.get("strategy", "bfd"), on_incumbent=lambda plan: conn.send(("incumbent", plan))
+            )
+        else:
+            result = optimizer.optimize_aggregated(request["cargo_classes"], request["vehicle_types"], time_limit)
+        conn.send(("done", result))
+    except Exception as e:
+        conn.send(("error", repr(e)))
+    finally:
+        conn.close()
+
+
+class MemorySubscription:
+    """ One listener's events for a job (in-process backend) """
+
+    def __init__(self, listeners: Dict[str, Set[asyncio.Queue]], job_id: str):
+        self._listeners = listeners
+        self._job_id = job_id
+        self._queue: asyncio.Queue = asyncio.Queue()
+        listeners.setdefault(job_id, set()).add(self._queue)
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        """ Next event, or None if there was none within the timeout """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        queues = self._listeners.get(self._job_id, set())
+        queues.discard(self._queue)
+        if not queues:
+            self._listeners.pop(self._job_id, None)
+
+
+class RedisSubscription:
+    """ One listener's events for a job (Redis pub/sub) """
+
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if message and message.get("type") == "message":
+                return json.loads(message["data"])
+
+    async def close(self):
+        await self._pubsub.unsubscribe()
+        await self._pubsub.close()
+
+
+class MemoryJobBackend:
+    """ In-process stand-in for Redis: queue, per-job event fan-out and cancel flags (single API process) """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._cancelled: Set[str] = set()
+        self._listeners: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def push(self, job_id: str):
+        await self._queue.put(job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def publish(self, job_id: str, event: dict):
+        for queue in self._listeners.get(job_id, ()):
+            queue.put_nowait(event)
+
+    async def subscribe(self, job_id: str) -> "MemorySubscription":
+        return MemorySubscription(self._listeners, job_id)
+
+    async def request_cancel(self, job_id: str):
+        self._cancelled.add(job_id)
+
+    async def is_cancelled(self, job_id: str) -> bool:
+        return job_id in self._cancelled
+
+    async def clear_cancel(self, job_id: str):
+        self._cancelled.discard(job_id)
+
+
+class RedisJobBackend:
+    """
+    Redis list as the job queue (any number of worker processes BRPOP from it), pub/sub for
+    job events and expiring keys as cancel flags.
+    """
+
+    def __init__(self, redis_url: str):
+        import redis.asyncio as aioredis
+        self._redis = aioredis.from_url(redis_url)
+
+    async def push(self, job_id: str):
+        await self._redis.lpush(QUEUE_KEY, job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        item = await self._redis.brpop(QUEUE_KEY, timeout=max(int(timeout), 1))
+        return item[1].decode() if item else None
+
+    async def publish(self, job_id: str, event: dict):
+        await self._redis.publish(EVENTS_CHANNEL.format(job_id), json.dumps(event))
+
+    async def subscribe(self, job_id: str) -> "RedisSubscription":
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(EVENTS_CHANNEL.format(job_id))
+        return RedisSubscription(pubsub)
+
+    async def request_cancel(self, job_id: str):
+        await self._redis.set(CANCEL_KEY.format(job_id), 1, ex=CANCEL_TTL_SEC)
+
+    async def is_cancelled(self, job_id: str) -> bool:
+        return bool(await self._redis.exists(CANCEL_KEY.format(job_id)))
+
+    async def clear_cancel(self, job_id: str):
+        await self._redis.delete(CANCEL_KEY.format(job_id))
+
+
+def job_view(job: OptimizationJob, include_plans: bool = True) -> dict:
+    """ API representation of a job row """
+    view = {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "total_vehicles_used": job.total_vehicles_used,
+        "lower_bound": job.lower_bound,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if include_plans:
+        view["incumbent"] = json.loads(job.incumbent) if job.incumbent else None
+        view["result"] = json.loads(job.result) if job.result else None
+    return view
+
+
+def _summary(plan: dict) -> dict:
+    """ Small event payload for a plan; clients fetch the full plan with GET /jobs/{id} """
+    summary = {key: plan.get(key) for key in ("total_vehicles_used", "lower_bound", "gap", "method", "solve_time_sec")}
+    summary["plan_status"] = plan.get("status") # OPTIMAL or FEASIBLE; "status" in events is the job's
+    return summary
+
+
+class OptimizationJobs:
+    """
+    Job API around LoadOptimizer.
+
+    Submitting stores the job in the optimization_jobs table and pushes its id onto the
+    queue backend. A worker claims it (QUEUED -> RUNNING, atomically, so any number of
+    workers can share a queue) and solves it in a dedicated process; the final plan is
+    persisted with the job. Clients poll the row or stream its events; cancelling a
+    running job kills its solver process and keeps the last incumbent as the result.
+
+    CBC reports no intermediate solutions, so the only incumbent is the heuristic plan of
+    an "anytime" load job, recorded before its MIP starts. "mip" load jobs and fleet jobs
+    stream no incumbent, and cancelling them while running leaves no plan.
+
+    The API and the workers only share the database and the queue backend, so with the
+    Redis backend workers run as separate processes and scale on their own. A claim is a
+    lease the worker renews while it runs; every worker requeues jobs whose lease expired
+    (their worker crashed or was redeployed), and a worker that lost its lease stops the
+    solve without writing to the job.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self.running: Dict[str, mp.Process] = {}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if settings.OPTIMIZATION_JOB_BACKEND == "redis":
+                self._backend = RedisJobBackend(settings.REDIS_URL)
+            else:
+                self._backend = MemoryJobBackend()
+        return self._backend
+
+    async def submit(self, db, kind: str, request: dict) -> Optional[OptimizationJob]:
+        """ Store and enqueue a job. Returns None if the queue is full """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        queued = (await db.execute(
+            select(func.count(OptimizationJob.id)).where(OptimizationJob.status == "QUEUED")
+        )).scalar_one()
+        if queued >= settings.OPTIMIZATION_MAX_QUEUED_JOBS:
+            return None
+        job = OptimizationJob(id=uuid.uuid4().hex, kind=kind, status="QUEUED", request=json.dumps(request))
+        db.add(job)
+        await db.commit()
+        await self.backend.push(job.id)
+        return job
+
+    async def cancel(self, db, job_id: str) -> Optional[OptimizationJob]:
+        """ Cancel a queued job at once; ask the worker of a running one to stop it """
+        res = await db.execute(
+            update(OptimizationJob)
+            .where(OptimizationJob.id == job_id, OptimizationJob.status == "QUEUED")
+            .values(status="CANCELLED", finished_at=datetime.utcnow())
+        )
+        await db.commit()
+        if res.rowcount:
+            await self.backend.publish(job_id, {"event": "status", "status": "CANCELLED"})
+        job = await db.get(OptimizationJob, job_id, populate_existing=True)
+        if job is not None and job.status == "RUNNING":
+            await self.backend.request_cancel(job_id)
+        return job
+
+    async def events(self, job_id: str, keepalive_sec: float) -> AsyncIterator[Optional[dict]]:
+        """
+        Current state, then live events until the job finishes. Yields None when nothing
+        happened for keepalive_sec (streams use it to keep idle connections open).
+        The state is read with a short-lived session, so a long stream holds no DB connection.
+        """
+        subscription = await self.backend.subscribe(job_id) # Before reading the state, to miss nothing
+        try:
+            async with SessionLocal() as db:
+                job = await db.get(OptimizationJob, job_id)
+                state = job_view(job, include_plans=False) if job is not None else None
+            if state is None:
+                return
+            yield {"event": "status", **state}
+            if state["status"] in TERMINAL_STATUSES:
+                return
+            while True:
+                event = await subscription.next(keepalive_sec)
+                yield event
+                if event and event.get("event") == "status" and event.get("status") in TERMINAL_STATUSES:
+                    return
+        finally:
+            await subscription.close()
+
+    async def _update(self, job_id: str, lease: Optional[str] = None, **values) -> bool:
+        """ Update a job row (only while `lease` still holds it, if given). False if nothing matched """
+        query = update(OptimizationJob).where(OptimizationJob.id == job_id)
+        if lease is not None:
+            query = query.where(OptimizationJob.status == "RUNNING", OptimizationJob.lease_owner == lease)
+        async with SessionLocal() as db:
+            res = await db.execute(query.values(**values))
+            await db.commit()
+            return res.rowcount > 0
+
+    @staticmethod
+    def _lease_expiry() -> datetime:
+        return datetime.utcnow() + timedelta(seconds=settings.OPTIMIZATION_JOB_LEASE_SEC)
+
+    async def _claim(self, job_id: str, lease: str) -> Optional[OptimizationJob]:
+        """ QUEUED -> RUNNING under a lease; None if another worker took it or it was cancelled meanwhile """
+        async with SessionLocal() as db:
+            res = await db.execute(
+                update(OptimizationJob)
+                .where(OptimizationJob.id == job_id, OptimizationJob.status == "QUEUED")
+                .values(
+                    status="RUNNING", started_at=datetime.utcnow(), lease_owner=lease,
+                    lease_expires_at=self._lease_expiry(), attempts=OptimizationJob.attempts + 1
+                )
+            )
+            await db.commit()
+            return await db.get(OptimizationJob, job_id) if res.rowcount else None
+
+    async def requeue_expired(self) -> int:
+        """
+        Requeue RUNNING jobs whose lease expired (their worker is gone), or fail them after
+        MAX_JOB_ATTEMPTS claims. Safe to run from every worker: each row moves only once.
+        """
+        now = datetime.utcnow()
+        expired = or_(OptimizationJob.lease_expires_at.is_(None), OptimizationJob.lease_expires_at < now)
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                select(OptimizationJob.id, OptimizationJob.attempts)
+                .where(OptimizationJob.status == "RUNNING", expired)
+            )).all()
+            requeued = []
+            for job_id, attempts in rows:
+                if attempts >= MAX_JOB_ATTEMPTS:
+                    values = {"status": "FAILED", "error": f"Worker lost {attempts} times", "finished_at": now}
+                else:
+                    values = {"status": "QUEUED", "lease_owner": None, "lease_expires_at": None}
+                res = await db.execute(
+                    update(OptimizationJob)
+                    .where(OptimizationJob.id == job_id, OptimizationJob.status == "RUNNING", expired)
+                    .values(**values)
+                )
+                await db.commit()
+                if res.rowcount:
+                    requeued.append((job_id, values["status"]))
+        for job_id, status in requeued:
+            if status == "QUEUED":
+                await self.backend.push(job_id)
+            await self.backend.publish(job_id, {"event": "status", "status": status})
+            print(f"Optimization job {job_id}: lease expired, {status}")
+        return len(requeued)
+
+    async def run_job(self, job_id: str, lease: Optional[str] = None):
+        lease = lease or uuid.uuid4().hex
+        job = await self._claim(job_id, lease)
+        if job is None:
+            return
+        await self.backend.publish(job_id, {"event": "status", "status": "RUNNING"})
+        request = json.loads(job.request)
+        limit = request.get("time_limit_sec") or settings.OPTIMIZATION_TIME_LIMIT_SEC
+        request["time_limit_sec"] = limit
+
+        parent, child = mp.get_context("spawn").Pipe()
+        proc = mp.get_context("spawn").Process(
+            target=_solve_job, args=(child, job.kind, request), name=f"opt-job-{job_id[:8]}", daemon=True
+        )
+        proc.start()
+        child.close()
+        self.running[job_id] = proc
+        deadline = time.monotonic() + limit + HARD_TIMEOUT_GRACE_SEC
+        renew_every = settings.OPTIMIZATION_JOB_LEASE_SEC / 3
+        renew_at = time.monotonic() + renew_every
+        incumbent, result, error, cancelled, lost = None, None, None, False, False
+        try:
+            while True:
+                if await self.backend.is_cancelled(job_id):
+                    cancelled = True
+                    break
+                if time.monotonic() >= renew_at:
+                    if not await self._update(job_id, lease, lease_expires_at=self._lease_expiry()):
+                        lost = True # Requeued (or cancelled) after we stalled past the lease
+                        break
+                    renew_at = time.monotonic() + renew_every
+                if await asyncio.to_thread(parent.poll, POLL_SEC):
+                    try:
+                        kind, payload = parent.recv()
+                    except EOFError:
+                        error = "Solver process exited unexpectedly"
+                        break
+                    if kind == "incumbent":
+                        incumbent = payload
+                        await self._update(
+                            job_id, lease, incumbent=json.dumps(payload), total_vehicles_used=payload["total_vehicles_used"],
+                            lower_bound=payload.get("lower_bound")
+                        )
+                        await self.backend.publish(job_id, {"event": "incumbent", **_summary(payload)})
+                    elif kind == "done":
+                        result = payload
+                        break
+                    else:
+                        error = payload
+                        break
+                elif not proc.is_alive():
+                    error = "Solver process exited unexpectedly"
+                    break
+                elif time.monotonic() > deadline:
+                    error = f"Solve did not finish within {limit:g} s"
+                    break
+        finally:
+            if proc.is_alive():
+                proc.terminate()
+            await asyncio.to_thread(proc.join, 5)
+            parent.close()
+            self.running.pop(job_id, None)
+            if not lost:
+                await self.backend.clear_cancel(job_id)
+
+        if lost:
+            print(f"Optimization job {job_id}: lease lost, solve abandoned")
+            return
+
+        # Persist the outcome; a cancelled or failed job keeps its best plan so far
+        if result is not None and result.get("status") in ("OPTIMAL", "FEASIBLE"):
+            status, plan = "DONE", result
+        elif result is not None:
+            status, plan, error = "FAILED", incumbent, result.get("details") or result.get("error") or result.get("status")
+        else:
+            status, plan = ("CANCELLED" if cancelled else "FAILED"), incumbent
+        values = {
+            "status": status, "error": error, "finished_at": datetime.utcnow(), "result": json.dumps(plan) if plan else None,
+            "lease_owner": None, "lease_expires_at": None,
+        }
+        if plan:
+            values.update(total_vehicles_used=plan["total_vehicles_used"], lower_bound=plan.get("lower_bound"))
+        if not await self._update(job_id, lease, **values):
+            print(f"Optimization job {job_id}: lease lost, {status} not recorded")
+            return
+        await self.backend.publish(job_id, {
+            **(_summary(plan) if plan else {}), "event": "status", "status": status, "error": error
+        })
+        print(f"Optimization job {job_id}: {status}" + (f" ({error})" if error else ""))
+
+    async def _requeue_loop(self):
+        while True:
+            await asyncio.sleep(settings.OPTIMIZATION_JOB_LEASE_SEC / 2)
+            try:
+                await self.requeue_expired()
+            except Exception as e:
+                print(f"Optimization lease check failed: {e!r}")
+
+    async def run_worker(self, concurrency: int = None):
+        """ Worker loop: take job ids off the queue and run up to `concurrency` at once """
+        slots = asyncio.Semaphore(concurrency or settings.OPTIMIZATION_JOB_CONCURRENCY)
+        tasks: Set[asyncio.Task] = set()
+        tasks.add(asyncio.create_task(self._requeue_loop()))
+
+        async def run(job_id: str):
+            lease = uuid.uuid4().hex
+            try:
+                await self.run_job(job_id, lease)
+            except Exception as e:
+                print(f"Optimization job {job_id} failed: {e!r}")
+                # Only while this worker still holds the job; it may have been requeued and reclaimed
+                await self._update(
+                    job_id, lease, status="FAILED", error=repr(e), finished_at=datetime.utcnow(),
+                    lease_owner=None, lease_expires_at=None
+                )
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    job_id = await self.backend.pop(timeout=5.0)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Optimization queue error: {e}; retrying in 5s")
+                    job_id = None
+                    await asyncio.sleep(5)
+                if job_id is None:
+                    slots.release()
+                    continue
+                task = asyncio.create_task(run(job_id))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for proc in self.running.values():
+                proc.terminate()
+
+    async def recover(self):
+        """
+        In-process (memory) mode only: the queue died with the previous API process, so
+        re-queue its QUEUED jobs and fail the ones it was running.
+        """
+        async with SessionLocal() as db:
+            await db.execute(
+                update(OptimizationJob).where(OptimizationJob.status == "RUNNING")
+                .values(status="FAILED", error="Interrupted by a restart", finished_at=datetime.utcnow())
+            )
+            await db.commit()
+            queued = (await db.execute(
+                select(OptimizationJob.id).where(OptimizationJob.status == "QUEUED").order_by(OptimizationJob.created_at)
+            )).scalars().all()
+        for job_id in queued:
+            await self.backend.push(job_id)
+
+
+# Process-wide job service used by the optimization endpoints and the worker
+optimization_jobs = OptimizationJobs()
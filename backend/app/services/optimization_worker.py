@@ -0,0 +1,31 @@
+import asyncio
+import os
+import sys
+
+# Add the backend root directory to sys.path
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, backend_root)
+
+from app.core.config import settings
+from app.services.optimization_jobs import optimization_jobs
+
+
+async def main():
+    """
+    Standalone optimization worker. Takes jobs from the Redis queue, so run as many of these
+    as the solve load needs, independently of the API processes.
+    """
+    if settings.OPTIMIZATION_JOB_BACKEND != "redis":
+        print("OPTIMIZATION_JOB_BACKEND is not 'redis'; jobs are run inside the API process instead.")
+        return
+    print(f"Optimization worker started ({settings.OPTIMIZATION_JOB_CONCURRENCY} concurrent solves)")
+    await optimization_jobs.run_worker()
+
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Optimization worker stopped.")
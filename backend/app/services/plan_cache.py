@@ -0,0 +1,149 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.optimization import DEFAULT_VOLUME_CAPACITY
+
+# Result fields carried over from the solve that produced a cached plan
+SUMMARY_FIELDS = ("status", "total_vehicles_used", "method", "heuristic_vehicles", "lower_bound", "gap")
+
+
+def _canonical_order(sizes: List[Tuple[float, float]]) -> Tuple[np.ndarray, bytes]:
+    """ Positions sorted by (weight, volume), plus the sorted sizes as bytes for hashing """
+    arr = np.array(sizes, dtype=np.float64).reshape(-1, 2) + 0.0 # + 0.0 folds -0.0 into 0.0
+    order = np.lexsort((arr[:, 1], arr[:, 0]))
+    return order, arr[order].tobytes()
+
+
+def _item_key(item: Dict) -> tuple:
+    return item['id'], item['weight'], item.get('volume', 0)
+
+
+class CanonicalInstance:
+    """
+    A load planning instance reduced to its multisets of cargo sizes and vehicle capacities.
+    Two requests with the same multisets share a key whatever their ids and ordering, and
+    item i of one maps onto item i of the other in canonical (size-sorted) order.
+    """
+
+    def __init__(self, cargo_items: List[Dict], vehicles: List[Dict]):
+        self.item_order, item_bytes = _canonical_order(
+            [(c['weight'], c.get('volume', 0)) for c in cargo_items]
+        )
+        self.vehicle_order, vehicle_bytes = _canonical_order(
+            [(v['capacity_weight'], v.get('capacity_volume', DEFAULT_VOLUME_CAPACITY)) for v in vehicles]
+        )
+        digest = hashlib.sha256()
+        digest.update(f"{len(cargo_items)}:{len(vehicles)}:".encode())
+        digest.update(item_bytes)
+        digest.update(vehicle_bytes)
+        self.key = digest.hexdigest()
+
+    def to_canonical(self, result: Dict[str, Any], cargo_items: List[Dict], vehicles: List[Dict]) -> np.ndarray:
+        """ Canonical vehicle rank for each canonical item rank, from a solver result """
+        vehicle_rank = np.empty(len(vehicles), dtype=np.int32)
+        vehicle_rank[self.vehicle_order] = np.arange(len(vehicles), dtype=np.int32)
+        vehicle_index = {v['id']: j for j, v in enumerate(vehicles)}
+        # Results come back from worker processes as copies, so items are matched by value
+        item_index: Dict[tuple, List[int]] = {}
+        for i, c in enumerate(cargo_items):
+            item_index.setdefault(_item_key(c), []).append(i)
+
+        plan = np.empty(len(cargo_items), dtype=np.int32)
+        for vehicle_id, items in result["assignments"].items():
+            rank = vehicle_rank[vehicle_index[vehicle_id]]
+            for item in items:
+                plan[item_index[_item_key(item)].pop()] = rank
+        return plan[self.item_order]
+
+    def assignments(self, plan: np.ndarray, cargo_items: List[Dict], vehicles: List[Dict]) -> Dict[str, List[Dict]]:
+        """ A canonical plan mapped onto this request's ids, in request order """
+        by_item = np.empty(len(cargo_items), dtype=np.int64)
+        by_item[self.item_order] = self.vehicle_order[plan]
+        assignments: Dict[str, List[Dict]] = {}
+        for j in sorted(set(by_item.tolist())):
+            assignments[vehicles[j]['id']] = []
+        for i, j in enumerate(by_item.tolist()):
+            assignments[vehicles[j]['id']].append(cargo_items[i])
+        return assignments
+
+
+class LoadPlanCache:
+    """
+    LRU of solved load plans keyed by CanonicalInstance.key.
+
+    An OPTIMAL plan answers any later request for the same instance. A FEASIBLE one only
+    answers requests that would not search harder: the same mode and strategy with no
+    longer a time limit. Any plan that is no worse replaces a FEASIBLE one; OPTIMAL ones stay.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cargo_items: List[Dict], vehicles: List[Dict], mode: str, strategy: str,
+            time_limit_sec: Optional[float]) -> Tuple[CanonicalInstance, Optional[Dict[str, Any]]]:
+        """ The instance key, and the cached result remapped onto these ids (None on a miss) """
+        started = time.perf_counter()
+        instance = CanonicalInstance(cargo_items, vehicles)
+        entry = self._entries.get(instance.key)
+        if entry is None or not self._answers(entry, mode, strategy, time_limit_sec):
+            self.misses += 1
+            return instance, None
+
+        self._entries.move_to_end(instance.key)
+        self.hits += 1
+        result = dict(entry["summary"])
+        result["assignments"] = instance.assignments(entry["plan"], cargo_items, vehicles)
+        result["solve_time_sec"] = round(time.perf_counter() - started, 3)
+        result["cached"] = True
+        return instance, result
+
+    @staticmethod
+    def _answers(entry: dict, mode: str, strategy: str, time_limit_sec: Optional[float]) -> bool:
+        if entry["summary"]["status"] == "OPTIMAL":
+            return True
+        if (entry["mode"], entry["strategy"]) != (mode, strategy):
+            return False
+        return entry["time_limit_sec"] is None or (time_limit_sec is not None and time_limit_sec <= entry["time_limit_sec"])
+
+    def put(self, instance: CanonicalInstance, result: Dict[str, Any], cargo_items: List[Dict], vehicles: List[Dict],
+            mode: str, strategy: str, time_limit_sec: Optional[float]):
+        """ Store a solved plan unless the cached one for the instance is proven or better """
+        if result.get("status") not in ("OPTIMAL", "FEASIBLE"):
+            return
+        current = self._entries.get(instance.key)
+        if current is not None:
+            old, new = current["summary"], result
+            if old["status"] == "OPTIMAL" or (
+                new["status"] != "OPTIMAL" and new["total_vehicles_used"] > old["total_vehicles_used"]
+            ):
+                self._entries.move_to_end(instance.key)
+                return
+
+        self._entries[instance.key] = {
+            "summary": {name: result.get(name) for name in SUMMARY_FIELDS},
+            "plan": instance.to_canonical(result, cargo_items, vehicles),
+            "mode": mode,
+            "strategy": strategy,
+            "time_limit_sec": time_limit_sec,
+        }
+        self._entries.move_to_end(instance.key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Process-wide cache used by /optimization/optimize
+load_plan_cache = LoadPlanCache(settings.OPTIMIZATION_CACHE_MAX_ENTRIES)
@@ -0,0 +1,142 @@
+import json
+import struct
+import numpy as np
+from typing import Optional
+
+# Fixed-point scales: 1e-5 deg is ~1.1 m of latitude, bearing in tenths of a degree
+COORD_SCALE = 100_000
+BEARING_SCALE = 10
+BEARING_UNITS = 360 * BEARING_SCALE
+
+FRAME_VERSION = 1
+KEYFRAME = 0
+DELTA = 1
+KEYFRAME_EVERY_TICKS = 15 # Full keyframe at least every 30 s of simulated time
+
+# Little-endian header: version u8, kind u8, pad u16, tick u32, keyframe tick u32, count u32.
+# 16 bytes keeps every column that follows aligned for typed-array views on the client.
+HEADER = struct.Struct("<BBxxIII")
+DELTA_LIMIT = 32767 # Deltas are int16; anything larger forces a keyframe
+
+# Binary body, column by column:
+#   keyframe: ids u32[n], lat i32[n], long i32[n], bearing u16[n]  (absolute fixed-point)
+#   delta:    ids u32[n], lat i16[n], long i16[n], bearing i16[n]  (relative to the keyframe)
+KEYFRAME_COLUMNS = ("<u4", "<i4", "<i4", "<u2")
+DELTA_COLUMNS = ("<u4", "<i2", "<i2", "<i2")
+
+
+def quantize(lats, longs, bearings):
+    """ Degrees -> fixed-point integers (bearing wrapped to [0, 3600)) """
+    q_lat = np.rint(np.asarray(lats, dtype=np.float64) * COORD_SCALE).astype(np.int64)
+    q_long = np.rint(np.asarray(longs, dtype=np.float64) * COORD_SCALE).astype(np.int64)
+    q_bearing = np.rint(np.asarray(bearings, dtype=np.float64) * BEARING_SCALE).astype(np.int64) % BEARING_UNITS
+    return q_lat, q_long, q_bearing
+
+
+def _pack(kind: int, tick: int, key_tick: int, columns, dtypes) -> bytes:
+    count = len(columns[0])
+    parts = [HEADER.pack(FRAME_VERSION, kind, tick, key_tick, count)]
+    parts.extend(np.ascontiguousarray(col, dtype=dt).tobytes() for col, dt in zip(columns, dtypes))
+    return b"".join(parts)
+
+
+def decode_frame(data: bytes) -> dict:
+    """ Binary frame -> JSON-able dict with the same fixed-point integers (the JSON fallback) """
+    version, kind, tick, key_tick, count = HEADER.unpack_from(data, 0)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported position frame version {version}")
+    offset = HEADER.size
+    columns = []
+    for dt in (KEYFRAME_COLUMNS if kind == KEYFRAME else DELTA_COLUMNS):
+        col = np.frombuffer(data, dtype=dt, count=count, offset=offset)
+        offset += col.nbytes
+        columns.append(col.tolist())
+    return {
+        "type": "keyframe" if kind == KEYFRAME else "delta",
+        "tick": tick,
+        "key_tick": key_tick,
+        "coord_scale": COORD_SCALE,
+        "bearing_scale": BEARING_SCALE,
+        "ids": columns[0],
+        "lat": columns[1],
+        "long": columns[2],
+        "bearing": columns[3],
+    }
+
+
+class EncodedFrame:
+    """ One position frame, shared by every subscriber. The JSON form is built at most once, on demand """
+
+    def __init__(self, binary: bytes):
+        self.binary = binary
+        self.kind = binary[1]
+        self._json: Optional[str] = None
+
+    @property
+    def is_keyframe(self) -> bool:
+        return self.kind == KEYFRAME
+
+    @property
+    def json(self) -> str:
+        if self._json is None:
+            self._json = json.dumps(decode_frame(self.binary), separators=(",", ":"))
+        return self._json
+
+
+class PositionFrameEncoder:
+    """
+    Compact position frames for the live stream.
+
+    Keyframes carry every asset in absolute fixed-point. Delta frames carry only
+    assets whose quantized position differs from the last keyframe, as int16
+    offsets from it. Because deltas are relative to the keyframe (not to the
+    previous delta), a client needs just the keyframe plus the newest delta:
+    dropped or skipped deltas never desynchronize it, and late joiners start
+    from the cached keyframe.
+    """
+
+    def __init__(self, keyframe_every_ticks: int = KEYFRAME_EVERY_TICKS):
+        self.keyframe_every_ticks = keyframe_every_ticks
+        self._key_tick: Optional[int] = None
+        self._key_ids = None
+        self._key_state = None # (lat, long, bearing) fixed-point, ordered like _key_ids
+
+    def reset(self):
+        """ Next frame will be a keyframe """
+        self._key_tick = None
+
+    def encode(self, tick: int, ids, lats, longs, bearings) -> EncodedFrame:
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+        q_lat, q_long, q_bearing = (q[order] for q in quantize(lats, longs, bearings))
+
+        if self._needs_keyframe(tick, ids):
+            return self._keyframe(tick, ids, q_lat, q_long, q_bearing)
+
+        key_lat, key_long, key_bearing = self._key_state
+        d_lat = q_lat - key_lat
+        d_long = q_long - key_long
+        # Shortest signed bearing change, in [-1800, 1800)
+        d_bearing = (q_bearing - key_bearing + BEARING_UNITS // 2) % BEARING_UNITS - BEARING_UNITS // 2
+
+        moved = (d_lat != 0) | (d_long != 0) | (d_bearing != 0)
+        if moved.any() and max(np.abs(d_lat[moved]).max(), np.abs(d_long[moved]).max()) > DELTA_LIMIT:
+            return self._keyframe(tick, ids, q_lat, q_long, q_bearing)
+
+        return EncodedFrame(_pack(
+            DELTA, tick, self._key_tick,
+            (ids[moved], d_lat[moved], d_long[moved], d_bearing[moved]), DELTA_COLUMNS
+        ))
+
+    def _needs_keyframe(self, tick: int, ids) -> bool:
+        if self._key_tick is None or tick - self._key_tick >= self.keyframe_every_ticks:
+            return True
+        # Membership changed (assets joined or left the simulation)
+        return not np.array_equal(ids, self._key_ids)
+
+    def _keyframe(self, tick: int, ids, q_lat, q_long, q_bearing) -> EncodedFrame:
+        self._key_tick = tick
+        self._key_ids = ids
+        self._key_state = (q_lat, q_long, q_bearing)
+        return EncodedFrame(_pack(KEYFRAME, tick, tick, (ids, q_lat, q_long, q_bearing), KEYFRAME_COLUMNS))
@@ -0,0 +1,106 @@
+import time
+import numpy as np
+from sqlalchemy import update, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.asset import TransportAsset
+
+# Movement below these thresholds is not worth a write (~1 cm / 0.01 deg)
+POSITION_EPSILON_DEG = 1e-7
+BEARING_EPSILON_DEG = 0.01
+
+assets_table = TransportAsset.__table__
+
+# One parameterised UPDATE, sent as a single executemany per tick
+BULK_POSITION_UPDATE = (
+    update(assets_table)
+    .where(assets_table.c.id == bindparam("b_id"))
+    .values(
+        current_lat=bindparam("b_lat"),
+        current_long=bindparam("b_long"),
+        bearing=bindparam("b_bearing"),
+    )
+)
+
+
+class PositionWriter:
+    """
+    Bulk write path for simulated positions.
+    Remembers the last position written for every asset and sends only the
+    rows that moved, as one executemany statement per tick.
+    """
+
+    def __init__(self):
+        # Last written frame, sorted by asset id
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._lat = np.zeros(0, dtype=np.float64)
+        self._long = np.zeros(0, dtype=np.float64)
+        self._bearing = np.zeros(0, dtype=np.float64)
+
+        # Running totals
+        self.total_rows_written = 0
+        self.total_flushes = 0
+
+    def changed_rows(self, ids, lats, longs, bearings):
+        """
+        Compare a frame against the last written one.
+        Returns (mask of changed rows, sorted frame) and does not touch the DB.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+        lats = np.asarray(lats, dtype=np.float64)[order]
+        longs = np.asarray(longs, dtype=np.float64)[order]
+        bearings = np.asarray(bearings, dtype=np.float64)[order]
+
+        changed = np.ones(len(ids), dtype=bool)
+        if len(self._ids):
+            pos = np.searchsorted(self._ids, ids)
+            pos_c = np.minimum(pos, len(self._ids) - 1)
+            known = self._ids[pos_c] == ids
+            bearing_delta = np.abs((bearings - self._bearing[pos_c] + 180.0) % 360.0 - 180.0)
+            moved = (
+                (np.abs(lats - self._lat[pos_c]) > POSITION_EPSILON_DEG)
+                | (np.abs(longs - self._long[pos_c]) > POSITION_EPSILON_DEG)
+                | (bearing_delta > BEARING_EPSILON_DEG)
+            )
+            changed = ~known | moved
+
+        return changed, (ids, lats, longs, bearings)
+
+    def remember(self, frame):
+        """ Record a frame as written """
+        self._ids, self._lat, self._long, self._bearing = frame
+
+    def reset(self):
+        """ Forget what was written (e.g. after a rolled-back tick) so the next flush writes everything """
+        self.remember((np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0), np.zeros(0)))
+
+    async def flush(self, db: AsyncSession, ids, lats, longs, bearings) -> dict:
+        """
+        Write every asset whose position changed since the last flush.
+        Returns { 'rows_written', 'rows_skipped', 'flush_ms' }.
+        """
+        started = time.perf_counter()
+        changed, frame = self.changed_rows(ids, lats, longs, bearings)
+        f_ids, f_lat, f_long, f_bearing = frame
+
+        rows = [
+            {"b_id": i, "b_lat": la, "b_long": lo, "b_bearing": b}
+            for i, la, lo, b in zip(
+                f_ids[changed].tolist(), f_lat[changed].tolist(),
+                f_long[changed].tolist(), f_bearing[changed].tolist()
+            )
+        ]
+        if rows:
+            await db.execute(BULK_POSITION_UPDATE, rows)
+
+        self.remember(frame)
+        self.total_rows_written += len(rows)
+        self.total_flushes += 1
+
+        return {
+            "rows_written": len(rows),
+            "rows_skipped": int(len(f_ids) - len(rows)),
+            "flush_ms": round((time.perf_counter() - started) * 1000.0, 2),
+        }
@@ -0,0 +1,283 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import select, func, or_
+
+from app.models.asset import TransportAsset
+from app.models.convoy import Convoy
+from app.models.route import Route
+from app.services.geometry import RouteGeometry, haversine_np, route_geometry_cache, unpack_waypoints
+from app.services.road_graph import (
+    MAX_SNAP_KM, OFFLINE_SPEED_KMH, SNAP_CONNECT_KM, RoadGraph, ShortestPathTree, offline_router
+)
+
+MAX_TREES = 32 # Destination trees kept for reuse between re-routing runs
+
+
+def impassable_filter():
+    """ Routes convoys must leave: blocked, or rated high risk by the risk analysis """
+    return or_(Route.status == "BLOCKED", Route.risk_level == "HIGH")
+
+
+def detour_closed(via: Optional[List[List[int]]], impassable: frozenset, targets: frozenset) -> bool:
+    """ Whether a detour drives a road closed by the target routes (see RoadGraph.path_label_sets) """
+    return any(impassable.issuperset(ids) and not targets.isdisjoint(ids) for ids in via or ())
+
+
+class ReroutingEngine:
+    """
+    Re-plans only the IN_TRANSIT convoys whose route became impassable.
+
+    The engine keeps its own road graph of every route, blocked or not, so a status
+    change only toggles which chains are closed instead of rebuilding the graph.
+    Detours to the same destination share one ShortestPathTree rooted there; trees are
+    kept between runs and repaired incrementally when more routes close or re-open.
+
+    A convoy leaves from its current chainage: it may drive back along the part of its
+    route it has already covered to any junction, and continues on the tree from there.
+    Detours record the roads they drive on (Route.detour_via), so a convoy already on a
+    detour is re-planned in turn when one of those roads closes.
+    """
+
+    def __init__(self):
+        self.graph: Optional[RoadGraph] = None
+        self._signature = None
+        self._impassable: frozenset = frozenset()
+        self._chain_blocked: Optional[np.ndarray] = None
+        self._open_nodes: Optional[np.ndarray] = None
+        self._trees: "OrderedDict[int, ShortestPathTree]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.trees_built = 0
+        self.junctions_repaired = 0
+
+    async def ensure_graph(self, db) -> Optional[RoadGraph]:
+        """
+        Graph of every route, labelled with route ids. Rebuilt only when route geometry
+        changes (status and risk changes are masks). Detours are left out: they re-trace
+        roads already in the graph, so creating them keeps the graph and its cached trees.
+        Also used to score alternatives.
+        """
+        roads = Route.is_detour.is_(False)
+        signature = tuple((await db.execute(
+            select(func.count(Route.id), func.max(Route.id), func.sum(Route.version)).where(roads)
+        )).one())
+        if self.graph is None or signature != self._signature:
+            res = (await db.execute(select(Route.id, Route.waypoints_packed).where(roads))).all()
+            routes = [(route_id, unpack_waypoints(b)) for route_id, b in res]
+            routes = [(route_id, p) for route_id, p in routes if len(p) >= 2]
+            network = offline_router.network_polylines()
+            polylines = [p for _, p in routes] + network
+            labels = [route_id for route_id, _ in routes] + [None] * len(network)
+            started = time.perf_counter()
+            self.graph = await asyncio.to_thread(RoadGraph, polylines, labels)
+            self._signature = signature
+            self._chain_blocked = None
+            self._trees.clear()
+            print(f"Re-routing graph: {self.graph.num_nodes} nodes, {self.graph.num_junctions} junctions "
+                  f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+        return self.graph
+
+    @property
+    def signature(self):
+        """ Identifies the current graph build; changes whenever route geometry does """
+        return self._signature
+
+    async def labelled_graph(self, db) -> Optional[RoadGraph]:
+        """ ensure_graph for other services, serialized with re-routing runs """
+        async with self._lock:
+            return await self.ensure_graph(db)
+
+    def _apply_closures(self, impassable: frozenset):
+        """ Close the chains of impassable routes and repair every cached tree """
+        if self._chain_blocked is not None and impassable == self._impassable:
+            return
+        self._impassable = impassable
+        self._chain_blocked = self.graph.blocked_chains(impassable)
+        self._open_nodes = self.graph.open_nodes(self._chain_blocked)
+        for tree in self._trees.values():
+            self.junctions_repaired += tree.update(self._chain_blocked)
+
+    def _tree(self, root: int) -> ShortestPathTree:
+        tree = self._trees.get(root)
+        if tree is None:
+            tree = self._trees[root] = ShortestPathTree(self.graph, root, self._chain_blocked)
+            self.trees_built += 1
+            while len(self._trees) > MAX_TREES:
+                self._trees.popitem(last=False)
+        self._trees.move_to_end(root)
+        return tree
+
+    def _retrace_end(self, nodes: np.ndarray, current: int, via: List[List[int]]) -> Optional[int]:
+        """
+        On a detour whose convoy is still driving back over its old, closed route (a chain none
+        of the detour's own roads are on), the vertex of the junction that stretch leads to
+        """
+        graph = self.graph
+        chain = graph.node_chain[nodes[current]] if nodes[current] >= 0 else -1
+        if chain < 0 or not self._chain_blocked[chain]:
+            return None
+        if any(sorted(edge) in via for edge in graph.chain_edge_labels[chain] if edge):
+            return None # Closed since the detour was planned: not known to be passable
+        for k in range(current + 1, len(nodes)):
+            if nodes[k] < 0 or graph.node_chain[nodes[k]] >= 0 and graph.node_chain[nodes[k]] != chain:
+                return None
+            if graph.node_chain[nodes[k]] < 0:
+                return k
+        return None
+
+    def _detour(self, route_points: np.ndarray, chainage: np.ndarray, current: int,
+                via: Optional[List[List[int]]] = None) -> Optional[dict]:
+        """
+        Best detour from route vertex `current` to the route's end, avoiding closed chains.
+        `via` is set when the route is itself a detour (Route.detour_via).
+        """
+        graph = self.graph
+        end = route_points[-1]
+        root, root_km = graph.snap(end, allowed=self._open_nodes)
+        if root is None or root_km > MAX_SNAP_KM:
+            return None
+        tree = self._tree(root)
+
+        # Candidate departure points: the current vertex and the junctions already driven past
+        # (plus, on a detour still retracing the old route, the junction that retrace leads to)
+        nodes = graph.nodes_of(route_points if via is not None else route_points[:current + 1])
+        candidates = [i for i in range(current + 1) if nodes[i] >= 0 and (i == current or graph.node_chain[nodes[i]] < 0)]
+        if via is not None:
+            ahead = self._retrace_end(nodes, current, via)
+            if ahead is not None:
+                candidates.append(ahead)
+        best = None
+        for i in candidates:
+            km = tree.distance_from(int(nodes[i]))[0]
+            lead_km = abs(chainage[current] - chainage[i])
+            if best is None or lead_km + km < best[0]:
+                best = (lead_km + km, i)
+        if best is None or best[0] == float("inf"):
+            return None
+
+        total_km, i = float(best[0]), best[1]
+        km, path = tree.path_from(int(nodes[i]))
+        # Back along the road already driven (or on along the retrace)
+        waypoints = (route_points[i:current + 1][::-1] if i <= current else route_points[current:i + 1]).tolist()
+        waypoints.extend([graph._lat[n], graph._lon[n]] for n in path[1:])
+        if root_km > SNAP_CONNECT_KM:
+            waypoints.append([float(end[0]), float(end[1])])
+            total_km += root_km
+        return {
+            "distance_km": round(total_km, 2),
+            "duration_hours": round(total_km / OFFLINE_SPEED_KMH, 2),
+            "waypoints": waypoints,
+            "source": "offline",
+            "via": graph.path_label_sets(path),
+        }
+
+    async def _convoy_chainage(self, db, convoys: List[Convoy], geometries: Dict[int, RouteGeometry]) -> Dict[int, int]:
+        """ Route vertex reached by each convoy: the furthest-along asset's nearest vertex """
+        res = await db.execute(
+            select(TransportAsset.convoy_id, TransportAsset.current_lat, TransportAsset.current_long)
+            .where(TransportAsset.convoy_id.in_([c.id for c in convoys]), TransportAsset.current_lat.is_not(None))
+        )
+        positions: Dict[int, List] = {}
+        for convoy_id, lat, lon in res.all():
+            positions.setdefault(convoy_id, []).append((lat, lon))
+
+        reached = {}
+        for convoy in convoys:
+            geometry = geometries[convoy.route_id]
+            if geometry.num_points < 2:
+                continue
+            pts = np.asarray(positions.get(convoy.id, []), dtype=np.float64).reshape(-1, 2)
+            if not len(pts):
+                reached[convoy.id] = 0 # Not started moving yet
+                continue
+            d = haversine_np(pts[:, :1], pts[:, 1:], geometry.lat[None, :], geometry.lon[None, :])
+            reached[convoy.id] = int(d.argmin(axis=1).max())
+        return reached
+
+    async def reroute(self, db, route_ids: Optional[Iterable[int]] = None) -> dict:
+        """
+        Detour the IN_TRANSIT convoys on impassable routes (optionally only these route ids),
+        and those on earlier detours over them. Returns a summary of the convoys that were
+        moved to a new route.
+        """
+        async with self._lock:
+            impassable = frozenset((await db.execute(select(Route.id).where(impassable_filter()))).scalars().all())
+            targets = impassable if route_ids is None else impassable & frozenset(route_ids)
+            summary = {"affected": 0, "rerouted": [], "no_detour": []}
+            if not targets:
+                return summary
+
+            res = await db.execute(
+                select(Convoy, Route.detour_via).join(Route, Convoy.route_id == Route.id)
+                .where(Convoy.status == "IN_TRANSIT", or_(Convoy.route_id.in_(targets), Route.is_detour.is_(True)))
+            )
+            convoys = [
+                convoy for convoy, via in res.all()
+                if convoy.route_id in targets or detour_closed(via, impassable, targets)
+            ]
+            summary["affected"] = len(convoys)
+            if not convoys:
+                return summary
+
+            graph = await self.ensure_graph(db)
+            self._apply_closures(impassable)
+            res = await db.execute(select(Route).where(Route.id.in_({c.route_id for c in convoys})))
+            routes = res.scalars().all()
+            geometries = {r.id: route_geometry_cache.get(r) for r in routes}
+            vias = {r.id: r.detour_via or [] for r in routes if r.is_detour}
+            reached = await self._convoy_chainage(db, convoys, geometries)
+
+            def plan():
+                # Convoys sharing a destination share one tree (built or repaired once)
+                detours = {}
+                for convoy in convoys:
+                    if convoy.id not in reached:
+                        continue
+                    geometry = geometries[convoy.route_id]
+                    points = np.column_stack((geometry.lat, geometry.lon))
+                    detours[convoy.id] = self._detour(
+                        points, geometry.cumulative_km, reached[convoy.id], vias.get(convoy.route_id)
+                    )
+                return detours
+
+            detours = await asyncio.to_thread(plan) if graph is not None else {}
+
+            now = datetime.utcnow()
+            for convoy in convoys:
+                detour = detours.get(convoy.id)
+                if detour is None:
+                    summary["no_detour"].append(convoy.id)
+                    continue
+                route = Route(
+                    name=f"Detour: {convoy.name}", status="OPEN", risk_level="LOW",
+                    is_detour=True, detour_via=detour["via"]
+                )
+                route.apply_planned_metrics(detour)
+                db.add(route)
+                await db.flush()
+                old_route_id = convoy.route_id
+                convoy.route_id = route.id
+                convoy.estimated_arrival_time = now + timedelta(hours=route.duration_hours)
+                summary["rerouted"].append({
+                    "convoy_id": convoy.id, "from_route_id": old_route_id, "route_id": route.id,
+                    "distance_km": route.distance_km,
+                })
+            await db.commit()
+            print(f"Re-routing: {len(summary['rerouted'])} of {summary['affected']} affected convoys detoured")
+            return summary
+
+    def stats(self) -> dict:
+        return {
+            "trees_cached": len(self._trees),
+            "trees_built": self.trees_built,
+            "junctions_repaired": self.junctions_repaired,
+            "closed_routes": len(self._impassable),
+        }
+
+
+# Process-wide engine used by the routes and convoys endpoints
+rerouting_engine = ReroutingEngine()
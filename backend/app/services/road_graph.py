@@ -0,0 +1,724 @@
+import asyncio
+import heapq
+import json
+import math
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.route import Route
+from app.services.geometry import DEFAULT_ROAD_SPEED_KMH, EARTH_RADIUS_KM, haversine_np, unpack_waypoints
+
+SNAP_PRECISION = 4 # Points of different polylines in the same 1e-4 deg cell (~11 m) become one node
+MAX_EDGE_KM = 5.0 # Longer segments are straight-line placeholders, not road geometry
+MAX_SNAP_KM = 25.0 # Queries further than this from any road are not routable
+SNAP_CONNECT_KM = 0.05 # Join the query point to the path when it is this far off the road
+OFFLINE_SPEED_KMH = DEFAULT_ROAD_SPEED_KMH # Average speed used for duration estimates
+GRAPH_CHECK_SEC = 30.0 # How often the router checks the routes table for changes
+ALT_PENALTY = 1.5 # Cost factor applied to a path's chains before searching for the next alternative
+ALT_MAX_OVERLAP = 0.8 # Alternatives sharing more of their length with a better one are dropped
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """ Scalar great-circle distance (A* heuristic; numpy overhead dominates for single points) """
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def load_road_network(path: str) -> List[List[List[float]]]:
+    """ [lat, lon] polylines from a GeoJSON file of LineString / MultiLineString features """
+    with open(path) as f:
+        data = json.load(f)
+    features = data.get("features", [data]) if isinstance(data, dict) else []
+    polylines = []
+    for feature in features:
+        geom = feature.get("geometry", feature) or {}
+        if geom.get("type") == "LineString":
+            lines = [geom["coordinates"]]
+        elif geom.get("type") == "MultiLineString":
+            lines = geom["coordinates"]
+        else:
+            continue
+        # GeoJSON is [lon, lat]
+        polylines.extend([[p[1], p[0]] for p in line] for line in lines if len(line) >= 2)
+    return polylines
+
+
+class RoadGraph:
+    """
+    Road graph fused from route polylines.
+
+    Vertices of all polylines are snapped to a grid so overlapping routes share nodes.
+    Chains of degree-2 nodes are then contracted into single edges between junctions,
+    so A* only expands junctions (typically a few hundred) rather than every vertex.
+    Optional labels (route ids) are kept per chain so callers can tell which routes a path uses.
+    """
+
+    def __init__(self, polylines, labels: Optional[List] = None):
+        scale = 10 ** SNAP_PRECISION
+        node_index: Dict[Tuple[int, int], int] = {}
+        lats: List[float] = []
+        lons: List[float] = []
+        edge_set = set()
+        edge_labels: Dict[Tuple[int, int], set] = {}
+
+        # 1. Snap vertices to shared nodes and collect undirected edges
+        for line_no, line in enumerate(polylines):
+            label = labels[line_no] if labels is not None else None
+            pts = np.asarray(line, dtype=np.float64).reshape(-1, 2)
+            keys = np.rint(pts * scale).astype(np.int64)
+            prev = -1
+            for (k_lat, k_lon), (lat, lon) in zip(keys.tolist(), pts.tolist()):
+                node = node_index.get((k_lat, k_lon))
+                if node is None:
+                    node = node_index[(k_lat, k_lon)] = len(lats)
+                    lats.append(lat)
+                    lons.append(lon)
+                if prev >= 0 and prev != node:
+                    edge = (min(prev, node), max(prev, node))
+                    edge_set.add(edge)
+                    if label is not None:
+                        edge_labels.setdefault(edge, set()).add(label)
+                prev = node
+
+        self._node_index = node_index
+        self._edge_labels = edge_labels
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lon = np.asarray(lons, dtype=np.float64)
+        self._lat = lats
+        self._lon = lons
+
+        edges = np.asarray(sorted(edge_set), dtype=np.int64).reshape(-1, 2)
+        edge_km = haversine_np(self.lat[edges[:, 0]], self.lon[edges[:, 0]], self.lat[edges[:, 1]], self.lon[edges[:, 1]])
+        keep = edge_km <= MAX_EDGE_KM
+        edges, edge_km = edges[keep], edge_km[keep]
+
+        adjacency: List[List[Tuple[int, float]]] = [[] for _ in lats]
+        for (u, v), km in zip(edges.tolist(), edge_km.tolist()):
+            adjacency[u].append((v, km))
+            adjacency[v].append((u, km))
+
+        # Only nodes on at least one real edge can be snapped to
+        self._snappable = np.flatnonzero([len(a) > 0 for a in adjacency])
+        self.num_edges = len(edges)
+        self._contract(adjacency, edge_labels)
+
+    def _contract(self, adjacency, edge_labels):
+        """ Collapse degree-2 chains into junction-to-junction edges that keep their geometry """
+        n = len(adjacency)
+        is_junction = [len(a) not in (0, 2) for a in adjacency]
+        self.node_chain = np.full(n, -1, dtype=np.int64)
+        self.node_pos = np.zeros(n, dtype=np.int64)
+        self.chain_nodes: List[List[int]] = []
+        self.chain_cum: List[List[float]] = []
+        self.chain_labels: List[frozenset] = []
+        self.chain_edge_labels: List[frozenset] = [] # Distinct per-edge label sets along each chain
+        self.junction_adj: Dict[int, List[Tuple[int, int, float, bool]]] = {}
+        walked = set()
+
+        def walk(start: int, first: int, first_km: float):
+            nodes, cum = [start, first], [0.0, first_km]
+            first_edge = (min(start, first), max(start, first))
+            walked.add(first_edge)
+            labels = set(edge_labels.get(first_edge, ()))
+            edge_sets = {frozenset(edge_labels.get(first_edge, ()))}
+            prev, cur = start, first
+            while not is_junction[cur]:
+                (n1, k1), (n2, k2) = adjacency[cur]
+                nxt, km = (n2, k2) if n1 == prev else (n1, k1)
+                edge = (min(cur, nxt), max(cur, nxt))
+                if edge in walked:
+                    break
+                walked.add(edge)
+                labels.update(edge_labels.get(edge, ()))
+                edge_sets.add(frozenset(edge_labels.get(edge, ())))
+                nodes.append(nxt)
+                cum.append(cum[-1] + km)
+                prev, cur = cur, nxt
+
+            chain = len(self.chain_nodes)
+            self.chain_nodes.append(nodes)
+            self.chain_cum.append(cum)
+            self.chain_labels.append(frozenset(labels))
+            self.chain_edge_labels.append(frozenset(edge_sets))
+            for pos in range(1, len(nodes) - 1):
+                self.node_chain[nodes[pos]] = chain
+                self.node_pos[nodes[pos]] = pos
+            a, b = nodes[0], nodes[-1]
+            self.junction_adj.setdefault(a, []).append((b, chain, cum[-1], True))
+            self.junction_adj.setdefault(b, []).append((a, chain, cum[-1], False))
+
+        for node in range(n):
+            if is_junction[node]:
+                for nbr, km in adjacency[node]:
+                    if (min(node, nbr), max(node, nbr)) not in walked:
+                        walk(node, nbr, km)
+
+        # Closed loops have no junction; promote one node of each to a junction
+        for node in range(n):
+            if len(adjacency[node]) == 2 and self.node_chain[node] < 0 and not is_junction[node]:
+                is_junction[node] = True
+                for nbr, km in adjacency[node]:
+                    if (min(node, nbr), max(node, nbr)) not in walked:
+                        walk(node, nbr, km)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self._snappable)
+
+    @property
+    def num_junctions(self) -> int:
+        return len(self.junction_adj)
+
+    def snap(self, point, allowed: Optional[np.ndarray] = None) -> Tuple[Optional[int], float]:
+        """ Nearest road node to a [lat, lon] point and its distance in km (optionally only allowed nodes) """
+        candidates = self._snappable if allowed is None else self._snappable[allowed[self._snappable]]
+        if not len(candidates):
+            return None, math.inf
+        d = haversine_np(point[0], point[1], self.lat[candidates], self.lon[candidates])
+        i = int(np.argmin(d))
+        return int(candidates[i]), float(d[i])
+
+    def nodes_of(self, points) -> np.ndarray:
+        """ Graph node of each polyline vertex the graph was built from (-1 where unknown) """
+        keys = np.rint(np.asarray(points, dtype=np.float64).reshape(-1, 2) * 10 ** SNAP_PRECISION).astype(np.int64)
+        return np.array([self._node_index.get(k, -1) for k in map(tuple, keys.tolist())], dtype=np.int64)
+
+    def blocked_chains(self, labels) -> np.ndarray:
+        """ Chains that include an edge carried only by the given labels (e.g. blocked route ids) """
+        labels = frozenset(labels)
+        return np.array(
+            [any(edge and edge <= labels for edge in sets) for sets in self.chain_edge_labels], dtype=bool
+        )
+
+    def open_nodes(self, chain_blocked: np.ndarray) -> np.ndarray:
+        """ Nodes still reachable by road when the given chains are closed """
+        chain_of = self.node_chain
+        usable = np.zeros(len(chain_of), dtype=bool)
+        on_chain = chain_of >= 0
+        usable[on_chain] = ~chain_blocked[chain_of[on_chain]]
+        for j, adj in self.junction_adj.items():
+            usable[j] = any(not chain_blocked[chain] for _, chain, _, _ in adj)
+        return usable
+
+    def _attachments(self, node: int) -> List[Tuple[int, float, List[int]]]:
+        """ Junctions reachable from a node along its chain: (junction, km, nodes from node to junction) """
+        chain = self.node_chain[node]
+        if chain < 0:
+            return [(node, 0.0, [node])]
+        nodes, cum, pos = self.chain_nodes[chain], self.chain_cum[chain], self.node_pos[node]
+        return [
+            (nodes[0], cum[pos], nodes[pos::-1]),
+            (nodes[-1], cum[-1] - cum[pos], nodes[pos:]),
+        ]
+
+    def shortest_path(self, source: int, target: int,
+                      chain_factor: Optional[Dict[int, float]] = None) -> Optional[Tuple[float, List[int]]]:
+        """
+        A* between two graph nodes. Returns (cost, node path) or None if disconnected.
+        Cost is km unless chain_factor (>= 1 per chain) makes some chains costlier.
+        """
+        if source == target:
+            return 0.0, [source]
+        t_lat, t_lon = self._lat[target], self._lon[target]
+
+        def h(j: int) -> float:
+            return _haversine_km(self._lat[j], self._lon[j], t_lat, t_lon)
+
+        best_km, best_end = math.inf, None
+        # Both ends inside the same chain: walking along it is a candidate too
+        chain = self.node_chain[source]
+        if chain >= 0 and chain == self.node_chain[target]:
+            cum = self.chain_cum[chain]
+            best_km = abs(cum[self.node_pos[source]] - cum[self.node_pos[target]])
+            best_end = ("direct", chain)
+
+        targets: Dict[int, Tuple[float, List[int]]] = {}
+        for junction, km, nodes in self._attachments(target):
+            if junction not in targets or km < targets[junction][0]:
+                targets[junction] = (km, nodes[::-1])
+
+        dist: Dict[int, float] = {}
+        came_from: Dict[int, tuple] = {}
+        heap = []
+        for junction, km, nodes in self._attachments(source):
+            if km < dist.get(junction, math.inf):
+                dist[junction] = km
+                came_from[junction] = ("source", nodes)
+                heapq.heappush(heap, (km + h(junction), km, junction))
+
+        while heap:
+            f, g, j = heapq.heappop(heap)
+            if f >= best_km:
+                break
+            if g > dist[j]:
+                continue
+            if j in targets and g + targets[j][0] < best_km:
+                best_km, best_end = g + targets[j][0], j
+            for nbr, chain, km, forward in self.junction_adj.get(j, ()):
+                ng = g + (km * chain_factor.get(chain, 1.0) if chain_factor else km)
+                if ng < dist.get(nbr, math.inf):
+                    dist[nbr] = ng
+                    came_from[nbr] = (j, chain, forward)
+                    heapq.heappush(heap, (ng + h(nbr), ng, nbr))
+
+        if best_end is None:
+            return None
+        return best_km, self._reconstruct(source, target, best_end, came_from, targets)
+
+    def _reconstruct(self, source, target, best_end, came_from, targets) -> List[int]:
+        if isinstance(best_end, tuple):
+            nodes = self.chain_nodes[best_end[1]]
+            i, k = self.node_pos[source], self.node_pos[target]
+            return nodes[i:k + 1] if i <= k else nodes[k:i + 1][::-1]
+
+        # Walk junction predecessors back to the source, then expand chains forwards
+        pieces = [targets[best_end][1]]
+        j = best_end
+        while came_from[j][0] != "source":
+            prev, chain, forward = came_from[j]
+            nodes = self.chain_nodes[chain]
+            pieces.append(nodes if forward else nodes[::-1])
+            j = prev
+        pieces.append(came_from[j][1])
+
+        path: List[int] = []
+        for piece in reversed(pieces):
+            path.extend(piece[1:] if path else piece)
+        return path
+
+    def _junction_distances(self, source: int, track_labels: bool = False):
+        """
+        Dijkstra from a node to every reachable junction (one-to-many, no heuristic).
+        Returns (km per junction, labels used to reach each junction or None).
+        """
+        dist: Dict[int, float] = {}
+        via: Optional[Dict[int, frozenset]] = {} if track_labels else None
+        chain = self.node_chain[source]
+        start_labels = self.chain_labels[chain] if chain >= 0 else frozenset()
+        heap = []
+        for junction, km, _ in self._attachments(source):
+            if km < dist.get(junction, math.inf):
+                dist[junction] = km
+                if via is not None:
+                    via[junction] = start_labels
+                heapq.heappush(heap, (km, junction))
+        while heap:
+            g, j = heapq.heappop(heap)
+            if g > dist[j]:
+                continue
+            for nbr, chain, km, _ in self.junction_adj.get(j, ()):
+                ng = g + km
+                if ng < dist.get(nbr, math.inf):
+                    dist[nbr] = ng
+                    if via is not None:
+                        via[nbr] = via[j] | self.chain_labels[chain]
+                    heapq.heappush(heap, (ng, nbr))
+        return dist, via
+
+    def _snap_targets(self, destinations) -> list:
+        targets = []
+        for point in destinations:
+            node, snap_km = self.snap(point)
+            if node is None or snap_km > MAX_SNAP_KM:
+                targets.append(None)
+            else:
+                targets.append((node, snap_km if snap_km > SNAP_CONNECT_KM else 0.0, self._attachments(node)))
+        return targets
+
+    def _row(self, origin, targets, track_labels: bool = False):
+        """ km from one origin point to each snapped target (NaN where unroutable), plus labels per path """
+        km_row = np.full(len(targets), np.nan)
+        via_row: List[Optional[frozenset]] = [None] * len(targets)
+        source, source_km = self.snap(origin)
+        if source is None or source_km > MAX_SNAP_KM:
+            return km_row, via_row
+        connect_km = source_km if source_km > SNAP_CONNECT_KM else 0.0
+        dist, via = self._junction_distances(source, track_labels)
+        chain = self.node_chain[source]
+
+        for di, target in enumerate(targets):
+            if target is None:
+                continue
+            node, target_km, attachments = target
+            best, best_labels = math.inf, frozenset()
+            target_chain = self.node_chain[node]
+            for j, km, _ in attachments:
+                if dist.get(j, math.inf) + km < best:
+                    best = dist[j] + km
+                    if via is not None:
+                        best_labels = via[j] | (self.chain_labels[target_chain] if target_chain >= 0 else frozenset())
+            if source == node:
+                best, best_labels = 0.0, frozenset()
+            elif chain >= 0 and chain == target_chain:
+                cum = self.chain_cum[chain]
+                direct = abs(cum[self.node_pos[source]] - cum[self.node_pos[node]])
+                if direct < best:
+                    best, best_labels = direct, self.chain_labels[chain]
+            if best < math.inf:
+                km_row[di] = best + connect_km + target_km
+                via_row[di] = best_labels
+        return km_row, via_row
+
+    def distance_matrix(self, origins, destinations) -> np.ndarray:
+        """ Road km from every origin to every destination (NaN where unroutable), one Dijkstra per origin """
+        targets = self._snap_targets(destinations)
+        out = np.full((len(origins), len(destinations)), np.nan)
+        for oi, point in enumerate(origins):
+            out[oi] = self._row(point, targets)[0]
+        return out
+
+    def travel_rows(self, origins, destinations):
+        """ Like distance_matrix, but also returns the labels (route ids) each path uses """
+        targets = self._snap_targets(destinations)
+        km = np.full((len(origins), len(destinations)), np.nan)
+        via = []
+        for oi, point in enumerate(origins):
+            km[oi], via_row = self._row(point, targets, track_labels=True)
+            via.append(via_row)
+        return km, via
+
+    def route(self, start_coords: List[float], end_coords: List[float]) -> Optional[dict]:
+        """ Same shape as get_route_metrics_with_path: { 'distance_km', 'duration_hours', 'waypoints' } """
+        routes = self.alternatives(start_coords, end_coords, k=1)
+        return routes[0] if routes else None
+
+    def alternatives(self, start_coords: List[float], end_coords: List[float], k: int = 3) -> List[dict]:
+        """
+        Up to k distinct routes, shortest first (penalty method): after each search the chains
+        of the path found are made ALT_PENALTY times costlier, and paths overlapping an earlier
+        one by more than ALT_MAX_OVERLAP of their length are skipped.
+        """
+        source, source_km = self.snap(start_coords)
+        target, target_km = self.snap(end_coords)
+        if source is None or source_km > MAX_SNAP_KM or target_km > MAX_SNAP_KM:
+            return []
+
+        chain_factor: Dict[int, float] = {}
+        found: List[Tuple[List[int], Dict[Tuple[int, int], float]]] = []
+        for _ in range(3 * k):
+            result = self.shortest_path(source, target, chain_factor)
+            if result is None:
+                break
+            path = result[1]
+            edges = self._path_edges(path)
+            length = sum(edges.values()) or 1.0
+            if all(sum(km for e, km in edges.items() if e in prev) / length <= ALT_MAX_OVERLAP for _, prev in found):
+                found.append((path, edges))
+                if len(found) == k:
+                    break
+            if not edges:
+                break # Source and target share a node; there is no other way
+            for chain in self._path_chains(path):
+                chain_factor[chain] = chain_factor.get(chain, 1.0) * ALT_PENALTY
+
+        routes = []
+        for path, edges in found:
+            km = sum(edges.values())
+            waypoints = [[self._lat[n], self._lon[n]] for n in path]
+            if source_km > SNAP_CONNECT_KM:
+                waypoints.insert(0, [float(start_coords[0]), float(start_coords[1])])
+                km += source_km
+            if target_km > SNAP_CONNECT_KM:
+                waypoints.append([float(end_coords[0]), float(end_coords[1])])
+                km += target_km
+            routes.append({
+                "distance_km": round(km, 2),
+                "duration_hours": round(km / OFFLINE_SPEED_KMH, 2),
+                "waypoints": waypoints
+            })
+        return routes
+
+    def _path_edges(self, path: List[int]) -> Dict[Tuple[int, int], float]:
+        """ Undirected edges of a node path with their km """
+        edges = {}
+        for u, v in zip(path, path[1:]):
+            edges[(min(u, v), max(u, v))] = _haversine_km(self._lat[u], self._lon[u], self._lat[v], self._lon[v])
+        return edges
+
+    def _path_chains(self, path: List[int]) -> set:
+        """ Chains a node path runs along """
+        chains = {int(self.node_chain[n]) for n in path if self.node_chain[n] >= 0}
+        # Chains without interior nodes connect two junctions directly
+        for u, v in zip(path, path[1:]):
+            if self.node_chain[u] < 0 and self.node_chain[v] < 0:
+                chains.update(c for nbr, c, _, _ in self.junction_adj.get(u, ()) if nbr == v)
+        return chains
+
+    def path_label_sets(self, path: List[int]) -> List[List]:
+        """
+        Distinct per-edge label sets of the chains a node path runs along, as sorted lists
+        (JSON-ready). The path is closed once every label of one of these sets is.
+        """
+        sets = {edge for chain in self._path_chains(path) for edge in self.chain_edge_labels[chain] if edge}
+        return sorted(sorted(edge) for edge in sets)
+
+    def label_exposure(self, waypoints) -> Dict[frozenset, float]:
+        """
+        km of a polyline running along labelled edges, per distinct label set (routes sharing
+        a road count once). Stretches off the graph or on unlabelled roads are ignored.
+        """
+        pts = np.asarray(waypoints, dtype=np.float64).reshape(-1, 2)
+        if len(pts) < 2:
+            return {}
+        nodes = self.nodes_of(pts)
+        seg_km = haversine_np(pts[:-1, 0], pts[:-1, 1], pts[1:, 0], pts[1:, 1])
+        exposure: Dict[frozenset, float] = {}
+        for u, v, km in zip(nodes[:-1].tolist(), nodes[1:].tolist(), seg_km.tolist()):
+            if u < 0 or v < 0:
+                continue
+            labels = self._edge_labels.get((min(u, v), max(u, v)))
+            if labels:
+                key = frozenset(labels)
+                exposure[key] = exposure.get(key, 0.0) + km
+        return exposure
+
+
+class ShortestPathTree:
+    """
+    Shortest paths from every junction to one root node, over a RoadGraph with some chains closed.
+
+    The tree is kept and repaired instead of rebuilt when chains close or re-open:
+    closing a chain discards only the subtree that hung off it and re-settles those
+    junctions from their still-valid neighbours; re-opening one relaxes its endpoints
+    and propagates only the improvements. Any node's path to the root is then read
+    off the parent pointers without a new search.
+    """
+
+    def __init__(self, graph: RoadGraph, root: int, chain_blocked: np.ndarray):
+        self.graph = graph
+        self.root = root
+        self.root_chain = int(graph.node_chain[root])
+        self.chain_blocked = chain_blocked.copy()
+        self.dist: Dict[int, float] = {}
+        self.parent: Dict[int, tuple] = {} # junction -> (next junction or -1 for the root, chain)
+        self.children: Dict[int, set] = {}
+        self.root_legs: Dict[int, List[int]] = {} # junction -> nodes along the root's chain to the root
+        self.settled = 0 # Junctions (re)settled over the tree's lifetime
+        heap = self._root_seeds()
+        self._propagate(heap)
+
+    def _root_seeds(self) -> list:
+        """ Junctions attached to the root along its own chain """
+        heap = []
+        if self.root_chain >= 0 and self.chain_blocked[self.root_chain]:
+            return heap
+        for junction, km, nodes in self.graph._attachments(self.root):
+            if km < self.dist.get(junction, math.inf):
+                self._set(junction, km, (-1, self.root_chain))
+                self.root_legs[junction] = nodes[::-1]
+                heapq.heappush(heap, (km, junction))
+        return heap
+
+    def _set(self, junction: int, km: float, parent: tuple):
+        old = self.parent.get(junction)
+        if old is not None:
+            self.children.get(old[0], set()).discard(junction)
+        self.dist[junction] = km
+        self.parent[junction] = parent
+        self.children.setdefault(parent[0], set()).add(junction)
+
+    def _propagate(self, heap: list):
+        """ Dijkstra from the given frontier; only improvements are written """
+        adjacency = self.graph.junction_adj
+        while heap:
+            g, j = heapq.heappop(heap)
+            if g > self.dist.get(j, math.inf):
+                continue
+            self.settled += 1
+            for nbr, chain, km, _ in adjacency.get(j, ()):
+                if nbr == j or self.chain_blocked[chain]:
+                    continue
+                ng = g + km
+                if ng < self.dist.get(nbr, math.inf):
+                    self._set(nbr, ng, (j, chain))
+                    heapq.heappush(heap, (ng, nbr))
+
+    def update(self, chain_blocked: np.ndarray) -> int:
+        """ Apply a new set of closed chains. Returns the number of junctions re-settled """
+        closed = np.flatnonzero(chain_blocked & ~self.chain_blocked)
+        opened = np.flatnonzero(~chain_blocked & self.chain_blocked)
+        before = self.settled
+        self.chain_blocked = chain_blocked.copy()
+        if self.root_chain >= 0 and (self.root_chain in closed or self.root_chain in opened):
+            # The root's own road changed; nothing in the old tree can be trusted
+            self.dist, self.parent, self.children, self.root_legs = {}, {}, {}, {}
+            self._propagate(self._root_seeds())
+            return self.settled - before
+
+        adjacency = self.graph.junction_adj
+        # 1. Closed chains: drop every junction whose path to the root used one of them
+        if len(closed):
+            closed_set = set(closed.tolist())
+            stack = [j for j, (_, chain) in self.parent.items() if chain in closed_set]
+            invalid = set()
+            while stack:
+                j = stack.pop()
+                if j in invalid:
+                    continue
+                invalid.add(j)
+                stack.extend(self.children.get(j, ()))
+            for j in invalid:
+                old = self.parent.pop(j)
+                self.children.get(old[0], set()).discard(j)
+                del self.dist[j]
+            # Re-seed them from neighbours that kept their distance, and from the root's own legs
+            # (an invalidated end of the root's chain must get its direct leg back)
+            heap = []
+            for j in invalid:
+                for nbr, chain, km, _ in adjacency.get(j, ()):
+                    if nbr in self.dist and nbr not in invalid and not self.chain_blocked[chain]:
+                        if self.dist[nbr] + km < self.dist.get(j, math.inf):
+                            self._set(j, self.dist[nbr] + km, (nbr, chain))
+                if j in self.dist:
+                    heapq.heappush(heap, (self.dist[j], j))
+            for entry in self._root_seeds():
+                heapq.heappush(heap, entry)
+            self._propagate(heap)
+
+        # 2. Re-opened chains: relax their two ends and spread the improvements
+        if len(opened):
+            heap = []
+            for chain in opened.tolist():
+                nodes, km = self.graph.chain_nodes[chain], self.graph.chain_cum[chain][-1]
+                for a, b in ((nodes[0], nodes[-1]), (nodes[-1], nodes[0])):
+                    if a != b and a in self.dist and self.dist[a] + km < self.dist.get(b, math.inf):
+                        self._set(b, self.dist[a] + km, (a, chain))
+                        heapq.heappush(heap, (self.dist[b], b))
+            self._propagate(heap)
+        return self.settled - before
+
+    def distance_from(self, node: int) -> Tuple[float, Optional[int], List[int]]:
+        """ (km, junction entered, nodes from node to that junction) for the best way onto the tree """
+        graph = self.graph
+        chain = int(graph.node_chain[node])
+        if node == self.root:
+            return 0.0, None, [node]
+        if chain >= 0 and self.chain_blocked[chain]:
+            return math.inf, None, []
+        best = (math.inf, None, [])
+        if chain >= 0 and chain == self.root_chain:
+            nodes, cum = graph.chain_nodes[chain], graph.chain_cum[chain]
+            i, k = graph.node_pos[node], graph.node_pos[self.root]
+            best = (abs(cum[i] - cum[k]), None, nodes[i:k + 1] if i <= k else nodes[k:i + 1][::-1])
+        for junction, km, nodes in graph._attachments(node):
+            if km + self.dist.get(junction, math.inf) < best[0]:
+                best = (km + self.dist[junction], junction, nodes)
+        return best
+
+    def path_from(self, node: int) -> Optional[Tuple[float, List[int]]]:
+        """ (km, node path from node to the root) read off the tree, or None if disconnected """
+        km, junction, path = self.distance_from(node)
+        if km == math.inf:
+            return None
+        if junction is None:
+            return km, list(path)
+        graph = self.graph
+        path = list(path)
+        j = junction
+        while True:
+            nxt, chain = self.parent[j]
+            if nxt < 0:
+                path.extend(self.root_legs[j][1:]) # Last leg along the root's own chain
+                break
+            nodes = graph.chain_nodes[chain]
+            leg = nodes if nodes[0] == j else nodes[::-1]
+            path.extend(leg[1:])
+            j = nxt
+        return km, path
+
+
+class OfflineRouter:
+    """
+    In-process routing over a RoadGraph of every stored (non-blocked) route, plus the
+    optional ROAD_NETWORK_PATH file. The graph is rebuilt, off the event loop, only
+    when a cheap signature of the routes table changes.
+    """
+
+    def __init__(self):
+        self.graph: Optional[RoadGraph] = None
+        self.route_versions: Dict[int, int] = {} # Usable route id -> geometry version in the current graph
+        self._signature = None
+        self._checked_at = 0.0
+        self._road_network: Optional[List] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """ Re-check the routes table on the next query """
+        self._checked_at = 0.0
+
+    def network_polylines(self) -> List:
+        if self._road_network is None:
+            self._road_network = []
+            if settings.ROAD_NETWORK_PATH:
+                try:
+                    self._road_network = load_road_network(settings.ROAD_NETWORK_PATH)
+                    print(f"Loaded {len(self._road_network)} road polylines from {settings.ROAD_NETWORK_PATH}")
+                except (OSError, ValueError) as e:
+                    print(f"Could not load road network file: {e}")
+        return self._road_network
+
+    @property
+    def signature(self):
+        """ Signature of the usable routes the current graph was built from """
+        return self._signature
+
+    async def ensure_graph(self) -> Optional[RoadGraph]:
+        if self.graph is not None and time.monotonic() - self._checked_at < GRAPH_CHECK_SEC:
+            return self.graph
+        async with self._lock:
+            if self.graph is not None and time.monotonic() - self._checked_at < GRAPH_CHECK_SEC:
+                return self.graph
+            try:
+                async with SessionLocal() as db:
+                    # Detours only re-trace roads already in the graph
+                    usable = Route.status.is_distinct_from("BLOCKED") & Route.is_detour.is_(False)
+                    signature = tuple((await db.execute(
+                        select(func.count(Route.id), func.max(Route.id), func.sum(Route.version)).where(usable)
+                    )).one())
+                    if self.graph is None or signature != self._signature:
+                        res = (await db.execute(select(Route.id, Route.version, Route.waypoints_packed).where(usable))).all()
+                        routes = [(route_id, unpack_waypoints(b)) for route_id, _, b in res]
+                        routes = [(route_id, p) for route_id, p in routes if len(p) >= 2]
+                        network = self.network_polylines()
+                        # Route polylines are labelled with their id; imported roads are unlabelled
+                        polylines = [p for _, p in routes] + network
+                        labels = [route_id for route_id, _ in routes] + [None] * len(network)
+                        started = time.perf_counter()
+                        self.graph = await asyncio.to_thread(RoadGraph, polylines, labels)
+                        self.route_versions = {route_id: version for route_id, version, _ in res}
+                        self._signature = signature
+                        print(f"Offline road graph: {self.graph.num_nodes} nodes, {self.graph.num_junctions} junctions "
+                              f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+            except Exception as e:
+                print(f"Offline road graph refresh failed: {e}")
+            self._checked_at = time.monotonic()
+        return self.graph
+
+    async def route(self, start_coords: List[float], end_coords: List[float]) -> Optional[dict]:
+        graph = await self.ensure_graph()
+        if graph is None:
+            return None
+        return await asyncio.to_thread(graph.route, start_coords, end_coords)
+
+    async def alternatives(self, start_coords: List[float], end_coords: List[float], k: int) -> List[dict]:
+        graph = await self.ensure_graph()
+        if graph is None:
+            return []
+        return await asyncio.to_thread(graph.alternatives, start_coords, end_coords, k)
+
+    async def distance_matrix(self, origins, destinations) -> Optional[np.ndarray]:
+        """ Road km matrix (NaN where unroutable); computed off the event loop """
+        graph = await self.ensure_graph()
+        if graph is None:
+            return None
+        return await asyncio.to_thread(graph.distance_matrix, origins, destinations)
+
+
+# Process-wide offline router used by app/services/routing.py
+offline_router = OfflineRouter()
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Endpoints are snapped to 1e-4 deg (~11 m) so near-identical requests share an entry
+KEY_PRECISION = 4
+PURGE_EVERY_SEC = 3600.0 # How often writers delete expired rows from the disk tier
+
+RouteKey = Tuple[str, float, float, float, float]
+
+
+def route_cache_key(profile: str, start_coords: List[float], end_coords: List[float]) -> RouteKey:
+    """ (profile, start lat, start lon, end lat, end lon) with coordinates quantized """
+    return (
+        profile,
+        round(float(start_coords[0]), KEY_PRECISION), round(float(start_coords[1]), KEY_PRECISION),
+        round(float(end_coords[0]), KEY_PRECISION), round(float(end_coords[1]), KEY_PRECISION),
+    )
+
+
+class DiskRouteStore:
+    """
+    On-disk tier: one SQLite file shared by the API, the simulation and the seed scripts.
+    Entries older than the TTL are treated as missing and overwritten on the next fetch;
+    expired rows are deleted when the store opens and then at most hourly on writes.
+    """
+
+    def __init__(self, path: str, ttl_sec: float):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS routes (key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, body TEXT NOT NULL)"
+            )
+        self._purged_at = 0.0
+        self.purge_expired()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5.0)
+
+    def get(self, key: RouteKey) -> Optional[dict]:
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT fetched_at, body FROM routes WHERE key = ?", (json.dumps(key),)).fetchone()
+        if row is None or time.time() - row[0] > self.ttl_sec:
+            return None
+        return json.loads(row[1])
+
+    def put(self, key: RouteKey, value: dict):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO routes (key, fetched_at, body) VALUES (?, ?, ?)",
+                (json.dumps(key), time.time(), json.dumps(value, separators=(",", ":")))
+            )
+        if time.monotonic() - self._purged_at > PURGE_EVERY_SEC:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        self._purged_at = time.monotonic()
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM routes WHERE fetched_at < ?", (time.time() - self.ttl_sec,)).rowcount
+
+
+class RouteCache:
+    """
+    Two-tier cache of routing responses: an in-memory LRU in front of a TTL'd disk store.
+
+    Concurrent lookups of the same key share one in-flight fetch (single-flight), so a
+    burst of identical plans costs one routing call. Failed fetches (None) are not cached.
+    Returned values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = 256, disk: Optional[DiskRouteStore] = None):
+        self.max_entries = max_entries
+        self.disk = disk
+        self._entries: "OrderedDict[RouteKey, dict]" = OrderedDict()
+        self._inflight: Dict[RouteKey, asyncio.Future] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.fetches = 0
+        self.shared_fetches = 0
+
+    def _remember(self, key: RouteKey, value: dict):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, key: RouteKey, fetch: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        # 1. Memory tier
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return value
+
+        # 2. Join an identical fetch that is already running
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.shared_fetches += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, fetch)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception() # Mark retrieved so a lone failure isn't logged as unhandled
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _load(self, key: RouteKey, fetch) -> Optional[dict]:
+        # 3. Disk tier (blocking SQLite I/O kept off the event loop)
+        if self.disk is not None:
+            try:
+                value = await asyncio.to_thread(self.disk.get, key)
+            except sqlite3.Error as e:
+                print(f"Route cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+
+        # 4. Routing server
+        self.fetches += 1
+        value = await fetch()
+        if value is not None:
+            self._remember(key, value)
+            if self.disk is not None:
+                try:
+                    await asyncio.to_thread(self.disk.put, key, value)
+                except sqlite3.Error as e:
+                    print(f"Route cache write failed: {e}")
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "fetches": self.fetches,
+            "shared_fetches": self.shared_fetches,
+        }
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _build_route_cache() -> RouteCache:
+    disk = None
+    if settings.ROUTE_CACHE_PATH:
+        try:
+            disk = DiskRouteStore(settings.ROUTE_CACHE_PATH, settings.ROUTE_CACHE_TTL_SEC)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Route cache disk tier disabled: {e}")
+    return RouteCache(settings.ROUTE_CACHE_MAX_ENTRIES, disk)
+
+
+# Process-wide cache used by app/services/routing.py
+route_cache = _build_route_cache()
@@ -1,72 +1,250 @@
+import asyncio
 import httpx
-from typing import List, Optional
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.http_client import CircuitBreaker, http_client
+from app.services.road_graph import OFFLINE_SPEED_KMH, offline_router
+from app.services.route_cache import route_cache, route_cache_key
+
+# OSRM Public Demo Server (Free)
+OSRM_BASE_URL = "http://router.project-osrm.org/route/v1/"
+OSRM_TABLE_URL = "http://router.project-osrm.org/table/v1/"
+OSRM_PROFILE = "driving"
+OSRM_TABLE_MAX_COORDS = 100 # osrm-routed default --max-table-size
+MATRIX_CONCURRENCY = 4 # Parallel table calls per matrix request
+# Tiny Jammu city route used to check whether the router is back
+OSRM_PROBE_URL = f"{OSRM_BASE_URL}{OSRM_PROFILE}/74.8570,32.7266;74.8600,32.7300?overview=false"
+
+
+async def _probe_osrm() -> bool:
+    resp = await http_client.get(OSRM_PROBE_URL)
+    return resp.status_code < 500
+
+
+# Open: planning skips OSRM and callers use their straight-line fallback
+osrm_breaker = CircuitBreaker(
+    "osrm", settings.ROUTING_BREAKER_FAILURES, settings.ROUTING_BREAKER_RESET_SEC, probe=_probe_osrm
+)
+
+
+async def _osrm_get(url: str) -> Optional[dict]:
+    """ GET an OSRM service URL through the shared client and circuit breaker. Returns the JSON body or None """
+    if not osrm_breaker.allow():
+        return None # Router is down; fail fast instead of waiting out the timeout
+
+    try:
+        resp = await http_client.get(url)
+        if resp.status_code >= 500:
+            osrm_breaker.record_failure()
+            print(f"Error fetching OSRM route: HTTP {resp.status_code}")
+            return None
+        # The router answered; a 4xx (e.g. no route between the points) is not an outage
+        osrm_breaker.record_success()
+        resp.raise_for_status()
+        return resp.json()
+    except httpx.TransportError as e:
+        # Connect/read timeouts and network errors count towards opening the breaker
+        osrm_breaker.record_failure()
+        print(f"Error fetching OSRM route: {e!r}")
+        return None
+    except Exception as e:
+        print(f"Error fetching OSRM route: {e}")
+        return None
+
+
+def _parse_osrm_route(route: dict) -> dict:
+    """ One OSRM route object -> { 'distance_km', 'duration_hours', 'waypoints' } """
+    # OSRM returns [lon, lat], we need [lat, lon]
+    geometry = route["geometry"]["coordinates"]
+    flipped_geom = [[p[1], p[0]] for p in geometry]
+
+    # Metrics
+    distance_meters = route.get("distance", 0)
+    duration_seconds = route.get("duration", 0)
+
+    return {
+        "distance_km": round(distance_meters / 1000.0, 2),
+        "duration_hours": round(duration_seconds / 3600.0, 2),
+        "waypoints": flipped_geom
+    }
+
+
+async def _fetch_osrm(start_coords: List[float], end_coords: List[float], profile: str) -> Optional[dict]:
+    """ One OSRM round trip. Returns { 'distance_km', 'duration_hours', 'waypoints' } or None """
+    # Format: {lon},{lat};{lon},{lat}
+    coords_str = f"{start_coords[1]},{start_coords[0]};{end_coords[1]},{end_coords[0]}"
+    url = f"{OSRM_BASE_URL}{profile}/{coords_str}?overview=full&geometries=geojson"
+
+    print(f"Fetching route data from OSRM: {url}")
+    data = await _osrm_get(url)
+    if data is None:
+        return None
+
+    if "routes" in data and len(data["routes"]) > 0:
+        return _parse_osrm_route(data["routes"][0])
+    else:
+        print("No route found by OSRM.")
+        return None
+
+
+async def _fetch_osrm_alternatives(start_coords: List[float], end_coords: List[float], k: int,
+                                   profile: str) -> Optional[dict]:
+    """ OSRM with alternatives=k-1. Returns { 'routes': [...] } (main route first) or None """
+    coords_str = f"{start_coords[1]},{start_coords[0]};{end_coords[1]},{end_coords[0]}"
+    url = f"{OSRM_BASE_URL}{profile}/{coords_str}?overview=full&geometries=geojson&alternatives={k - 1}"
+
+    print(f"Fetching alternative routes from OSRM: {url}")
+    data = await _osrm_get(url)
+    if not data or not data.get("routes"):
+        return None
+    return {"routes": [_parse_osrm_route(route) for route in data["routes"][:k]]}
+
+
+async def _cached_route(start_coords: List[float], end_coords: List[float], profile: str = OSRM_PROFILE) -> Optional[dict]:
+    """ Route via the shared cache: memory LRU, then disk, then a single in-flight OSRM call """
+    key = route_cache_key(profile, start_coords, end_coords)
+    return await route_cache.get_or_fetch(key, lambda: _fetch_osrm(start_coords, end_coords, profile))
+
+
+async def _planned_route(start_coords: List[float], end_coords: List[float]) -> Optional[dict]:
+    """ OSRM (cached) and/or the offline road graph, depending on ROUTING_MODE. Adds 'source' """
+    if settings.ROUTING_MODE != "offline":
+        route = await _cached_route(start_coords, end_coords)
+        if route is not None:
+            return {**route, "source": "osrm"}
+    if settings.ROUTING_MODE != "osrm":
+        route = await offline_router.route(start_coords, end_coords)
+        if route is not None:
+            return {**route, "source": "offline"}
+    return None
+
 
 async def fetch_osrm_route(start_coords: List[float], end_coords: List[float]) -> Optional[List[List[float]]]:
     """
-    Fetch exact driving route from OSRM (Open Source Routing Machine).
+    Fetch exact driving route from OSRM (Open Source Routing Machine),
+    or from the offline road graph when OSRM is unavailable or disabled.
     Coords format: [lat, lon]
-    Returns: List of [lat, lon] waypoints
+    Returns: List of [lat, lon] waypoints (cached; treat as read-only)
     """
-    # OSRM Public Demo Server (Free)
-    base_url = "http://router.project-osrm.org/route/v1/driving/"
-    
-    # Format: {lon},{lat};{lon},{lat}
-    coords_str = f"{start_coords[1]},{start_coords[0]};{end_coords[1]},{end_coords[0]}"
-    url = f"{base_url}{coords_str}?overview=full&geometries=geojson"
-    
-    print(f"Fetching route data from OSRM: {url}")
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(url, timeout=30.0)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            if "routes" in data and len(data["routes"]) > 0:
-                # OSRM returns [lon, lat], we need [lat, lon]
-                geometry = data["routes"][0]["geometry"]["coordinates"]
-                flipped_geom = [[p[1], p[0]] for p in geometry]
-                return flipped_geom
-            else:
-                print("No route found by OSRM.")
-                return None
-        except Exception as e:
-            print(f"Error fetching OSRM route: {e}")
-            return None
+    route = await _planned_route(start_coords, end_coords)
+    return route["waypoints"] if route else None
+
 
 async def get_route_metrics_with_path(start_coords: List[float], end_coords: List[float]) -> dict:
     """
     Fetch exact route with metrics (Distance, Duration) from OSRM.
-    Returns: { 'distance_km': float, 'duration_hours': float, 'waypoints': [...] }
+    Returns: { 'distance_km': float, 'duration_hours': float, 'waypoints': [...], 'source': 'osrm' | 'offline' }
     """
-    base_url = "http://router.project-osrm.org/route/v1/driving/"
-    coords_str = f"{start_coords[1]},{start_coords[0]};{end_coords[1]},{end_coords[0]}"
-    url = f"{base_url}{coords_str}?overview=full&geometries=geojson"
-    
-    print(f"Fetching estimate from OSRM: {url}")
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(url, timeout=30.0)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            if "routes" in data and len(data["routes"]) > 0:
-                route = data["routes"][0]
-                geometry = route["geometry"]["coordinates"]
-                flipped_geom = [[p[1], p[0]] for p in geometry]
-                
-                # Metrics
-                distance_meters = route.get("distance", 0)
-                duration_seconds = route.get("duration", 0)
-                
-                return {
-                    "distance_km": round(distance_meters / 1000.0, 2),
-                    "duration_hours": round(duration_seconds / 3600.0, 2),
-                    "waypoints": flipped_geom
-                }
-            else:
-                return None
-        except Exception as e:
-            print(f"Error fetching OSRM estimate: {e}")
-            return None
+    return await _planned_route(start_coords, end_coords)
+
+
+async def get_route_alternatives(start_coords: List[float], end_coords: List[float], k: int) -> List[dict]:
+    """
+    Up to k distinct routes between two points, each shaped like get_route_metrics_with_path.
+    OSRM alternatives come first (cached like single routes); the offline road graph fills up
+    the rest with penalty-method alternatives, skipping ones that duplicate an OSRM route.
+    """
+    routes: List[dict] = []
+    if settings.ROUTING_MODE != "offline":
+        key = route_cache_key(f"{OSRM_PROFILE}+alt{k}", start_coords, end_coords)
+        result = await route_cache.get_or_fetch(
+            key, lambda: _fetch_osrm_alternatives(start_coords, end_coords, k, OSRM_PROFILE)
+        )
+        if result is not None:
+            routes.extend({**route, "source": "osrm"} for route in result["routes"])
+    if len(routes) < k and settings.ROUTING_MODE != "osrm":
+        for route in await offline_router.alternatives(start_coords, end_coords, k):
+            if len(routes) >= k:
+                break
+            if any(abs(route["distance_km"] - r["distance_km"]) < 0.01 * max(r["distance_km"], 1.0) for r in routes):
+                continue # Most likely the same road as a route already found
+            routes.append({**route, "source": "offline"})
+    return routes
+
+
+async def _fetch_osrm_table(origins: list, destinations: list, profile: str = OSRM_PROFILE):
+    """ One OSRM table call. Returns (km, hours) arrays with NaN where unroutable, or None """
+    coords = ";".join(f"{p[1]},{p[0]}" for p in list(origins) + list(destinations))
+    sources = ";".join(str(i) for i in range(len(origins)))
+    targets = ";".join(str(len(origins) + i) for i in range(len(destinations)))
+    url = f"{OSRM_TABLE_URL}{profile}/{coords}?sources={sources}&destinations={targets}&annotations=distance,duration"
+
+    data = await _osrm_get(url)
+    if not data or data.get("code") != "Ok" or "distances" not in data or "durations" not in data:
+        return None
+    # Unroutable cells come back as null
+    km = np.array(data["distances"], dtype=np.float64) / 1000.0
+    hours = np.array(data["durations"], dtype=np.float64) / 3600.0
+    return km, hours
+
+
+def _dedupe(points: list) -> Tuple[list, np.ndarray]:
+    """ Unique points (at route cache precision) and each input's index into them """
+    index: Dict[tuple, int] = {}
+    unique = []
+    positions = []
+    for lat, lon in points:
+        key = route_cache_key(OSRM_PROFILE, [lat, lon], [lat, lon])[1:3]
+        if key not in index:
+            index[key] = len(unique)
+            unique.append([float(lat), float(lon)])
+        positions.append(index[key])
+    return unique, np.asarray(positions, dtype=np.int64)
+
+
+async def get_distance_matrix(origins: list, destinations: list) -> dict:
+    """
+    Road distance/duration from every origin to every destination ([lat, lon] points).
+    Identical points are routed once; OSRM `table` is called in chunks with bounded
+    concurrency, and cells it cannot fill come from the offline road graph.
+    Returns { 'distance_km': [[...]], 'duration_hours': [[...]], 'source': ... } with null where unroutable.
+    """
+    uniq_o, o_pos = _dedupe(origins)
+    uniq_d, d_pos = _dedupe(destinations)
+    km = np.full((len(uniq_o), len(uniq_d)), np.nan)
+    hours = np.full_like(km, np.nan)
+    sources = set()
+
+    # 1. OSRM table, chunked so each call stays under the server's coordinate limit
+    if settings.ROUTING_MODE != "offline":
+        step = max(OSRM_TABLE_MAX_COORDS // 2, 1)
+        slots = asyncio.Semaphore(MATRIX_CONCURRENCY)
+
+        async def fill(oi: int, di: int):
+            async with slots:
+                result = await _fetch_osrm_table(uniq_o[oi:oi + step], uniq_d[di:di + step])
+            if result is not None:
+                km[oi:oi + step, di:di + step], hours[oi:oi + step, di:di + step] = result
+
+        await asyncio.gather(*[
+            fill(oi, di) for oi in range(0, len(uniq_o), step) for di in range(0, len(uniq_d), step)
+        ])
+        if not np.isnan(km).all():
+            sources.add("osrm")
+
+    # 2. Offline road graph for whatever is still missing
+    missing = np.isnan(km)
+    if missing.any() and settings.ROUTING_MODE != "osrm":
+        rows = np.flatnonzero(missing.any(axis=1))
+        cols = np.flatnonzero(missing.any(axis=0))
+        offline_km = await offline_router.distance_matrix([uniq_o[i] for i in rows], [uniq_d[j] for j in cols])
+        if offline_km is not None:
+            block = np.ix_(rows, cols)
+            fill_mask = missing[block] & ~np.isnan(offline_km)
+            km[block] = np.where(fill_mask, offline_km, km[block])
+            hours[block] = np.where(fill_mask, offline_km / OFFLINE_SPEED_KMH, hours[block])
+            if fill_mask.any():
+                sources.add("offline")
+
+    def expand(values: np.ndarray) -> list:
+        full = np.round(values[np.ix_(o_pos, d_pos)], 2)
+        return [[None if np.isnan(v) else float(v) for v in row] for row in full]
+
+    return {
+        "distance_km": expand(km),
+        "duration_hours": expand(hours),
+        "source": "+".join(sorted(sources)) or None,
+        "unique_pairs": len(uniq_o) * len(uniq_d),
+    }
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+
+class FixedStepScheduler:
+    """
+    Fixed-timestep driver for the simulation loop.
+
+    Ticks are scheduled against absolute deadlines (monotonic clock), so the
+    period does not stretch with processing time. When a tick runs late the
+    next call advances the simulation by every step that is due, up to
+    max_catchup_steps; anything beyond that is dropped and counted, so simulated
+    time never spirals behind wall-clock time.
+    """
+
+    def __init__(self, step_sec: float, max_catchup_steps: int = 5):
+        self.step_sec = step_sec
+        self.max_catchup_steps = max_catchup_steps
+        self._running = False
+
+        # Counters
+        self.ticks = 0             # Successful tick calls
+        self.frames = 0            # Fixed steps simulated (>= ticks when catching up)
+        self.overruns = 0          # Ticks whose processing took longer than one step
+        self.late_ticks = 0        # Ticks that started one or more steps late
+        self.frames_caught_up = 0  # Extra steps folded into late ticks
+        self.frames_skipped = 0    # Steps dropped beyond the catch-up bound
+        self.errors = 0            # Ticks that raised
+        self.last_tick_ms = 0.0
+        self.max_tick_ms = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "ticks": self.ticks,
+            "frames": self.frames,
+            "overruns": self.overruns,
+            "late_ticks": self.late_ticks,
+            "frames_caught_up": self.frames_caught_up,
+            "frames_skipped": self.frames_skipped,
+            "errors": self.errors,
+            "last_tick_ms": round(self.last_tick_ms, 2),
+            "max_tick_ms": round(self.max_tick_ms, 2),
+        }
+
+    def stop(self):
+        self._running = False
+
+    async def run(self, tick: Callable[[float], Awaitable[None]]):
+        """
+        Await tick(dt_sec) once per due frame, where dt_sec is the simulated time
+        to advance (a whole number of steps). A failing tick is retried one step
+        later from the same deadline, so the missed time is simulated on the retry.
+        """
+        self._running = True
+        next_at = time.monotonic()
+
+        while self._running:
+            now = time.monotonic()
+            if now < next_at:
+                await asyncio.sleep(next_at - now)
+                continue
+
+            due = int((now - next_at) // self.step_sec) + 1
+            run_steps = min(due, self.max_catchup_steps)
+
+            started = time.perf_counter()
+            try:
+                await tick(run_steps * self.step_sec)
+            except Exception as e:
+                self.errors += 1
+                print(f"CRITICAL SIMULATION ERROR: {e}")
+                await asyncio.sleep(self.step_sec)
+                continue
+
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            self.last_tick_ms = elapsed_ms
+            self.max_tick_ms = max(self.max_tick_ms, elapsed_ms)
+            if elapsed_ms > self.step_sec * 1000.0:
+                self.overruns += 1
+            if due > 1:
+                self.late_ticks += 1
+                self.frames_caught_up += run_steps - 1
+                self.frames_skipped += due - run_steps
+
+            self.ticks += 1
+            self.frames += run_steps
+            next_at += due * self.step_sec
@@ -0,0 +1,186 @@
+import multiprocessing as mp
+import random
+import zlib
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+
+from app.services.fleet import FleetSimulator, ConvoyFormation
+from app.services.geometry import RouteGeometry
+
+
+def shard_of(key, num_shards: int) -> int:
+    """ Stable shard index for a route/asset id (same in every process) """
+    if isinstance(key, int):
+        return key % num_shards
+    return zlib.crc32(str(key).encode()) % num_shards
+
+
+def _shard_main(conn, base_speed_kmh: float, gap_km: float, seed: Optional[int]):
+    """
+    Worker process: owns the physics state of one shard.
+    Commands: ("sync", (civil_route, new_routes, civil_ids, formations)), ("advance", dt_sec), ("stop", None)
+    """
+    fleet = FleetSimulator(base_speed_kmh, gap_km, rng=random.Random(seed))
+    geometries: Dict[int, RouteGeometry] = {}
+
+    while True:
+        cmd, payload = conn.recv()
+        if cmd == "stop":
+            break
+        try:
+            if cmd == "sync":
+                civil_route, new_routes, civil_ids, formations = payload
+                if civil_route is not None:
+                    fleet.set_civil_route(civil_route)
+                geometries.update(new_routes)
+                active = {route_key for route_key, _ in formations}
+                for route_key in [r for r in geometries if r not in active]:
+                    del geometries[route_key]
+                fleet.sync(civil_ids, [(rk, geometries[rk], formation) for rk, formation in formations])
+                conn.send(("ok", None))
+            elif cmd == "advance":
+                conn.send(("ok", fleet.advance(payload)))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+    conn.close()
+
+
+class ShardedFleetSimulator:
+    """
+    Drop-in replacement for FleetSimulator that spreads the fleet over worker processes.
+
+    Convoys are partitioned by route id (so each route's geometry lives in one
+    worker) and civil traffic by asset id. Each worker owns its shard's physics
+    state; this coordinator only ships membership changes and merges the
+    per-shard position frames for the DB writer and streaming consumers.
+    sync and advance block on the worker pipes; async callers run them in a thread.
+    """
+
+    def __init__(self, num_shards: int, base_speed_kmh: float, gap_km: float, seed: Optional[int] = None):
+        self.num_shards = num_shards
+        self.base_speed_kmh = base_speed_kmh
+        self.gap_km = gap_km
+        self.seed = seed
+        self._ctx = mp.get_context("spawn")
+        self._conns: List = [None] * num_shards
+        self._procs: List = [None] * num_shards
+        # Per shard: geometry object last sent for each route key (to ship only changes)
+        self._sent_routes: List[Dict[int, RouteGeometry]] = [{} for _ in range(num_shards)]
+        self._civil_route: Optional[RouteGeometry] = None
+        self._civil_sent = [False] * num_shards
+
+        for shard in range(num_shards):
+            self._start(shard)
+
+    def _start(self, shard: int):
+        parent, child = self._ctx.Pipe()
+        seed = None if self.seed is None else self.seed + shard
+        proc = self._ctx.Process(
+            target=_shard_main, args=(child, self.base_speed_kmh, self.gap_km, seed),
+            name=f"sim-shard-{shard}", daemon=True
+        )
+        proc.start()
+        child.close()
+        self._conns[shard] = parent
+        self._procs[shard] = proc
+        self._sent_routes[shard] = {}
+        self._civil_sent[shard] = False
+
+    def _restart(self, shard: int):
+        # A crashed worker loses its shard's state; start a fresh one (the next sync resends everything)
+        proc = self._procs[shard]
+        print(f"Simulation shard {shard} died (exit code {proc.exitcode}); restarting.")
+        if proc.is_alive():
+            proc.terminate()
+        proc.join(timeout=5)
+        self._conns[shard].close()
+        self._start(shard)
+
+    def _ensure_alive(self):
+        for shard, proc in enumerate(self._procs):
+            if not proc.is_alive():
+                self._restart(shard)
+
+    def _exchange(self, messages: list) -> list:
+        """
+        Send one command per shard and collect every reply. Each live shard's reply is read
+        even when others fail, so no stale reply is left in a pipe; on any failure dead shards
+        are restarted, every shard is marked for a full resync and RuntimeError is raised.
+        """
+        errors, waiting = [], []
+        for shard, message in enumerate(messages):
+            try:
+                self._conns[shard].send(message)
+                waiting.append(shard)
+            except (BrokenPipeError, EOFError, OSError) as e:
+                errors.append((shard, "dead", repr(e)))
+
+        replies = [None] * self.num_shards
+        for shard in waiting:
+            try:
+                status, result = self._conns[shard].recv()
+            except (EOFError, OSError) as e:
+                status, result = "dead", repr(e)
+            if status == "ok":
+                replies[shard] = result
+            else:
+                errors.append((shard, status, result))
+
+        if errors:
+            for shard, status, _ in errors:
+                if status == "dead":
+                    self._restart(shard)
+            # Shard state may be partial; resend routes and membership to every shard next sync
+            self._sent_routes = [{} for _ in range(self.num_shards)]
+            self._civil_sent = [False] * self.num_shards
+            details = "; ".join(f"shard {shard}: {result}" for shard, _, result in sorted(errors))
+            raise RuntimeError(f"Simulation shard failure ({details})")
+        return replies
+
+    def set_civil_route(self, geometry: RouteGeometry):
+        self._civil_route = geometry
+        self._civil_sent = [False] * self.num_shards
+
+    def sync(self, civil_asset_ids: Iterable[int], formations: Iterable[ConvoyFormation]):
+        self._ensure_alive()
+
+        civil_parts = [[] for _ in range(self.num_shards)]
+        for asset_id in civil_asset_ids:
+            civil_parts[shard_of(asset_id, self.num_shards)].append(asset_id)
+
+        formation_parts = [[] for _ in range(self.num_shards)]
+        route_parts: List[Dict[int, RouteGeometry]] = [{} for _ in range(self.num_shards)]
+        for route_key, geometry, formation in formations:
+            shard = shard_of(route_key, self.num_shards)
+            formation_parts[shard].append((route_key, list(formation)))
+            if self._sent_routes[shard].get(route_key) is not geometry:
+                route_parts[shard][route_key] = geometry
+
+        messages = []
+        for shard in range(self.num_shards):
+            civil_route = None if self._civil_sent[shard] else self._civil_route
+            messages.append(("sync", (civil_route, route_parts[shard], civil_parts[shard], formation_parts[shard])))
+
+        self._exchange(messages)
+        for shard in range(self.num_shards):
+            self._civil_sent[shard] = self._civil_route is not None
+            active = {route_key for route_key, _ in formation_parts[shard]}
+            sent = {k: g for k, g in self._sent_routes[shard].items() if k in active}
+            sent.update(route_parts[shard])
+            self._sent_routes[shard] = sent
+
+    def advance(self, dt_sec: float):
+        """ Step every shard in parallel and merge their frames """
+        frames = self._exchange([("advance", dt_sec)] * self.num_shards)
+        return tuple(np.concatenate([f[i] for f in frames]) for i in range(4))
+
+    def close(self):
+        for conn, proc in zip(self._conns, self._procs):
+            try:
+                if proc.is_alive():
+                    conn.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
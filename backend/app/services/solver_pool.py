@@ -0,0 +1,182 @@
+import asyncio
+import multiprocessing as mp
+from typing import Callable, List, Optional, Set
+
+from app.core.config import settings
+
+# Grace period past a solve's own time limit before its worker is considered stuck
+HARD_TIMEOUT_GRACE_SEC = 10.0
+
+
+class SolverBusy(Exception):
+    """ The pool already has its maximum number of solves queued or running """
+
+
+class SolverTimeout(Exception):
+    """ A solve overran its time limit and its worker was killed """
+
+
+class SolverCrashed(Exception):
+    """ A solve's worker process died (e.g. out of memory) """
+
+
+def _worker_main(conn):
+    """ Solver worker process: runs (fn, args) requests one at a time until sent None """
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        fn, args = request
+        try:
+            reply = ("ok", fn(*args))
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply)
+        except Exception as e: # Unpicklable result or exception
+            conn.send(("error", RuntimeError(repr(e))))
+    conn.close()
+
+
+def _wait_reply(conn, timeout: float):
+    """ (status, payload) from a worker, or None if it sent nothing within the timeout """
+    if not conn.poll(timeout):
+        return None
+    return conn.recv()
+
+
+class _Worker:
+    """ One long-lived solver process with its own pipe, so it can be killed on its own """
+
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child,), name="solver-worker", daemon=True)
+        self.proc.start()
+        child.close()
+
+    def kill(self):
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.conn.close()
+
+
+class SolverPool:
+    """
+    Bounded pool of solver processes for CPU-bound solves (OR-Tools holds the GIL while it works).
+
+    At most `workers` solves run at once, each in its own process, so the event loop and
+    other API traffic stay responsive. At most `max_queue` more may wait for a worker;
+    beyond that, run raises SolverBusy instead of letting the backlog grow. Each solve
+    carries its own time limit, counted from when a worker picks it up; a worker that
+    overruns it by HARD_TIMEOUT_GRACE_SEC is killed on its own and replaced, so other
+    solves in flight are unaffected. Workers are started on demand and kept warm.
+
+    workers = 0 runs solves in a thread of the API process (still off the event loop).
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        # spawn: workers must not inherit the API's event loop, DB pool or sockets
+        self._ctx = mp.get_context("spawn")
+        self._idle: List[_Worker] = []
+        self._all: Set[_Worker] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.crashed = 0
+
+    def _discard(self, worker: _Worker):
+        self._all.discard(worker)
+        worker.kill()
+
+    async def _solve(self, fn: Callable, args: tuple, time_limit_sec: float):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            worker = self._idle.pop() if self._idle else None
+            if worker is None or not worker.proc.is_alive():
+                if worker is not None:
+                    self._discard(worker)
+                worker = _Worker(self._ctx)
+                self._all.add(worker)
+
+            reusable = False
+            try:
+                worker.conn.send((fn, args))
+                reply = await asyncio.to_thread(_wait_reply, worker.conn, time_limit_sec + HARD_TIMEOUT_GRACE_SEC)
+                if reply is None:
+                    self.timed_out += 1
+                    raise SolverTimeout(f"Solve did not finish within {time_limit_sec:g} s")
+                reusable = True
+            except (EOFError, OSError):
+                self.crashed += 1
+                raise SolverCrashed("Solver process exited unexpectedly")
+            finally:
+                # A stuck, dead or abandoned (cancelled) solve takes only its own worker with it
+                if reusable:
+                    self._idle.append(worker)
+                else:
+                    self._discard(worker)
+
+        status, payload = reply
+        if status != "ok":
+            raise payload
+        return payload
+
+    async def run(self, fn: Callable, *args, time_limit_sec: float):
+        """ Run fn(*args) in a worker; fn must be a module-level (picklable) function """
+        capacity = max(self.workers, 1) + self.max_queue
+        if self._pending >= capacity:
+            self.rejected += 1
+            raise SolverBusy(f"{self._pending} solves already queued or running")
+
+        self._pending += 1
+        try:
+            if self.workers <= 0:
+                try:
+                    result = await asyncio.wait_for(asyncio.to_thread(fn, *args), time_limit_sec + HARD_TIMEOUT_GRACE_SEC)
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    raise SolverTimeout(f"Solve did not finish within {time_limit_sec:g} s")
+            else:
+                result = await self._solve(fn, args, time_limit_sec)
+            self.completed += 1
+            return result
+        finally:
+            self._pending -= 1
+
+    def shutdown(self):
+        for worker in self._idle:
+            worker.stop()
+        for worker in self._all.difference(self._idle):
+            worker.kill()
+        self._idle, self._all = [], set()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "crashed": self.crashed,
+            "workers_alive": len(self._all),
+        }
+
+
+# Process-wide pool used by the optimization endpoints
+solver_pool = SolverPool(settings.OPTIMIZATION_WORKERS, settings.OPTIMIZATION_MAX_QUEUE)
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select, delete, insert, update, tuple_
+
+from app.core.database import SessionLocal
+from app.models.checkpoint import Checkpoint
+from app.models.checkpoint_travel import CheckpointTravel
+from app.models.route import Route
+from app.services.geometry import haversine_np, unpack_waypoints
+from app.services.road_graph import MAX_EDGE_KM, OFFLINE_SPEED_KMH, offline_router
+
+MATRIX_CHECK_SEC = 30.0 # How often lookups re-check checkpoints and the road graph for changes
+WRITE_CHUNK = 500 # Rows per DELETE/INSERT statement when persisting changed cells
+
+Pair = Tuple[int, int] # (origin_id, destination_id) with origin_id < destination_id
+
+
+def _pair(a: int, b: int) -> Pair:
+    return (a, b) if a < b else (b, a)
+
+
+class CheckpointTravelMatrix:
+    """
+    Road distance/duration between every pair of checkpoints, held in memory as
+    NumPy arrays (O(1) lookup) and persisted in the checkpoint_travel table.
+
+    Cells come from the offline road graph, which also reports which routes each
+    path uses. A refresh recomputes only what changed:
+    - an added or moved checkpoint gets its own row (one Dijkstra);
+    - a route that was blocked, deleted or re-drawn invalidates the cells whose path used it;
+    - a new or re-opened route invalidates the cells it could shorten, i.e. where the
+      straight-line detour through it is shorter than the current distance.
+    """
+
+    def __init__(self):
+        self.ids: List[int] = []
+        self.index: Dict[int, int] = {}
+        self.km = np.empty((0, 0))
+        self.hours = np.empty((0, 0))
+        self.via: Dict[Pair, frozenset] = {}
+        self.updated_at: Optional[datetime] = None
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._route_versions: Optional[Dict[int, int]] = None # Route versions the cells were computed against
+        self._graph = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self.cells_recomputed = 0
+
+    def invalidate(self):
+        """ Re-check checkpoints and the road graph on the next lookup """
+        self._checked_at = 0.0
+
+    # --- Lookups ---
+
+    def lookup(self, origin_id: int, destination_id: int) -> Optional[Tuple[float, float]]:
+        """ (distance_km, duration_hours) or None if either checkpoint is unknown or unroutable """
+        i, j = self.index.get(origin_id), self.index.get(destination_id)
+        if i is None or j is None or np.isnan(self.km[i, j]):
+            return None
+        return float(self.km[i, j]), float(self.hours[i, j])
+
+    async def get(self, origin_id: int, destination_id: int) -> Optional[Tuple[float, float]]:
+        await self.ensure_fresh()
+        return self.lookup(origin_id, destination_id)
+
+    async def ensure_fresh(self):
+        if time.monotonic() - self._checked_at < MATRIX_CHECK_SEC:
+            return
+        async with self._lock:
+            if time.monotonic() - self._checked_at < MATRIX_CHECK_SEC:
+                return
+            try:
+                async with SessionLocal() as db:
+                    await self.refresh(db)
+            except Exception as e:
+                print(f"Checkpoint travel matrix refresh failed: {e}")
+            self._checked_at = time.monotonic()
+
+    # --- Refresh ---
+
+    async def refresh(self, db) -> dict:
+        """ Bring the matrix up to date with the checkpoints table and the road graph """
+        graph = await offline_router.ensure_graph()
+        res = await db.execute(select(Checkpoint.id, Checkpoint.lat, Checkpoint.long).order_by(Checkpoint.id))
+        points = {cp_id: (lat, lon) for cp_id, lat, lon in res.all()}
+        if not self._loaded:
+            await self._load(db, points)
+
+        # 1. Checkpoint membership: removed ones drop out, added/moved ones get a full row
+        dirty_rows = {cp_id for cp_id, point in points.items() if self._points.get(cp_id) != point}
+        removed = [cp_id for cp_id in self._points if cp_id not in points]
+        if list(points) != self.ids:
+            self._reshape(list(points))
+        if graph is None:
+            return {"checkpoints": len(self.ids), "recomputed": 0, "removed": len(removed)}
+
+        # 2. Route changes since the cells were computed
+        dirty_pairs: Set[Pair] = set()
+        graph_changed = graph is not self._graph
+        if graph_changed and self._route_versions is not None:
+            old, new = self._route_versions, offline_router.route_versions
+            worse = {r for r, v in old.items() if new.get(r) != v}
+            better = {r for r, v in new.items() if old.get(r) != v}
+            if worse:
+                dirty_pairs |= {pair for pair, routes in self.via.items() if routes & worse}
+            if better:
+                dirty_pairs |= await self._shortcut_pairs(db, points, better)
+        elif graph_changed:
+            dirty_rows = set(points) # Unknown provenance: recompute everything once
+
+        # 3. Recompute, persist
+        changed = await self._recompute(graph, points, dirty_rows, dirty_pairs)
+        if changed or removed or graph_changed:
+            await self._persist(db, points, changed, removed, graph_changed)
+        self._points = points
+        self._graph = graph
+        self._route_versions = dict(offline_router.route_versions)
+        if changed:
+            self.updated_at = datetime.utcnow()
+            print(f"Checkpoint travel matrix: recomputed {len(changed)} of "
+                  f"{len(self.ids) * (len(self.ids) - 1) // 2} cells")
+        return {"checkpoints": len(self.ids), "recomputed": len(changed), "removed": len(removed)}
+
+    def _reshape(self, ids: List[int]):
+        """ Resize the arrays to a new checkpoint set, keeping the cells of surviving checkpoints """
+        new_index = {cp_id: k for k, cp_id in enumerate(ids)}
+        km = np.full((len(ids), len(ids)), np.nan)
+        hours = np.full_like(km, np.nan)
+        np.fill_diagonal(km, 0.0)
+        np.fill_diagonal(hours, 0.0)
+        keep = [cp_id for cp_id in ids if cp_id in self.index]
+        if keep:
+            old_pos = [self.index[cp_id] for cp_id in keep]
+            new_pos = [new_index[cp_id] for cp_id in keep]
+            km[np.ix_(new_pos, new_pos)] = self.km[np.ix_(old_pos, old_pos)]
+            hours[np.ix_(new_pos, new_pos)] = self.hours[np.ix_(old_pos, old_pos)]
+        self.via = {pair: routes for pair, routes in self.via.items() if pair[0] in new_index and pair[1] in new_index}
+        self.ids, self.index, self.km, self.hours = ids, new_index, km, hours
+
+    async def _shortcut_pairs(self, db, points, route_ids: Set[int]) -> Set[Pair]:
+        """ Pairs whose current distance a newly usable route could beat (straight-line lower bound) """
+        if len(self.ids) < 2:
+            return set()
+        res = await db.execute(select(Route.waypoints_packed).where(Route.id.in_(route_ids)))
+        lats = np.array([points[cp_id][0] for cp_id in self.ids])
+        lons = np.array([points[cp_id][1] for cp_id in self.ids])
+        candidates = np.zeros_like(self.km, dtype=bool)
+        for packed in res.scalars().all():
+            pts = unpack_waypoints(packed)
+            if len(pts) < 2:
+                continue
+            # Distance from each checkpoint to the route (vertices are at most MAX_EDGE_KM apart)
+            to_route = haversine_np(lats[:, None], lons[:, None], pts[None, :, 0], pts[None, :, 1]).min(axis=1)
+            bound = to_route[:, None] + to_route[None, :] - MAX_EDGE_KM
+            candidates |= np.isnan(self.km) | (bound < self.km)
+        rows, cols = np.nonzero(np.triu(candidates, k=1))
+        return {(self.ids[i], self.ids[j]) for i, j in zip(rows, cols)}
+
+    async def _recompute(self, graph, points, dirty_rows: Set[int], dirty_pairs: Set[Pair]) -> Set[Pair]:
+        """ Re-route the dirty rows and pairs (one Dijkstra per origin). Returns the pairs written """
+        if graph is None or len(self.ids) < 2 or not (dirty_rows or dirty_pairs):
+            return set()
+        # Group pairs by origin; a dirty row covers every pair it touches
+        jobs: Dict[int, Set[int]] = {cp_id: set(self.ids) - {cp_id} for cp_id in dirty_rows}
+        for a, b in dirty_pairs:
+            if a in dirty_rows or b in dirty_rows:
+                continue
+            jobs.setdefault(a, set()).add(b)
+
+        def run():
+            results = []
+            for origin, targets in jobs.items():
+                targets = sorted(targets)
+                km, via = graph.travel_rows([points[origin]], [points[t] for t in targets])
+                results.append((origin, targets, km[0], via[0]))
+            return results
+
+        changed: Set[Pair] = set()
+        for origin, targets, km_row, via_row in await asyncio.to_thread(run):
+            i = self.index[origin]
+            for target, km, routes in zip(targets, km_row, via_row):
+                j = self.index[target]
+                self.km[i, j] = self.km[j, i] = km
+                self.hours[i, j] = self.hours[j, i] = km / OFFLINE_SPEED_KMH
+                pair = _pair(origin, target)
+                self.via[pair] = frozenset(r for r in (routes or ()) if r is not None)
+                changed.add(pair)
+        self.cells_recomputed += len(changed)
+        return changed
+
+    # --- Persistence ---
+
+    async def _load(self, db, points: Dict[int, Tuple[float, float]]):
+        """ Adopt persisted cells computed for the current road graph and checkpoint positions """
+        self._loaded = True
+        self._reshape(list(points))
+        signature = self._graph_signature()
+        res = await db.execute(select(CheckpointTravel).where(CheckpointTravel.graph_signature == signature))
+        adopted: Dict[int, int] = {}
+        for row in res.scalars().all():
+            a, b = row.origin_id, row.destination_id
+            if points.get(a) != (row.origin_lat, row.origin_long) or points.get(b) != (row.destination_lat, row.destination_long):
+                continue
+            i, j = self.index[a], self.index[b]
+            self.km[i, j] = self.km[j, i] = np.nan if row.distance_km is None else row.distance_km
+            self.hours[i, j] = self.hours[j, i] = np.nan if row.duration_hours is None else row.duration_hours
+            self.via[(a, b)] = frozenset(json.loads(row.via_route_ids or "[]"))
+            self.updated_at = max(filter(None, (self.updated_at, row.updated_at)), default=None)
+            adopted[a] = adopted.get(a, 0) + 1
+            adopted[b] = adopted.get(b, 0) + 1
+        # Checkpoints with every cell adopted are current; the rest are recomputed on this refresh
+        complete = {cp_id for cp_id, count in adopted.items() if count == len(points) - 1}
+        self._points = {cp_id: points[cp_id] for cp_id in complete}
+        if complete:
+            self._graph = offline_router.graph
+            self._route_versions = dict(offline_router.route_versions)
+        print(f"Checkpoint travel matrix: loaded {sum(adopted.values()) // 2} stored cells")
+
+    @staticmethod
+    def _graph_signature() -> Optional[str]:
+        signature = offline_router.signature
+        return json.dumps([int(v or 0) for v in signature]) if signature is not None else None
+
+    async def _persist(self, db, points, changed: Set[Pair], removed: List[int], graph_changed: bool):
+        signature = self._graph_signature()
+        pairs = sorted(changed)
+        for k in range(0, len(pairs), WRITE_CHUNK):
+            chunk = pairs[k:k + WRITE_CHUNK]
+            await db.execute(delete(CheckpointTravel).where(
+                tuple_(CheckpointTravel.origin_id, CheckpointTravel.destination_id).in_(chunk)
+            ))
+            now = datetime.utcnow()
+            rows = []
+            for a, b in chunk:
+                i, j = self.index[a], self.index[b]
+                rows.append({
+                    "origin_id": a, "destination_id": b,
+                    "distance_km": None if np.isnan(self.km[i, j]) else round(float(self.km[i, j]), 3),
+                    "duration_hours": None if np.isnan(self.hours[i, j]) else round(float(self.hours[i, j]), 3),
+                    "via_route_ids": json.dumps(sorted(self.via.get((a, b), ()))),
+                    "origin_lat": points[a][0], "origin_long": points[a][1],
+                    "destination_lat": points[b][0], "destination_long": points[b][1],
+                    "graph_signature": signature,
+                    "updated_at": now,
+                })
+            await db.execute(insert(CheckpointTravel), rows)
+        if removed:
+            await db.execute(delete(CheckpointTravel).where(
+                CheckpointTravel.origin_id.in_(removed) | CheckpointTravel.destination_id.in_(removed)
+            ))
+        if graph_changed:
+            # Cells that were not recomputed are still valid for the new graph
+            await db.execute(update(CheckpointTravel).values(graph_signature=signature))
+        await db.commit()
+
+    def as_dict(self) -> dict:
+        def cells(values: np.ndarray) -> list:
+            return [[None if np.isnan(v) else round(float(v), 2) for v in row] for row in values]
+
+        return {
+            "checkpoint_ids": list(self.ids),
+            "distance_km": cells(self.km),
+            "duration_hours": cells(self.hours),
+            "updated_at": self.updated_at,
+        }
+
+    def stats(self) -> dict:
+        upper = np.triu_indices(len(self.ids), k=1)
+        return {
+            "checkpoints": len(self.ids),
+            "routable_pairs": int((~np.isnan(self.km[upper])).sum()),
+            "cells_recomputed": self.cells_recomputed,
+        }
+
+
+# Process-wide matrix used by the checkpoints API and planners
+checkpoint_travel_matrix = CheckpointTravelMatrix()
@@ -2,7 +2,12 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import engine, Base
-from app.api.endpoints import assets, convoys, routes, optimization, checkpoints
+import asyncio
+from app.api.endpoints import assets, convoys, routes, optimization, checkpoints, stream
+from app.services.broadcast import position_broadcaster, relay_redis_frames
+from app.services.http_client import http_client
+from app.services.solver_pool import solver_pool
+from app.services.optimization_jobs import optimization_jobs
 import app.models.asset 
 import app.models.convoy # Register Convoy model
 import app.models.route # Register Route model
@@ -30,12 +35,34 @@ async def startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+    # Feed the live position stream: run the simulation here, or relay the standalone one via Redis
+    if settings.SIMULATION_IN_API:
+        from app.services.simulation import simulate
+        app.state.stream_task = asyncio.create_task(simulate(in_api=True))
+    elif settings.REDIS_URL:
+        app.state.stream_task = asyncio.create_task(relay_redis_frames(settings.REDIS_URL, position_broadcaster))
+
+    # Optimization jobs: with the in-process queue this API process is also the worker
+    if settings.OPTIMIZATION_JOB_BACKEND != "redis":
+        await optimization_jobs.recover()
+        app.state.job_worker = asyncio.create_task(optimization_jobs.run_worker())
+
+@app.on_event("shutdown")
+async def shutdown():
+    for name in ("stream_task", "job_worker"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    await http_client.close()
+    solver_pool.shutdown()
+
 # Register Routers
 app.include_router(assets.router, prefix=f"{settings.API_V1_STR}/assets", tags=["assets"])
 app.include_router(convoys.router, prefix=f"{settings.API_V1_STR}/convoys", tags=["convoys"])
 app.include_router(routes.router, prefix=f"{settings.API_V1_STR}/routes", tags=["routes"])
 app.include_router(optimization.router, prefix=f"{settings.API_V1_STR}/optimization", tags=["optimization"])
 app.include_router(checkpoints.router, prefix=f"{settings.API_V1_STR}/checkpoints", tags=["checkpoints"])
+app.include_router(stream.router, prefix=f"{settings.API_V1_STR}/positions", tags=["positions"])
 from app.api.endpoints import logistics, auth
 app.include_router(logistics.router, prefix=f"{settings.API_V1_STR}/logistics", tags=["logistics"])
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
@@ -0,0 +1,25 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_root)
+
+from app.core.database import SessionLocal
+
+async def migrate_db():
+    print("Adding membership version column to convoys...")
+    async with SessionLocal() as db:
+        try:
+            await db.execute(text("ALTER TABLE convoys ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;"))
+            await db.commit()
+            print("Migration Successful!")
+        except Exception as e:
+            print(f"Migration Failed: {e}")
+            await db.rollback()
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(migrate_db())
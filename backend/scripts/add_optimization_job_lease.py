@@ -0,0 +1,27 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_root)
+
+from app.core.database import SessionLocal
+
+async def migrate_db():
+    print("Adding lease columns to optimization_jobs...")
+    async with SessionLocal() as db:
+        try:
+            await db.execute(text("ALTER TABLE optimization_jobs ADD COLUMN IF NOT EXISTS lease_owner VARCHAR;"))
+            await db.execute(text("ALTER TABLE optimization_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITHOUT TIME ZONE;"))
+            await db.execute(text("ALTER TABLE optimization_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;"))
+            await db.commit()
+            print("Migration Successful!")
+        except Exception as e:
+            print(f"Migration Failed: {e}")
+            await db.rollback()
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(migrate_db())
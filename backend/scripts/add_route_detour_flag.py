@@ -0,0 +1,26 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_root)
+
+from app.core.database import SessionLocal
+
+async def migrate_db():
+    print("Adding detour columns to routes...")
+    async with SessionLocal() as db:
+        try:
+            await db.execute(text("ALTER TABLE routes ADD COLUMN IF NOT EXISTS is_detour BOOLEAN NOT NULL DEFAULT FALSE;"))
+            await db.execute(text("ALTER TABLE routes ADD COLUMN IF NOT EXISTS detour_via JSON;"))
+            await db.commit()
+            print("Migration Successful!")
+        except Exception as e:
+            print(f"Migration Failed: {e}")
+            await db.rollback()
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(migrate_db())
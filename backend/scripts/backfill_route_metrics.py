@@ -0,0 +1,39 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text, select
+
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_root)
+
+from app.core.database import SessionLocal
+from app.models.route import Route, compute_route_metrics
+
+async def migrate_db():
+    print("Adding stored route metrics and chainage profiles...")
+    async with SessionLocal() as db:
+        try:
+            await db.execute(text("ALTER TABLE routes ADD COLUMN IF NOT EXISTS distance_km DOUBLE PRECISION;"))
+            await db.execute(text("ALTER TABLE routes ADD COLUMN IF NOT EXISTS duration_hours DOUBLE PRECISION;"))
+            await db.execute(text("ALTER TABLE routes ADD COLUMN IF NOT EXISTS metrics_source VARCHAR;"))
+            await db.execute(text("ALTER TABLE routes ADD COLUMN IF NOT EXISTS chainage_packed BYTEA;"))
+
+            # Backfill from the stored waypoints (distance from geometry, duration at the default speed)
+            res = await db.execute(
+                select(Route).where(Route.chainage_packed.is_(None), Route.waypoints_packed.is_not(None))
+            )
+            routes = res.scalars().all()
+            for route in routes:
+                compute_route_metrics(route)
+            print(f"Measured {len(routes)} routes.")
+
+            await db.commit()
+            print("Migration Successful!")
+        except Exception as e:
+            print(f"Migration Failed: {e}")
+            await db.rollback()
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(migrate_db())
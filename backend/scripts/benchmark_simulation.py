@@ -0,0 +1,157 @@
+"""
+Headless, faster-than-real-time benchmark of the simulation hot loop.
+
+No database, no network and no sleeps: synthetic routes and fleets are built
+from a seeded RNG and the same FleetSimulator/PositionWriter code used by
+simulate() is stepped as fast as possible.
+
+Usage: python scripts/benchmark_simulation.py [--assets 100 1000 10000 100000] [--ticks 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Add the backend root directory to sys.path
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_root)
+
+from app.services.fleet import FleetSimulator
+from app.services.geometry import RouteGeometry
+from app.services.position_writer import PositionWriter
+from app.services.simulation import BASE_SPEED_KMH, GAP_KM, UPDATE_INTERVAL_SEC
+
+PHASES = ("sync", "civil", "leader", "followers", "persistence")
+
+
+def synthetic_route(rng: np.random.Generator, num_points: int) -> RouteGeometry:
+    """ Random-walk polyline around J&K with ~20-80 m steps, like an OSRM overview=full path """
+    start = np.array([rng.uniform(32.5, 34.5), rng.uniform(74.0, 77.5)])
+    heading = rng.uniform(0, 2 * np.pi)
+    headings = heading + np.cumsum(rng.normal(0.0, 0.15, num_points))
+    steps_deg = rng.uniform(0.0002, 0.0008, num_points)
+    deltas = np.stack((np.cos(headings) * steps_deg, np.sin(headings) * steps_deg), axis=1)
+    return RouteGeometry(start + np.cumsum(deltas, axis=0))
+
+
+def build_scenario(num_assets: int, seed: int, num_routes: int, route_points: int,
+                   civil_share: float, convoy_size: int):
+    """ Returns (civil route, civil asset ids, convoy formations) """
+    rng = np.random.default_rng(seed)
+    civil_route = synthetic_route(rng, route_points)
+    routes = [synthetic_route(rng, route_points) for _ in range(num_routes)]
+
+    num_civil = int(num_assets * civil_share)
+    civil_ids = list(range(1, num_civil + 1))
+
+    formations = []
+    next_id = num_civil + 1
+    remaining = num_assets - num_civil
+    route_key = 0
+    while remaining > 0:
+        size = min(convoy_size, remaining)
+        route_id = route_key % num_routes
+        formations.append((route_id, routes[route_id], list(range(next_id, next_id + size))))
+        next_id += size
+        remaining -= size
+        route_key += 1
+    return civil_route, civil_ids, formations
+
+
+def run_ticks(civil_fleet, convoy_fleet, writer, num_ticks, timings=None):
+    for _ in range(num_ticks):
+        t0 = time.perf_counter()
+        c_ids, c_lat, c_long, c_brg = civil_fleet.advance(UPDATE_INTERVAL_SEC)
+        t1 = time.perf_counter()
+        l_ids, l_lat, l_long, l_brg = convoy_fleet.advance_leaders(UPDATE_INTERVAL_SEC)
+        t2 = time.perf_counter()
+        f_ids, f_lat, f_long, f_brg = convoy_fleet.place_followers()
+        t3 = time.perf_counter()
+        # Persistence: the in-memory half of the bulk write path (change detection + frame merge)
+        changed, frame = writer.changed_rows(
+            np.concatenate((c_ids, l_ids, f_ids)),
+            np.concatenate((c_lat, l_lat, f_lat)),
+            np.concatenate((c_long, l_long, f_long)),
+            np.concatenate((c_brg, l_brg, f_brg)),
+        )
+        writer.remember(frame)
+        t4 = time.perf_counter()
+
+        if timings is not None:
+            timings["civil"] += t1 - t0
+            timings["leader"] += t2 - t1
+            timings["followers"] += t3 - t2
+            timings["persistence"] += t4 - t3
+
+
+def benchmark(num_assets: int, args) -> dict:
+    civil_route, civil_ids, formations = build_scenario(
+        num_assets, args.seed, args.routes, args.route_points, args.civil_share, args.convoy_size
+    )
+    timings = {phase: 0.0 for phase in PHASES}
+
+    def setup():
+        # Civil traffic and convoys run in separate fleets so their phases can be timed apart
+        civil_fleet = FleetSimulator(BASE_SPEED_KMH, GAP_KM, rng=random.Random(args.seed))
+        civil_fleet.set_civil_route(civil_route)
+        convoy_fleet = FleetSimulator(BASE_SPEED_KMH, GAP_KM, rng=random.Random(args.seed))
+        t0 = time.perf_counter()
+        civil_fleet.sync(civil_ids, [])
+        convoy_fleet.sync([], formations)
+        return civil_fleet, convoy_fleet, time.perf_counter() - t0
+
+    # 1. Timed run
+    civil_fleet, convoy_fleet, timings["sync"] = setup()
+    writer = PositionWriter()
+    run_ticks(civil_fleet, convoy_fleet, writer, args.warmup)
+    started = time.perf_counter()
+    run_ticks(civil_fleet, convoy_fleet, writer, args.ticks, timings)
+    elapsed = time.perf_counter() - started
+
+    # 2. Short traced run for peak memory (tracemalloc slows allocation, so it is kept separate)
+    tracemalloc.start()
+    civil_fleet, convoy_fleet, _ = setup()
+    run_ticks(civil_fleet, convoy_fleet, PositionWriter(), args.memory_ticks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "assets": num_assets,
+        "ticks_per_sec": args.ticks / elapsed if elapsed > 0 else float("inf"),
+        "sync_ms": timings["sync"] * 1000.0,
+        **{f"{phase}_ms": timings[phase] * 1000.0 / args.ticks for phase in PHASES[1:]},
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless simulation benchmark (no DB, no sleeps)")
+    parser.add_argument("--assets", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--memory-ticks", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--routes", type=int, default=20)
+    parser.add_argument("--route-points", type=int, default=5000)
+    parser.add_argument("--civil-share", type=float, default=0.3)
+    parser.add_argument("--convoy-size", type=int, default=12)
+    args = parser.parse_args()
+
+    print(f"Headless simulation benchmark: seed={args.seed}, {args.routes} routes x {args.route_points} pts, "
+          f"{args.ticks} ticks of {UPDATE_INTERVAL_SEC}s")
+    header = f"{'assets':>8} {'ticks/s':>10} {'sync ms':>9} {'civil':>8} {'leader':>8} {'follow':>8} {'persist':>8} {'peak MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for num_assets in args.assets:
+        r = benchmark(num_assets, args)
+        print(f"{r['assets']:>8} {r['ticks_per_sec']:>10.1f} {r['sync_ms']:>9.1f} {r['civil_ms']:>8.3f} "
+              f"{r['leader_ms']:>8.3f} {r['followers_ms']:>8.3f} {r['persistence_ms']:>8.3f} {r['peak_mb']:>8.1f}")
+    print("Phase columns are mean ms per tick.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine, Base
+from app.models.optimization_job import OptimizationJob
+
+async def init_db():
+    async with engine.begin() as conn:
+        print("Creating table for OptimizationJob...")
+        await conn.run_sync(Base.metadata.create_all)
+        print("Done.")
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(init_db())
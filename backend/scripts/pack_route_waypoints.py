@@ -0,0 +1,49 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text, bindparam, Integer, JSON, LargeBinary
+
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_root)
+
+from app.core.database import SessionLocal
+from app.services.geometry import pack_waypoints
+
+async def migrate_db(drop_json: bool = False):
+    print("Packing route waypoints into binary storage...")
+    async with SessionLocal() as db:
+        try:
+            await db.execute(text("ALTER TABLE routes ADD COLUMN IF NOT EXISTS waypoints_packed BYTEA;"))
+
+            # Backfill from the legacy JSON column (if it still exists)
+            has_json = (await db.execute(text(
+                "SELECT 1 FROM information_schema.columns WHERE table_name = 'routes' AND column_name = 'waypoints'"
+            ))).first() is not None
+            if has_json:
+                rows = (await db.execute(
+                    text("SELECT id, waypoints FROM routes WHERE waypoints_packed IS NULL AND waypoints IS NOT NULL")
+                    .columns(id=Integer, waypoints=JSON)
+                )).all()
+                updates = [{"b_id": route_id, "b_packed": pack_waypoints(waypoints)} for route_id, waypoints in rows]
+                if updates:
+                    await db.execute(
+                        text("UPDATE routes SET waypoints_packed = :b_packed WHERE id = :b_id")
+                        .bindparams(bindparam("b_packed", type_=LargeBinary)),
+                        updates
+                    )
+                print(f"Packed {len(updates)} routes.")
+
+                if drop_json:
+                    await db.execute(text("ALTER TABLE routes DROP COLUMN waypoints;"))
+                    print("Dropped legacy JSON waypoints column.")
+
+            await db.commit()
+            print("Migration Successful!")
+        except Exception as e:
+            print(f"Migration Failed: {e}")
+            await db.rollback()
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(migrate_db(drop_json="--drop-json" in sys.argv))
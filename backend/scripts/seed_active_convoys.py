@@ -10,7 +10,7 @@ backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, backend_root)
 
 from app.core.database import SessionLocal
-from app.services.routing import fetch_osrm_route
+from app.services.routing import get_route_metrics_with_path
 from app.models.route import Route
 from app.models.convoy import Convoy
 from app.models.asset import TransportAsset
@@ -25,13 +25,14 @@ async def seed_convoys():
         end_coords = [34.1526, 77.5770]   # Leh
         
         print(f"Fetching OSRM Route: Srinagar -> Leh...")
-        waypoints = await fetch_osrm_route(start_coords, end_coords)
+        metrics = await get_route_metrics_with_path(start_coords, end_coords)
         
-        if not waypoints:
+        if not metrics:
             print("Failed to fetch route from OSRM. Aborting.")
             return
 
-        print(f"Route fetched! {len(waypoints)} waypoints.")
+        waypoints = metrics["waypoints"]
+        print(f"Route fetched! {len(waypoints)} waypoints, {metrics['distance_km']} km.")
         
         # 1. Create or Get the Route
         route_name = "NH-1D: Srinagar-Leh Highway"
@@ -43,10 +44,10 @@ async def seed_convoys():
         if not route:
             route = Route(
                 name=route_name,
-                waypoints=waypoints,
                 risk_level="HIGH",
                 status="OPEN"
             )
+            route.apply_planned_metrics(metrics)
             db.add(route)
             await db.commit()
             await db.refresh(route)
@@ -1,7 +1,6 @@
 import asyncio
 import sys
 import os
-import httpx
 # import polyline # Not needed for GeoJSON
 
 # Add the parent directory to sys.path to make 'app' module importable
@@ -13,42 +12,10 @@ from app.models.convoy import Convoy
 from app.models.route import Route
 from app.models.user import User
 from app.core.security import get_password_hash
+from app.services.routing import get_route_metrics_with_path # Cached: re-seeding reuses stored routes
 from datetime import datetime
 from sqlalchemy import text
 
-async def fetch_osrm_route(start_coords, end_coords):
-    """
-    Fetch exact driving route from OSRM (Open Source Routing Machine).
-    Coords format: [lat, lon]
-    OSRM expects: lon,lat
-    """
-    # OSRM Public Demo Server (Free)
-    base_url = "http://router.project-osrm.org/route/v1/driving/"
-    
-    # Format: {lon},{lat};{lon},{lat}
-    coords_str = f"{start_coords[1]},{start_coords[0]};{end_coords[1]},{end_coords[0]}"
-    url = f"{base_url}{coords_str}?overview=full&geometries=geojson"
-    
-    print(f"Fetching route data from OSRM: {url}")
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(url, timeout=30.0)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            if "routes" in data and len(data["routes"]) > 0:
-                # OSRM returns [lon, lat], we need [lat, lon]
-                geometry = data["routes"][0]["geometry"]["coordinates"]
-                flipped_geom = [[p[1], p[0]] for p in geometry]
-                return flipped_geom
-            else:
-                print("No route found by OSRM.")
-                return None
-        except Exception as e:
-            print(f"Error fetching OSRM route: {e}")
-            return None
-
 async def seed_data():
     print("Resetting Database...")
     async with engine.begin() as conn:
@@ -74,7 +41,8 @@ async def seed_data():
         end_pt = [33.9872, 74.7736]
 
         print("Requesting satellite-accurate path from Router Network...")
-        waypoints_high_fidelity = await fetch_osrm_route(start_pt, end_pt)
+        metrics_main = await get_route_metrics_with_path(start_pt, end_pt)
+        waypoints_high_fidelity = metrics_main["waypoints"] if metrics_main else None
 
         if not waypoints_high_fidelity:
             print("FALLBACK: Using manual high-res waypoints due to API failure.")
@@ -93,6 +61,8 @@ async def seed_data():
             status="OPEN (LIVE TRACKING)",
             waypoints=waypoints_high_fidelity
         )
+        if metrics_main:
+            route_main.apply_planned_metrics(metrics_main) # Keep the router's distance/duration
 
         db.add(route_main)
         print("Added Precision Route: IXJ-SXR.")
@@ -102,7 +72,8 @@ async def seed_data():
         start_ptk = [32.2643, 75.6527]
         end_udh = [32.9265, 75.1360]
         print("Fetching Route: Pathankot -> Udhampur...")
-        wp_ptk_udh = await fetch_osrm_route(start_ptk, end_udh)
+        metrics_ptk = await get_route_metrics_with_path(start_ptk, end_udh)
+        wp_ptk_udh = metrics_ptk["waypoints"] if metrics_ptk else None
         
         # Fallback if OSRM fails
         if not wp_ptk_udh:
@@ -114,6 +85,8 @@ async def seed_data():
             status="OPEN",
             waypoints=wp_ptk_udh
         )
+        if metrics_ptk:
+            route_ptk.apply_planned_metrics(metrics_ptk)
         db.add(route_ptk)
         print("Added Route: Pathankot-Udhampur.")
         await db.flush()
@@ -122,7 +95,8 @@ async def seed_data():
         start_leh = [34.1500, 77.5667]
         end_kargil = [34.5500, 76.1333]
         print("Fetching Route: Leh -> Kargil...")
-        wp_leh_kgl = await fetch_osrm_route(start_leh, end_kargil)
+        metrics_leh = await get_route_metrics_with_path(start_leh, end_kargil)
+        wp_leh_kgl = metrics_leh["waypoints"] if metrics_leh else None
         
         if not wp_leh_kgl:
             wp_leh_kgl = [start_leh, [34.3, 76.8], end_kargil]
@@ -133,6 +107,8 @@ async def seed_data():
             status="CAUTION (SNOW)",
             waypoints=wp_leh_kgl
         )
+        if metrics_leh:
+            route_leh.apply_planned_metrics(metrics_leh)
         db.add(route_leh)
         print("Added Route: Leh-Kargil.")
         await db.flush()
@@ -0,0 +1,51 @@
+import random
+
+import numpy as np
+
+from app.services.fleet import FleetSimulator
+from app.services.geometry import RouteGeometry
+
+
+def _line(lat0: float, points: int = 20):
+    return [[lat0 + k * 0.01, 74.0 + k * 0.005] for k in range(points)]
+
+
+def _fleet() -> FleetSimulator:
+    fleet = FleetSimulator(base_speed_kmh=60.0, gap_km=0.1, rng=random.Random(1))
+    fleet.set_civil_route(RouteGeometry(_line(30.0)))
+    return fleet
+
+
+def test_sync_drops_routes_no_formation_drives():
+    fleet = _fleet()
+    geometries = {route_id: RouteGeometry(_line(31.0 + route_id)) for route_id in range(1, 6)}
+    fleet.sync([100, 101], [(r, g, [r * 10, r * 10 + 1]) for r, g in geometries.items()])
+    fleet.advance(60.0)
+    assert len(fleet.kinematics._route_geometries) == 6
+
+    # Convoys on routes 1, 2 and 4 completed; route 3 was re-versioned
+    geometries[3] = RouteGeometry(_line(40.0))
+    fleet.sync([100, 101], [(r, geometries[r], [r * 10, r * 10 + 1]) for r in (3, 5)])
+    kinematics = fleet.kinematics
+    assert set(kinematics._route_slots) == {"civil", 3, 5}
+    assert len(kinematics._route_geometries) == 3
+    assert kinematics.route_geometry(3) is geometries[3]
+    assert not kinematics.has_asset(10) and not kinematics.has_asset(40)
+
+    ids, lats, longs, _ = fleet.advance(60.0)
+    assert sorted(ids.tolist()) == [30, 31, 50, 51, 100, 101]
+    # Every remaining asset is still placed on its own route after the slots were compacted
+    positions = dict(zip(ids.tolist(), lats.tolist()))
+    assert 40.0 <= positions[30] <= 40.2
+    assert 36.0 <= positions[50] <= 36.2
+    assert 30.0 <= positions[100] <= 30.2
+
+
+def test_sync_keeps_the_axis_when_nothing_changed():
+    fleet = _fleet()
+    geometry = RouteGeometry(_line(31.0))
+    fleet.sync([100], [(1, geometry, [10])])
+    axis = fleet.kinematics._pt_axis_km
+    fleet.sync([100], [(1, geometry, [10])])
+    assert fleet.kinematics._pt_axis_km is axis
+    assert np.isfinite(fleet.advance(1.0)[1]).all()
@@ -0,0 +1,136 @@
+import random
+from collections import Counter
+
+import pytest
+
+from app.services.optimization import DEFAULT_VOLUME_CAPACITY, pack_heuristic, solve_load_plan, vehicle_lower_bound
+from app.services.plan_cache import CanonicalInstance, LoadPlanCache
+
+
+def _instance(rng: random.Random, items: int = 8, vehicles: int = 6, sizes: int = 4):
+    """ Random instance where every item fits any vehicle on its own (so it is always feasible) """
+    size_pool = [(rng.randint(1, 8), rng.randint(0, 6)) for _ in range(sizes)]
+    cargo = [{"id": f"c{i}", "weight": w, "volume": v} for i, (w, v) in enumerate(rng.choice(size_pool) for _ in range(items))]
+    fleet = [{"id": f"v{j}", "capacity_weight": rng.choice((10, 12, 16)), "capacity_volume": rng.choice((8, 10))}
+             for j in range(max(vehicles, items))]
+    return cargo, fleet
+
+
+def _relabelled(rng: random.Random, cargo, fleet, duplicate_ids: bool = False):
+    """ The same instance with new ids, shuffled; optionally every cargo item shares one id """
+    cargo = [dict(c, id="crate" if duplicate_ids else f"item-{rng.random():.6f}") for c in cargo]
+    fleet = [dict(v, id=f"truck-{k}") for k, v in enumerate(fleet)]
+    rng.shuffle(cargo)
+    rng.shuffle(fleet)
+    return cargo, fleet
+
+
+def _check_plan(result, cargo, fleet):
+    """ Every item loaded exactly once, within the capacity of the vehicle it is on """
+    assert len(result["assignments"]) == result["total_vehicles_used"]
+    loaded = Counter()
+    by_id = {v["id"]: v for v in fleet}
+    for vehicle_id, items in result["assignments"].items():
+        vehicle = by_id[vehicle_id]
+        assert sum(c["weight"] for c in items) <= vehicle["capacity_weight"] + 1e-9
+        assert sum(c.get("volume", 0) for c in items) <= vehicle.get("capacity_volume", DEFAULT_VOLUME_CAPACITY) + 1e-9
+        loaded.update((c["id"], c["weight"], c["volume"]) for c in items)
+    assert loaded == Counter((c["id"], c["weight"], c["volume"]) for c in cargo)
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("duplicate_ids", [False, True])
+def test_cache_hit_after_relabelling(seed, duplicate_ids):
+    rng = random.Random(seed)
+    cargo, fleet = _instance(rng, items=rng.randint(4, 9), sizes=rng.randint(1, 3)) # Few sizes: many equal items
+    result = solve_load_plan(cargo, fleet, mode="heuristic")
+    cache = LoadPlanCache()
+    instance, cached = cache.get(cargo, fleet, "heuristic", "bfd", None)
+    assert cached is None
+    cache.put(instance, result, cargo, fleet, "heuristic", "bfd", None)
+
+    other_cargo, other_fleet = _relabelled(rng, cargo, fleet, duplicate_ids)
+    other, cached = cache.get(other_cargo, other_fleet, "heuristic", "bfd", None)
+    assert other.key == instance.key
+    assert cached is not None and cached["cached"]
+    assert cached["total_vehicles_used"] == result["total_vehicles_used"]
+    assert cached["status"] == result["status"]
+    _check_plan(cached, other_cargo, other_fleet)
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_misses_when_a_size_changes():
+    rng = random.Random(3)
+    cargo, fleet = _instance(rng)
+    cache = LoadPlanCache()
+    instance, _ = cache.get(cargo, fleet, "mip", "bfd", None)
+    cache.put(instance, solve_load_plan(cargo, fleet, mode="mip"), cargo, fleet, "mip", "bfd", None)
+
+    heavier = [dict(c) for c in cargo]
+    heavier[0]["weight"] += 1
+    assert cache.get(heavier, fleet, "mip", "bfd", None)[1] is None
+    smaller_fleet = [dict(v) for v in fleet]
+    smaller_fleet[0]["capacity_volume"] -= 1
+    assert cache.get(cargo, smaller_fleet, "mip", "bfd", None)[1] is None
+    assert CanonicalInstance(cargo, fleet[:-1]).key != instance.key
+
+
+def test_feasible_plans_only_answer_searches_no_harder():
+    cargo, fleet = _instance(random.Random(5))
+    cache = LoadPlanCache()
+    instance = CanonicalInstance(cargo, fleet)
+    feasible = dict(solve_load_plan(cargo, fleet, mode="heuristic"), status="FEASIBLE")
+    cache.put(instance, feasible, cargo, fleet, "anytime", "bfd", 2.0)
+
+    assert cache.get(cargo, fleet, "anytime", "bfd", 1.0)[1] is not None
+    assert cache.get(cargo, fleet, "anytime", "bfd", 5.0)[1] is None
+    assert cache.get(cargo, fleet, "anytime", "bfd", None)[1] is None
+    assert cache.get(cargo, fleet, "mip", "bfd", 1.0)[1] is None
+
+    optimal = solve_load_plan(cargo, fleet, mode="mip")
+    assert optimal["status"] == "OPTIMAL"
+    cache.put(instance, optimal, cargo, fleet, "mip", "bfd", None)
+    assert cache.get(cargo, fleet, "heuristic", "ffd", 0.1)[1]["status"] == "OPTIMAL"
+
+
+def test_least_recently_used_plan_is_evicted():
+    rng = random.Random(7)
+    cache = LoadPlanCache(max_entries=2)
+    instances = [_instance(rng, items=4 + k) for k in range(3)]
+    for cargo, fleet in instances[:2]:
+        instance, _ = cache.get(cargo, fleet, "heuristic", "bfd", None)
+        cache.put(instance, solve_load_plan(cargo, fleet, mode="heuristic"), cargo, fleet, "heuristic", "bfd", None)
+    assert cache.get(*instances[0], "heuristic", "bfd", None)[1] is not None # Now the most recent
+
+    cargo, fleet = instances[2]
+    instance, _ = cache.get(cargo, fleet, "heuristic", "bfd", None)
+    cache.put(instance, solve_load_plan(cargo, fleet, mode="heuristic"), cargo, fleet, "heuristic", "bfd", None)
+    assert cache.stats()["entries"] == 2
+    assert cache.get(*instances[0], "heuristic", "bfd", None)[1] is not None
+    assert cache.get(*instances[1], "heuristic", "bfd", None)[1] is None
+
+
+@pytest.mark.parametrize("seed", range(16))
+def test_heuristic_and_mip_agree_on_small_instances(seed):
+    rng = random.Random(seed)
+    cargo, fleet = _instance(rng, items=rng.randint(3, 8), sizes=rng.randint(2, 5))
+    exact = solve_load_plan(cargo, fleet, mode="mip")
+    assert exact["status"] == "OPTIMAL"
+    optimum = exact["total_vehicles_used"]
+    _check_plan(exact, cargo, fleet)
+
+    for strategy in ("bfd", "ffd"):
+        assignment = pack_heuristic(cargo, fleet, strategy)
+        assert assignment is not None and len(set(assignment)) >= optimum
+
+    bound = vehicle_lower_bound(cargo, fleet)
+    for mode in ("heuristic", "anytime"):
+        result = solve_load_plan(cargo, fleet, mode=mode)
+        _check_plan(result, cargo, fleet)
+        used, lower = result["total_vehicles_used"], result["lower_bound"]
+        assert bound <= lower <= optimum <= used
+        assert result["gap"] == round((used - lower) / used, 4)
+        # A plan is only reported OPTIMAL when its bound proves it
+        assert (result["status"] == "OPTIMAL") == (lower == used)
+        if mode == "anytime":
+            assert used == optimum and result["status"] == "OPTIMAL"
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import app.models # noqa: F401 (registers every table on Base.metadata)
+import app.services.road_graph as road_graph
+from app.core.database import Base
+from app.models import Convoy, Route, TransportAsset
+from app.services.rerouting import ReroutingEngine
+
+
+def _line(a, b, n):
+    return [[a[0] + (b[0] - a[0]) * k / n, a[1] + (b[1] - a[1]) * k / n] for k in range(n + 1)]
+
+
+# Main road along lat 33 with two bypasses: a short one north (lat 33.1) and a longer one south (lat 32.8)
+ROADS = {
+    "main": _line([33, 74], [33, 75], 200),
+    "north_up": _line([33, 74.2], [33.1, 74.2], 20),
+    "north": _line([33.1, 74.2], [33.1, 74.8], 120),
+    "north_down": _line([33.1, 74.8], [33, 74.8], 20),
+    "south_up": _line([33, 74.2], [32.8, 74.2], 40),
+    "south": _line([32.8, 74.2], [32.8, 74.8], 120),
+    "south_down": _line([32.8, 74.8], [33, 74.8], 40),
+}
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    monkeypatch.setattr(road_graph.settings, "ROAD_NETWORK_PATH", None)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rerouting.db'}")
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with maker() as db:
+            routes = {name: Route(name=name, waypoints=points) for name, points in ROADS.items()}
+            db.add_all(routes.values())
+            await db.flush()
+            convoy = Convoy(name="c1", status="IN_TRANSIT", route_id=routes["main"].id)
+            db.add(convoy)
+            await db.flush()
+            db.add(TransportAsset(name="lead", convoy_id=convoy.id, current_lat=33, current_long=74.4))
+            await db.commit()
+        return maker
+
+    yield asyncio.run(setup())
+    asyncio.run(engine.dispose())
+
+
+async def _close(db, name: str, **values):
+    route = (await db.execute(select(Route).where(Route.name == name))).scalar_one()
+    for key, value in values.items():
+        setattr(route, key, value)
+    await db.commit()
+    return route
+
+
+async def _convoy_route(db) -> Route:
+    convoy = (await db.execute(select(Convoy))).scalar_one()
+    return await db.get(Route, convoy.route_id)
+
+
+def test_convoy_on_a_detour_is_rerouted_when_the_detour_closes(sessions):
+    async def scenario():
+        engine = ReroutingEngine()
+        async with sessions() as db:
+            main = await _close(db, "main", status="BLOCKED")
+            first = await engine.reroute(db, [main.id])
+            assert len(first["rerouted"]) == 1
+            detour = await _convoy_route(db)
+            assert detour.is_detour and detour.waypoints_array[:, 0].max() == pytest.approx(33.1)
+
+            # An unrelated closure leaves the detour alone
+            south = await _close(db, "south", status="BLOCKED")
+            assert (await engine.reroute(db, [south.id]))["affected"] == 0
+            await _close(db, "south", status="OPEN")
+
+            # Closing the road the detour drives on moves the convoy again, onto the other bypass
+            north = await _close(db, "north", risk_level="HIGH")
+            second = await engine.reroute(db, [north.id])
+            assert second["affected"] == 1
+            assert second["rerouted"][0]["from_route_id"] == detour.id
+            rerouted = await _convoy_route(db)
+            assert rerouted.id != detour.id and rerouted.is_detour
+            assert rerouted.waypoints_array[:, 0].min() == pytest.approx(32.8)
+            assert rerouted.waypoints_array[:, 0].max() <= 33.0 + 1e-9
+
+    asyncio.run(scenario())
+
+
+def test_convoy_out_on_a_detour_turns_back_when_the_detour_closes(sessions):
+    async def scenario():
+        engine = ReroutingEngine()
+        async with sessions() as db:
+            main = await _close(db, "main", status="BLOCKED")
+            await engine.reroute(db, [main.id])
+            lead = (await db.execute(select(TransportAsset))).scalar_one()
+            lead.current_lat, lead.current_long = 33.1, 74.5 # Halfway along the northern bypass
+            await db.commit()
+
+            north = await _close(db, "north", status="BLOCKED")
+            rerouted = (await engine.reroute(db, [north.id]))["rerouted"]
+            assert len(rerouted) == 1
+            points = (await _convoy_route(db)).waypoints_array
+            assert points[0].tolist() == pytest.approx([33.1, 74.5])
+            # Back along the bypass already driven to the junction, then round the south
+            assert points[:, 1].min() == pytest.approx(74.2)
+            assert points[:, 0].min() == pytest.approx(32.8)
+
+    asyncio.run(scenario())
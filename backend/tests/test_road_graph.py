@@ -0,0 +1,92 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from app.services.road_graph import RoadGraph, ShortestPathTree, _haversine_km
+
+
+def _road_graph(rng: random.Random, size: int = 5, spacing: float = 0.05, points: int = 16):
+    """
+    Winding roads between neighbouring grid crossings, each drawn as two labelled routes that
+    meet end to end halfway (a degree-2 node inside a chain, like two stored routes sharing an end)
+    """
+    lines, labels = [], []
+    ends = [((i, j), (i + 1, j)) for i in range(size - 1) for j in range(size)]
+    ends += [((i, j), (i, j + 1)) for i in range(size) for j in range(size - 1)]
+    ends += [((i, j), (i + 1, j + 1)) for i in range(size - 1) for j in range(size - 1) if rng.random() < 0.3]
+    for n, (a, b) in enumerate(ends):
+        lat0, lon0 = 33 + a[0] * spacing, 74 + a[1] * spacing
+        lat1, lon1 = 33 + b[0] * spacing, 74 + b[1] * spacing
+        bulge = rng.uniform(-1.5, 1.5) * spacing # Some roads wind far longer than the straight line
+        line = []
+        for k in range(points + 1):
+            t = k / points
+            off = bulge * math.sin(math.pi * t)
+            line.append([lat0 + (lat1 - lat0) * t - (lon1 - lon0) * off, lon0 + (lon1 - lon0) * t + (lat1 - lat0) * off])
+        half = points // 2
+        lines += [line[:half + 1], line[half:]]
+        labels += [f"r{n}a", f"r{n}b"]
+    return RoadGraph(lines, labels), labels
+
+
+def _path_km(graph: RoadGraph, path) -> float:
+    return sum(
+        _haversine_km(graph._lat[a], graph._lon[a], graph._lat[b], graph._lon[b]) for a, b in zip(path, path[1:])
+    )
+
+
+@pytest.mark.parametrize("seed", range(48))
+def test_update_matches_fresh_tree(seed):
+    rng = random.Random(seed)
+    graph, labels = _road_graph(rng)
+    on_chain = np.flatnonzero(graph.node_chain >= 0).tolist()
+    root = rng.choice(on_chain) if seed % 2 else int(rng.choice(list(graph.junction_adj)))
+    blocked = set()
+    tree = ShortestPathTree(graph, root, graph.blocked_chains(blocked))
+
+    for step in range(30):
+        if blocked and rng.random() < 0.5:
+            blocked.discard(rng.choice(sorted(blocked))) # Re-open
+        else:
+            blocked.add(rng.choice(labels)) # Close
+        mask = graph.blocked_chains(blocked)
+        tree.update(mask)
+        fresh = ShortestPathTree(graph, root, mask)
+
+        assert set(tree.dist) == set(fresh.dist), step
+        for j, km in fresh.dist.items():
+            assert tree.dist[j] == pytest.approx(km, abs=1e-9), (step, j)
+        for node in rng.sample(range(graph.num_nodes), 20):
+            repaired, expected = tree.path_from(node), fresh.path_from(node)
+            assert (repaired is None) == (expected is None), (step, node)
+            if repaired is not None:
+                assert repaired[0] == pytest.approx(expected[0], abs=1e-9)
+                assert repaired[1][0] == node and repaired[1][-1] == root
+                assert _path_km(graph, repaired[1]) == pytest.approx(repaired[0], abs=1e-6)
+
+
+def test_closing_a_shortcut_restores_the_root_leg():
+    """ A junction that reached the root through a shortcut falls back to its own leg along the root's road """
+    def at(lat_steps, lon_steps):
+        return [33.0 + lat_steps * 0.01, 74.0 + lon_steps * 0.01]
+
+    a, b = at(0, 0), at(0, 5)
+    u_road = [at(k, 0) for k in range(11)] + [at(10, k) for k in range(1, 6)] + [at(k, 5) for k in range(9, -1, -1)]
+    lines = [
+        u_road[:13], u_road[12:], # The root's road, two routes meeting end to end
+        [a, at(0, 1), at(0, 2)], [at(0, 2), at(0, 3), at(0, 4), b], # Shortcut between its two ends
+        [a, at(-1, 0)], [b, at(-1, 5)], # Stubs so both ends are junctions
+    ]
+    graph = RoadGraph(lines, ["u1", "u2", "s1", "s2", "stub_a", "stub_b"])
+    root, _ = graph.snap(at(5, 5))
+    junction_a, _ = graph.snap(a)
+
+    tree = ShortestPathTree(graph, root, graph.blocked_chains(set()))
+    mask = graph.blocked_chains({"s1"})
+    tree.update(mask)
+    fresh = ShortestPathTree(graph, root, mask)
+
+    assert tree.dist[junction_a] == pytest.approx(fresh.dist[junction_a])
+    assert tree.path_from(junction_a)[0] == pytest.approx(fresh.path_from(junction_a)[0])
@@ -5,6 +5,7 @@ import { useState, useEffect } from 'react';
 import dynamic from 'next/dynamic';
 import { useRouter } from 'next/navigation';
 import DashboardOverlay from '@/components/DashboardOverlay';
+import { PositionStream } from '@/lib/positionStream';
 
 // Dynamic import for map (must be client-side only)
 const MapComponent = dynamic(() => import('@/components/Map'), {
@@ -13,6 +14,11 @@ const MapComponent = dynamic(() => import('@/components/Map'), {
 });
 
 const API_BASE = 'http://localhost:8000/api/v1';
+const POSITIONS_WS = 'ws://localhost:8000/api/v1/positions/ws';
+// Positions arrive over the stream; the lists only need refreshing for membership/status changes
+const LIST_POLL_MS = 15000;
+// Route polylines are simplified server-side to ~1 px at this zoom (full resolution is thousands of points)
+const ROUTE_LOD_ZOOM = 13;
 
 interface Asset {
     id: number;
@@ -23,6 +29,7 @@ interface Asset {
     fuel_status: number;
     current_lat?: number;
     current_long?: number;
+    bearing?: number;
     convoy_id?: number;
 }
 
@@ -87,8 +94,8 @@ export default function Dashboard() {
             try {
                 const [assetRes, convoyRes, routeRes, checkpointRes] = await Promise.all([
                     fetch(`${API_BASE}/assets/`),
-                    fetch(`${API_BASE}/convoys/`),
-                    fetch(`${API_BASE}/routes/`),
+                    fetch(`${API_BASE}/convoys/?zoom=${ROUTE_LOD_ZOOM}`),
+                    fetch(`${API_BASE}/routes/?zoom=${ROUTE_LOD_ZOOM}`),
                     fetch(`${API_BASE}/checkpoints/`)
                 ]);
                 if (assetRes.ok) setAssets(await assetRes.json());
@@ -100,8 +107,38 @@ export default function Dashboard() {
             }
         };
         fetchData();
-        const interval = setInterval(fetchData, 2000);
-        return () => clearInterval(interval);
+        const interval = setInterval(fetchData, LIST_POLL_MS);
+
+        // Live positions: patch coordinates into the asset list as frames arrive
+        let socket: WebSocket | null = null;
+        let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+        let closed = false;
+        const connect = () => {
+            // Compact binary frames: keyframes plus fixed-point deltas of moved assets
+            const stream = new PositionStream();
+            socket = new WebSocket(POSITIONS_WS);
+            socket.binaryType = 'arraybuffer';
+            socket.onmessage = (event) => {
+                const changed = stream.apply(event.data);
+                if (!changed || changed.size === 0) return;
+                setAssets(prev => prev.map(asset => {
+                    const pos = changed.get(asset.id);
+                    if (!pos) return asset;
+                    return { ...asset, current_lat: pos.lat, current_long: pos.long, bearing: pos.bearing };
+                }));
+            };
+            socket.onclose = () => {
+                if (!closed) reconnectTimer = setTimeout(connect, 3000);
+            };
+        };
+        connect();
+
+        return () => {
+            closed = true;
+            clearInterval(interval);
+            clearTimeout(reconnectTimer);
+            socket?.close();
+        };
     }, []);
 
     return (
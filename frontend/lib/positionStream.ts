@@ -0,0 +1,123 @@
+// Decoder for the live position stream (backend/app/services/position_frames.py).
+//
+// Keyframes carry every asset in absolute fixed-point; deltas carry only assets
+// that moved, as offsets from the last keyframe. Deltas never build on each other,
+// so applying the newest delta to the keyframe always gives the current positions.
+
+export const COORD_SCALE = 100000;
+export const BEARING_SCALE = 10;
+const BEARING_UNITS = 360 * BEARING_SCALE;
+const FRAME_VERSION = 1;
+const HEADER_BYTES = 16;
+
+export interface Position {
+    lat: number;
+    long: number;
+    bearing: number;
+}
+
+interface DecodedFrame {
+    keyframe: boolean;
+    tick: number;
+    keyTick: number;
+    ids: ArrayLike<number>;
+    lat: ArrayLike<number>;
+    long: ArrayLike<number>;
+    bearing: ArrayLike<number>;
+}
+
+// JSON fallback (/positions/sse, /positions/ws?format=json): same integers as the binary frame
+interface JsonFrame {
+    type: 'keyframe' | 'delta';
+    tick: number;
+    key_tick: number;
+    ids: number[];
+    lat: number[];
+    long: number[];
+    bearing: number[];
+}
+
+export function decodeBinaryFrame(buffer: ArrayBuffer): DecodedFrame {
+    const view = new DataView(buffer);
+    const version = view.getUint8(0);
+    if (version !== FRAME_VERSION) throw new Error(`Unsupported position frame version ${version}`);
+    const keyframe = view.getUint8(1) === 0;
+    const tick = view.getUint32(4, true);
+    const keyTick = view.getUint32(8, true);
+    const count = view.getUint32(12, true);
+
+    // Columns are little-endian and 16-byte header keeps them aligned for typed-array views
+    let offset = HEADER_BYTES;
+    const ids = new Uint32Array(buffer, offset, count);
+    offset += count * 4;
+    if (keyframe) {
+        const lat = new Int32Array(buffer, offset, count);
+        const long = new Int32Array(buffer, offset + count * 4, count);
+        const bearing = new Uint16Array(buffer, offset + count * 8, count);
+        return { keyframe, tick, keyTick, ids, lat, long, bearing };
+    }
+    const lat = new Int16Array(buffer, offset, count);
+    const long = new Int16Array(buffer, offset + count * 2, count);
+    const bearing = new Int16Array(buffer, offset + count * 4, count);
+    return { keyframe, tick, keyTick, ids, lat, long, bearing };
+}
+
+function fromJson(frame: JsonFrame): DecodedFrame {
+    return {
+        keyframe: frame.type === 'keyframe',
+        tick: frame.tick,
+        keyTick: frame.key_tick,
+        ids: frame.ids,
+        lat: frame.lat,
+        long: frame.long,
+        bearing: frame.bearing,
+    };
+}
+
+export class PositionStream {
+    private keyTick = -1;
+    private key = new Map<number, [number, number, number]>(); // Fixed-point keyframe state
+    private lastDeltaIds = new Set<number>();
+
+    // Apply a binary (ArrayBuffer) or JSON (string) frame; returns the positions it changed
+    apply(data: ArrayBuffer | string): Map<number, Position> | null {
+        const frame = typeof data === 'string' ? fromJson(JSON.parse(data)) : decodeBinaryFrame(data);
+        const changed = new Map<number, Position>();
+
+        if (frame.keyframe) {
+            this.keyTick = frame.tick;
+            this.key.clear();
+            for (let i = 0; i < frame.ids.length; i++) {
+                this.key.set(frame.ids[i], [frame.lat[i], frame.long[i], frame.bearing[i]]);
+                changed.set(frame.ids[i], toDegrees(frame.lat[i], frame.long[i], frame.bearing[i]));
+            }
+            this.lastDeltaIds.clear();
+            return changed;
+        }
+
+        // Delta for a keyframe we never saw: wait for the next keyframe
+        if (frame.keyTick !== this.keyTick) return null;
+        const deltaIds = new Set<number>();
+        for (let i = 0; i < frame.ids.length; i++) {
+            deltaIds.add(frame.ids[i]);
+            const base = this.key.get(frame.ids[i]);
+            if (!base) continue;
+            changed.set(frame.ids[i], toDegrees(
+                base[0] + frame.lat[i],
+                base[1] + frame.long[i],
+                (base[2] + frame.bearing[i] + BEARING_UNITS) % BEARING_UNITS
+            ));
+        }
+        // Assets absent from this delta are back at their keyframe position
+        this.lastDeltaIds.forEach(id => {
+            const base = this.key.get(id);
+            if (!deltaIds.has(id) && base) changed.set(id, toDegrees(base[0], base[1], base[2]));
+        });
+        this.lastDeltaIds = deltaIds;
+        return changed;
+    }
+}
+
+function toDegrees(lat: number, long: number, bearing: number): Position {
+    return { lat: lat / COORD_SCALE, long: long / COORD_SCALE, bearing: bearing / BEARING_SCALE };
+}